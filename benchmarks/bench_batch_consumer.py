@@ -0,0 +1,77 @@
+"""
+Compare per-message and batch delivery throughput of KafkaConsumer.
+
+Each subscriber counts messages per level. Per-message delivery is timed
+both with the consumer's INFO logging (written to /dev/null) and with
+logging disabled.
+
+Usage: python -m benchmarks.bench_batch_consumer [count] [max_batch]
+"""
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from src.core.log_store import LogStore
+from src.kafka_consumer import KafkaConsumer
+from benchmarks.weblog_data import iter_records
+
+def per_message(consumer, counts):
+    consumer.register_consumer(lambda message: counts.update((message["level"],)))
+
+def list_batches(max_batch):
+    def register(consumer, counts):
+        consumer.register_batch_consumer(
+            lambda batch: counts.update(message["level"] for message in batch),
+            max_batch=max_batch, max_latency_ms=0,
+        )
+    return register
+
+def columnar_batches(max_batch):
+    def register(consumer, counts):
+        consumer.register_batch_consumer(
+            lambda batch: counts.update(batch["level"]),
+            max_batch=max_batch, max_latency_ms=0, columnar=True,
+        )
+    return register
+
+def run(store, register):
+    consumer = KafkaConsumer(producer=SimpleNamespace(topic="logs", logs=store))
+    counts = Counter()
+    register(consumer, counts)
+    start = time.perf_counter()
+    consumer._poll(0)
+    elapsed = time.perf_counter() - start
+    consumer.retries.stop()
+    assert sum(counts.values()) == len(store)
+    return elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    max_batch = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    store = LogStore()
+    for offset, record in enumerate(iter_records(count)):
+        record["_kafka_offset"] = offset
+        store.append(record)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.StreamHandler(open(os.devnull, "w")))
+    root.setLevel(logging.INFO)
+
+    modes = [
+        ("per-message, INFO logging", per_message, False),
+        ("per-message, no logging", per_message, True),
+        (f"list batches of {max_batch}", list_batches(max_batch), False),
+        (f"columnar batches of {max_batch}", columnar_batches(max_batch), False),
+    ]
+    for label, register, quiet in modes:
+        logging.disable(logging.CRITICAL if quiet else logging.NOTSET)
+        elapsed = run(store, register)
+        print(f"{label:28s} {count / elapsed:12,.0f} msgs/s  ({elapsed:.1f}s)")
+
+if __name__ == "__main__":
+    main()
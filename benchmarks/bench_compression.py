@@ -0,0 +1,65 @@
+"""
+Measure wire bytes and CPU cost of the body codings the API negotiates.
+
+Usage: python -m benchmarks.bench_compression [count]
+"""
+import json
+import sys
+import time
+
+from src.api.compression import (
+    available_encodings, _compressor, _decompressor, CompressionMiddleware
+)
+from benchmarks.weblog_data import load
+
+CHUNK = 64 * 1024
+
+def stream_compress(encoding, data, levels):
+    compressor = _compressor(encoding, levels)
+    parts = [compressor.compress(data[i:i + CHUNK]) + compressor.flush() for i in range(0, len(data), CHUNK)]
+    parts.append(compressor.finish())
+    return b"".join(parts)
+
+def stream_decompress(encoding, data):
+    decompressor = _decompressor(encoding)
+    parts = [decompressor.decompress(data[i:i + CHUNK], 1 << 40) for i in range(0, len(data), CHUNK)]
+    decompressor.finish()
+    return b"".join(parts)
+
+def timed(fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def report(name, data, levels):
+    mib = len(data) / 2 ** 20
+    print(f"\n{name}: {len(data):,} bytes")
+    for encoding in available_encodings():
+        compressed, compress_time = timed(stream_compress, encoding, data, levels)
+        line = f"  {encoding:5s} {len(compressed):>11,} bytes ({len(data) / len(compressed):5.1f}x)"
+        line += f"  compress {mib / compress_time:7.1f} MiB/s"
+        if _decompressor(encoding) is not None:
+            restored, decompress_time = timed(stream_decompress, encoding, compressed)
+            assert restored == data
+            line += f"  decompress {mib / decompress_time:7.1f} MiB/s"
+        print(line)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    records = load(count)
+    levels = CompressionMiddleware(None).levels
+
+    # A GET /logs response with limit=5000 and an NDJSON bulk upload
+    response = json.dumps({"status": "success", "count": 5000, "logs": records[:5000]}, default=str).encode()
+    upload = "".join(json.dumps(record, default=str) + "\n" for record in records).encode()
+
+    print(f"levels: {levels}")
+    report("GET /logs?limit=5000 response", response, levels)
+    report(f"bulk NDJSON upload of {count:,} logs", upload, levels)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Measure dispatch throughput when a subscriber fails on every message.
+
+Usage: python -m benchmarks.bench_dead_letter [count]
+"""
+import logging
+import sys
+import time
+from types import SimpleNamespace
+
+from src.core.log_store import LogStore
+from src.core.retry import RetryPolicy
+from src.kafka_consumer import KafkaConsumer
+
+def failing(message):
+    raise RuntimeError("sink down")
+
+def dispatch(count, with_failing):
+    consumer = KafkaConsumer(producer=SimpleNamespace(topic="logs", logs=LogStore()))
+    delivered = []
+    consumer.register_consumer(delivered.append, name="healthy")
+    if with_failing:
+        consumer.register_consumer(failing, retry_policy=RetryPolicy(max_attempts=5, base_delay=0.05), name="failing")
+
+    message = {"service": "web-server", "level": "INFO", "message": "Request successful for /index.html"}
+    start = time.perf_counter()
+    for _ in range(count):
+        consumer._process_message(dict(message))
+    elapsed = time.perf_counter() - start
+    consumer.retries.stop()
+    return count / elapsed, len(delivered), len(consumer.dead_letters), len(consumer.retries)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    logging.disable(logging.CRITICAL)  # measure dispatch, not log output
+    for with_failing in (False, True):
+        rate, delivered, dead, pending = dispatch(count, with_failing)
+        label = "healthy + always-failing" if with_failing else "healthy only"
+        print(f"{label:25s} {rate:10,.0f} msgs/s  delivered={delivered:,} dead-lettered={dead:,} pending retries={pending:,}")
+
+if __name__ == "__main__":
+    main()
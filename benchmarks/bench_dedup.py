@@ -0,0 +1,53 @@
+"""
+Measure the per-request cost and memory of idempotency-key deduplication.
+
+Usage: python -m benchmarks.bench_dedup [count] [threads]
+"""
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+
+from src.core.dedup import DedupCache
+
+def add_all(cache, keys):
+    for key in keys:
+        cache.add(key)
+
+def timed(cache, keys, threads):
+    parts = [keys[i::threads] for i in range(threads)]
+    workers = [threading.Thread(target=add_all, args=(cache, part)) for part in parts]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    keys = [f"web-server\x00{uuid.uuid4()}" for _ in range(count)]
+
+    for n in (1, threads):
+        cache = DedupCache(ttl_seconds=600, max_entries=count)
+        elapsed = timed(cache, keys, n)
+        print(f"new keys,   {n} thread(s): {elapsed / count * 1e9:8.0f} ns/request")
+        elapsed = timed(cache, keys, n)
+        print(f"duplicates, {n} thread(s): {elapsed / count * 1e9:8.0f} ns/request")
+
+    capped = DedupCache(ttl_seconds=600, max_entries=count // 10)
+    elapsed = timed(capped, keys, 1)
+    print(f"capped at {count // 10:,}:       {elapsed / count * 1e9:8.0f} ns/request, "
+          f"{len(capped):,} kept, {capped.evicted_early:,} evicted early")
+
+    tracemalloc.start()
+    cache = DedupCache(ttl_seconds=600, max_entries=count)
+    add_all(cache, keys)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"memory: {current / 2**20:.1f} MiB for {len(cache):,} keys ({current / len(cache):.0f} bytes/key)")
+
+if __name__ == "__main__":
+    main()
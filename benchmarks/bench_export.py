@@ -0,0 +1,47 @@
+"""
+Show that export memory does not grow with the exported range.
+
+Usage: python -m benchmarks.bench_export [count]
+"""
+import sys
+import time
+import tracemalloc
+
+from src.core.log_store import LogStore
+from src.api.export import export_chunks, parquet_available
+from benchmarks.weblog_data import iter_records
+
+def drain(store, export_format, end):
+    total = 0
+    for chunk in export_chunks(export_format, store.scan(end=end)):
+        total += len(chunk)
+    return total
+
+def run_export(store, export_format, end):
+    start = time.perf_counter()
+    total = drain(store, export_format, end)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    drain(store, export_format, end)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return total, elapsed, peak
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    store = LogStore()
+    for offset, record in enumerate(iter_records(count)):
+        record["_kafka_offset"] = offset
+        record["_kafka_timestamp"] = 1510000000000 + offset
+        store.append(record)
+
+    formats = ["ndjson", "csv"] + (["parquet"] if parquet_available() else [])
+    for export_format in formats:
+        for end in (count // 10, count):
+            total, elapsed, peak = run_export(store, export_format, end)
+            print(f"{export_format:8s} {end:>9,} logs: {total / 2 ** 20:8.1f} MiB out, "
+                  f"{end / elapsed:9,.0f} logs/s, peak traced memory {peak / 2 ** 20:6.1f} MiB")
+
+if __name__ == "__main__":
+    main()
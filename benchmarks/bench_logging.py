@@ -0,0 +1,81 @@
+"""
+Measure ingestion and dispatch throughput under the service's own logging.
+
+Compares the old setup (a StreamHandler on the calling thread and one INFO
+line per message) with the queue-backed setup from src/core/logger.py, with
+and without rate-limiting the per-message lines. Log output goes to a file.
+
+Usage: python -m benchmarks.bench_logging [count]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import src.core.kafka_producer as producer_module
+import src.kafka_consumer as consumer_module
+from src.core.kafka_producer import KafkaLogger
+from src.core.log_store import LogStore
+from src.core.logger import LOG_FORMAT, RateLimitedLogger, configure_logging, shutdown_logging
+from src.kafka_consumer import KafkaConsumer
+from benchmarks.weblog_data import iter_records
+
+def use_handlers(mode, stream):
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    if mode == "sync":
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+    else:
+        configure_logging(level="INFO", stream=stream, queue_size=100_000)
+
+def limit_message_lines(rate):
+    producer_module.message_logger = RateLimitedLogger(producer_module.logger, rate)
+    consumer_module.message_logger = RateLimitedLogger(consumer_module.logger, rate)
+
+def ingest(records):
+    kafka_logger = KafkaLogger()
+    start = time.perf_counter()
+    for record in records:
+        kafka_logger.send_log(dict(record))
+    return time.perf_counter() - start
+
+def dispatch(records):
+    consumer = KafkaConsumer(producer=SimpleNamespace(topic="logs", logs=LogStore()))
+    consumer.register_consumer(lambda message: None)
+    start = time.perf_counter()
+    for record in records:
+        consumer._process_message(dict(record))
+    return time.perf_counter() - start
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    records = list(iter_records(count))
+
+    modes = [
+        ("sync handler, every line", "sync", 0),
+        ("queue handler, every line", "queue", 0),
+        ("queue handler, 10 lines/s", "queue", 10),
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        for label, mode, rate in modes:
+            path = os.path.join(directory, f"{mode}-{rate}.log")
+            with open(path, "w") as stream:
+                use_handlers(mode, stream)
+                limit_message_lines(rate)
+                ingest_seconds = ingest(records)
+                dispatch_seconds = dispatch(records)
+                drain_start = time.perf_counter()
+                shutdown_logging()
+                drain_seconds = time.perf_counter() - drain_start
+            print(f"{label:28s} ingest {count / ingest_seconds:9,.0f} logs/s, "
+                  f"dispatch {count / dispatch_seconds:9,.0f} msgs/s, "
+                  f"{os.path.getsize(path) / 2**20:6.1f} MiB written, {drain_seconds:.1f}s to drain queue")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Measure filter-expression scan throughput over the columnar log store.
+
+Usage: python -m benchmarks.bench_query [count]
+"""
+import sys
+import time
+
+from src.core.log_store import LogStore
+from src.core.query import compile_query
+from benchmarks.weblog_data import iter_records
+
+QUERIES = [
+    ('metadata.status >= 500', lambda log, m: type(m.get("status")) is int and m["status"] >= 500),
+    ('metadata.status >= 500 AND metadata.method = "POST"',
+     lambda log, m: type(m.get("status")) is int and m["status"] >= 500 and m.get("method") == "POST"),
+    ('level = "WARN" OR metadata.request IN ("/login.php", "/process.php")',
+     lambda log, m: log.get("level") == "WARN" or m.get("request") in ("/login.php", "/process.php")),
+]
+
+def filter_only(store, where):
+    matches = 0
+    for chunk, first, stop in store.iter_chunks():
+        matches += int(where.mask(store, chunk, stop)[first:].sum())
+    return matches
+
+def full_scan(store, where):
+    return sum(len(batch) for batch in store.scan(where=where))
+
+def per_dict(store, predicate, count):
+    return sum(1 for log in store.iter_range(0, count) if predicate(log, log.get("metadata") or {}))
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    store = LogStore()
+    _, elapsed = timed(lambda: [store.append(record) for record in iter_records(count)])
+    print(f"loaded {count:,} records in {elapsed:.1f}s")
+
+    baseline_rows = min(count, 100_000)
+    for expression, predicate in QUERIES:
+        where = compile_query(expression)
+        print(expression)
+        matches, cold = timed(filter_only, store, where)
+        _, warm = timed(filter_only, store, where)
+        _, scan = timed(full_scan, store, where)
+        _, python = timed(per_dict, store, predicate, baseline_rows)
+        print(f"  {matches:,} matches")
+        print(f"  vectorized filter, first run: {count / cold:14,.0f} rows/s")
+        print(f"  vectorized filter, cached:    {count / warm:14,.0f} rows/s")
+        print(f"  scan incl. building matches:  {count / scan:14,.0f} rows/s")
+        print(f"  per-dict Python evaluation:   {baseline_rows / python:14,.0f} rows/s")
+
+if __name__ == "__main__":
+    main()
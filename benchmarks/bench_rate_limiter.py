@@ -0,0 +1,46 @@
+"""
+Measure the per-log cost of the ingestion guards.
+
+Usage: python -m benchmarks.bench_rate_limiter
+"""
+import threading
+import time
+
+from src.core.rate_limiter import ServiceRateLimiter, LogSampler, LoadShedder
+
+ITERATIONS = 1_000_000
+THREADS = 4
+
+def run_guards(limiter, sampler, shedder, services, iterations):
+    record = {"level": "INFO"}
+    for i in range(iterations):
+        shedder.check(i)
+        limiter.acquire(services[i % len(services)])
+        sampler.keep(record)
+
+def bench(threads):
+    limiter = ServiceRateLimiter(default_rate=1e9)
+    sampler = LogSampler({"INFO": 0.1})
+    shedder = LoadShedder(high_water_mark=10 ** 12)
+    services = [f"service-{i}" for i in range(50)]
+    per_thread = ITERATIONS // threads
+
+    workers = [
+        threading.Thread(target=run_guards, args=(limiter, sampler, shedder, services, per_thread))
+        for _ in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed
+
+def main():
+    for threads in (1, THREADS):
+        rate = bench(threads)
+        print(f"{threads} thread(s): {rate:,.0f} guarded logs/s ({1e6 / rate:.2f} us/log)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Show that memory and timeline latency stay flat as history grows with retention.
+
+Usage: python -m benchmarks.bench_retention [count]
+"""
+import sys
+import time
+import tracemalloc
+
+from src.core.log_store import LogStore, CHUNK_SIZE
+from src.core.retention import RetentionManager
+from benchmarks.weblog_data import iter_records
+
+START_MS = 1510000000000
+STEP_MS = 1000  # one log per second of simulated time
+
+def run(label, retention_options, count):
+    store = LogStore()
+    retention = RetentionManager(store, **retention_options)
+    checkpoints = {count * i // 5 for i in range(1, 6)}
+
+    tracemalloc.start()
+    for offset, record in enumerate(iter_records(count), 1):
+        record["_kafka_offset"] = offset - 1
+        record["_kafka_timestamp"] = START_MS + offset * STEP_MS
+        store.append(record)
+        if offset % CHUNK_SIZE == 0:
+            retention.enforce(now_ms=record["_kafka_timestamp"])
+        if offset in checkpoints:
+            memory = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            timeline = retention.timeline(3600)
+            elapsed = time.perf_counter() - start
+            stats = retention.stats()
+            print(f"{label:16s} {offset:>9,} logs: {memory / 2 ** 20:7.1f} MiB, hourly timeline {elapsed * 1000:7.1f} ms "
+                  f"({len(timeline['buckets'])} buckets), raw={stats['raw_logs']:,} "
+                  f"minute={stats['minute_buckets']} hour={stats['hour_buckets']}")
+    tracemalloc.stop()
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    run("raw only", {"raw_window_seconds": 0, "raw_max_logs": 0}, count)
+    run("tiered", {"raw_window_seconds": 3600, "raw_max_logs": 100_000,
+                   "minute_window_seconds": 6 * 3600}, count)
+
+if __name__ == "__main__":
+    main()
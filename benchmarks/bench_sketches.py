@@ -0,0 +1,89 @@
+"""
+Measure the ingest cost, memory and accuracy of the top-k and unique IP sketches
+against exact counting with dicts and sets.
+
+Usage: python -m benchmarks.bench_sketches [count]
+"""
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+from src.core.sketches import StatsSketches, TOP_DIMENSIONS
+from benchmarks.weblog_data import iter_records
+
+def load(count, step_ms):
+    records = []
+    start_ms = 1700000000000
+    for i, record in enumerate(iter_records(count)):
+        record["_kafka_timestamp"] = start_ms + i * step_ms
+        records.append(record)
+    return records, start_ms + count * step_ms
+
+def skew_ips(records, seed=1):
+    """Give half the traffic to 20 clients, as a crawler or attack would."""
+    rng = random.Random(seed)
+    for record in records:
+        if rng.random() < 0.5:
+            record["metadata"] = dict(record["metadata"], ip=f"203.0.113.{int(rng.expovariate(0.2)) % 20}")
+
+def exact(records):
+    counters = {dimension: Counter() for dimension in TOP_DIMENSIONS}
+    ips = {}
+    for record in records:
+        metadata = record["metadata"]
+        counters["ip"][metadata["ip"]] += 1
+        counters["path"][metadata["request"].split("?", 1)[0]] += 1
+        counters["user_agent"][metadata["user_agent"]] += 1
+        ips.setdefault(record["service"], set()).add(metadata["ip"])
+    return counters, ips
+
+def measure(build, count):
+    """Return the result, ns per record and traced bytes of build()."""
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed / count * 1e9, current
+
+def build_sketches(records):
+    sketches = StatsSketches()
+    for record in records:
+        sketches.add(record)
+    return sketches
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    # Spread the records over an hour so every one-minute window is used
+    records, now_ms = load(count, step_ms=max(1, 3_600_000 // count))
+    skew_ips(records)
+
+    (counters, ips), ns, exact_bytes = measure(lambda: exact(records), count)
+    print(f"exact counting: {ns:6.0f} ns/log, {exact_bytes / 2**20:6.1f} MiB (whole range only, no windows)")
+    sketches, ns, sketch_bytes = measure(lambda: build_sketches(records), count)
+    print(f"sketches:       {ns:6.0f} ns/log, {sketch_bytes / 2**20:6.1f} MiB for {len(sketches._windows)} windows")
+
+    for dimension, counter in counters.items():
+        start = time.perf_counter()
+        top = sketches.top(dimension, k=10, now_ms=now_ms)
+        elapsed = time.perf_counter() - start
+        expected = [value for value, _ in counter.most_common(10)]
+        found = sum(item["value"] in expected for item in top)
+        worst = max(abs(item["count"] - counter[item["value"]]) / counter[item["value"]] for item in top)
+        print(f"top 10 {dimension:<10}: {found}/{len(expected)} found, worst count error {worst:6.2%}, "
+              f"{len(counter):,} distinct, query {elapsed * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    estimate = sketches.cardinality(now_ms=now_ms)
+    elapsed = time.perf_counter() - start
+    for service, values in ips.items():
+        error = (estimate["services"][service] - len(values)) / len(values)
+        print(f"unique IPs {service}: {estimate['services'][service]:,} estimated, "
+              f"{len(values):,} exact ({error:+.2%}), query {elapsed * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
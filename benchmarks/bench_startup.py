@@ -0,0 +1,81 @@
+"""
+Measure cold-start cost: importing the app and the consumer, the first
+request, and the time until /ready reports the dataset loaded.
+
+Each measurement runs in a fresh interpreter inside a temporary directory
+holding a generated data/processed_web_logs.csv.
+
+Usage: python -m benchmarks.bench_startup [rows]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.weblog_data import generate
+
+REPEAT = 3
+
+IMPORT_APP = """
+import time
+start = time.perf_counter()
+import src.main
+print((time.perf_counter() - start) * 1000)
+"""
+
+IMPORT_CONSUMER = """
+import time
+start = time.perf_counter()
+import src.kafka_consumer
+print((time.perf_counter() - start) * 1000)
+"""
+
+FIRST_REQUEST = """
+import time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+from src.main import app
+with TestClient(app) as client:
+    client.get("/api/v1/health")
+    print((time.perf_counter() - start) * 1000)
+"""
+
+READY = """
+import time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+from src.main import app
+with TestClient(app) as client:
+    while client.get("/api/v1/ready").status_code != 200:
+        time.sleep(0.01)
+    print((time.perf_counter() - start) * 1000)
+"""
+
+def write_dataset(directory, rows):
+    import pandas as pd
+    os.makedirs(os.path.join(directory, "data"))
+    pd.DataFrame(generate(rows)).to_csv(os.path.join(directory, "data", "processed_web_logs.csv"), index=False)
+
+def run(code, directory):
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    times = []
+    for _ in range(REPEAT):
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=directory, env=env,
+            capture_output=True, text=True, check=True
+        )
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(times)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as directory:
+        write_dataset(directory, rows)
+        print(f"dataset: {rows:,} rows")
+        print(f"import src.main:           {run(IMPORT_APP, directory):8.0f} ms")
+        print(f"import src.kafka_consumer: {run(IMPORT_CONSUMER, directory):8.0f} ms")
+        print(f"app started + /health:     {run(FIRST_REQUEST, directory):8.0f} ms")
+        print(f"app started + /ready 200:  {run(READY, directory):8.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Report bytes/record of the log store against a plain list of dicts.
+
+Usage: python -m benchmarks.bench_store [count]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+from src.core.log_store import LogStore
+from benchmarks.weblog_data import iter_records
+
+TOPIC = "logs"
+
+def stamp(record, offset):
+    # The fields send_log and the ingestion path add to every record
+    record["_sample_rate"] = 1.0
+    record["_kafka_offset"] = offset
+    record["_kafka_timestamp"] = 1510000000000 + offset
+    record["_kafka_topic"] = TOPIC
+    record["_kafka_partition"] = 0
+    return record
+
+def measure(count, store_factory, append):
+    gc.collect()
+    tracemalloc.start()
+    store = store_factory()
+    start = time.perf_counter()
+    for offset, record in enumerate(iter_records(count)):
+        append(store, stamp(record, offset))
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return store, size, elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    logs, raw_size, raw_time = measure(count, list, list.append)
+    sample = logs[count // 2]
+    del logs
+
+    store, store_size, store_time = measure(count, LogStore, LogStore.append)
+    assert store.get(count // 2) == sample
+
+    print(f"records: {count:,} weblog entries")
+    print(f"list of dicts: {raw_size / count:8.1f} bytes/record ({raw_size / 2 ** 20:,.0f} MiB)")
+    print(f"LogStore:      {store_size / count:8.1f} bytes/record ({store_size / 2 ** 20:,.0f} MiB)")
+    print(f"(timings include JSON decoding and tracemalloc: {raw_time:.1f}s vs {store_time:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compare template-compressed storage against storing raw message strings.
+
+Template compression is opt-in (STORE_TEMPLATE_COMPRESSION), so the plain
+columnar store is measured as well.
+
+Usage: python -m benchmarks.bench_templates [count]
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from src.core.log_store import LogStore
+from src.core.templates import TemplateMiner
+from benchmarks.weblog_data import load
+
+def build_raw(payloads):
+    logs = []
+    for payload in payloads:
+        logs.append(json.loads(payload))
+    return logs
+
+def build_columnar(payloads):
+    store = LogStore()
+    for payload in payloads:
+        store.append(json.loads(payload))
+    return store
+
+def build_templated(payloads):
+    store = LogStore(miner=TemplateMiner())
+    for payload in payloads:
+        store.append(json.loads(payload))
+    return store
+
+def measure(build, payloads):
+    start = time.perf_counter()
+    build(payloads)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    store = build(payloads)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return store, elapsed, size
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    # Records arrive as JSON, so every stored message is its own string
+    payloads = [json.dumps(record) for record in load(count)]
+
+    _, raw_time, raw_size = measure(build_raw, payloads)
+    _, col_time, col_size = measure(build_columnar, payloads)
+    store, tpl_time, tpl_size = measure(build_templated, payloads)
+
+    print(f"records: {count:,}, templates mined: {len(store.template_counts())}")
+    print(f"raw:       {raw_size / count:8.1f} bytes/record, {count / raw_time:12,.0f} records/s")
+    print(f"columnar:  {col_size / count:8.1f} bytes/record, {count / col_time:12,.0f} records/s")
+    print(f"templated: {tpl_size / count:8.1f} bytes/record, {count / tpl_time:12,.0f} records/s")
+    assert store.get(count - 1)["message"] == json.loads(payloads[-1])["message"]
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Compare the message value formats in SERIALIZERS on weblog records.
+
+Reports bytes per record, on its own and gzip-compressed in batches of
+1000 as bulk uploads would be, and encode/decode time per record through
+the serializers in src/core/serializers.py.
+
+Usage: python -m benchmarks.bench_wire_format [count]
+"""
+import gzip
+import sys
+import time
+
+from src.core.serializers import DESERIALIZERS, SERIALIZERS
+from benchmarks.weblog_data import iter_records
+
+BATCH = 1000
+
+def timed(function, values):
+    start = time.perf_counter()
+    results = [function(value) for value in values]
+    return results, time.perf_counter() - start
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    records = list(iter_records(count))
+
+    for name in SERIALIZERS:
+        payloads, encode_seconds = timed(SERIALIZERS[name], records)
+        _, decode_seconds = timed(DESERIALIZERS[name], payloads)
+        size = sum(len(payload) for payload in payloads)
+        compressed = sum(
+            len(gzip.compress(b"".join(payloads[i:i + BATCH]), 6)) for i in range(0, count, BATCH)
+        )
+        print(f"{name:7s} {size / count:6.1f} B/record, {compressed / count:5.1f} B/record gzipped, "
+              f"encode {encode_seconds / count * 1e6:5.2f} us, decode {decode_seconds / count * 1e6:5.2f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Weblog records for benchmarks.
+
+Uses data/processed_web_logs.csv (see process_csv_logs.py) when it exists,
+repeated up to the requested size, otherwise generates records with the
+same shape and the same status_messages table.
+"""
+import ast
+import json
+import os
+import random
+
+DATASET_PATH = "data/processed_web_logs.csv"
+
+STATUS_MESSAGES = {
+    200: 'Request successful',
+    201: 'Resource created',
+    301: 'Resource moved permanently',
+    302: 'Resource moved temporarily',
+    304: 'Not modified',
+    400: 'Bad request',
+    401: 'Unauthorized',
+    403: 'Forbidden',
+    404: 'Resource not found',
+    500: 'Internal server error',
+    502: 'Bad gateway',
+    503: 'Service unavailable'
+}
+STATUS_WEIGHTS = [70, 2, 3, 4, 6, 2, 2, 1, 6, 2, 1, 1]
+PATHS = ["/index.html", "/login.php", "/home.php", "/profile.php", "/process.php",
+         "/contestproblem.php", "/showcode.php", "/allsubmission.php", "/css/bootstrap.min.css",
+         "/js/jquery.min.js", "/images/logo.png", "/robots.txt", "/compiler.php", "/archive.php"]
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/58.0.3029.110",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 8_1_3)",
+    "Mozilla/5.0 (X11; Linux x86_64) Firefox/37.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_12_4) Safari/603.1.30",
+]
+REFERRERS = ["-", "http://example.com/index.html", "http://example.com/login", "https://www.google.com/"]
+
+
+def _level(status):
+    if status < 400:
+        return "INFO"
+    elif status < 500:
+        return "WARN"
+    return "ERROR"
+
+
+def iter_generated(count, seed=42):
+    """Generate weblog-shaped records."""
+    rng = random.Random(seed)
+    statuses = list(STATUS_MESSAGES)
+    ips = [f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}" for _ in range(5000)]
+    for i in range(count):
+        status = rng.choices(statuses, STATUS_WEIGHTS)[0]
+        path = rng.choice(PATHS)
+        if rng.random() < 0.3:
+            path = f"{path}?id={rng.randint(1, 5000)}"
+        second = i // 20
+        yield {
+            "timestamp": f"[{10 + second // 86400 % 20:02d}/Nov/2017:{second // 3600 % 24:02d}:{second // 60 % 60:02d}:{second % 60:02d}",
+            "level": _level(status),
+            "service": "web-server",
+            "message": f"{STATUS_MESSAGES[status]} for {path}",
+            "metadata": {
+                "ip": rng.choice(ips),
+                "method": "POST" if rng.random() < 0.15 else "GET",
+                "protocol": "HTTP/1.1",
+                "status": status,
+                "size_bytes": rng.randint(200, 50000),
+                "user_agent": rng.choice(USER_AGENTS),
+                "referrer": rng.choice(REFERRERS),
+                "request": path,
+            },
+        }
+
+
+def generate(count, seed=42):
+    """Generate a list of weblog-shaped records."""
+    return list(iter_generated(count, seed))
+
+
+def _load_dataset():
+    import pandas as pd
+    df = pd.read_csv(DATASET_PATH)
+    df['metadata'] = df['metadata'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
+    return df.to_dict('records')
+
+
+def load(count):
+    """Return `count` weblog records, from the processed dataset when available."""
+    if not os.path.exists(DATASET_PATH):
+        return generate(count)
+
+    base = _load_dataset()
+    return [dict(base[i % len(base)]) for i in range(count)]
+
+
+def iter_records(count):
+    """
+    Yield `count` freshly decoded weblog records, as if parsed off the wire.
+
+    Records are round-tripped through JSON so that no strings are shared
+    between them, without holding the whole set in memory.
+    """
+    if os.path.exists(DATASET_PATH):
+        base = _load_dataset()
+        source = (base[i % len(base)] for i in range(count))
+    else:
+        source = iter_generated(count)
+    for record in source:
+        yield json.loads(json.dumps(record, default=str))
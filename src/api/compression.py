@@ -0,0 +1,442 @@
+import json
+import zlib
+import logging
+
+from fastapi import HTTPException
+
+from ..core.config import config
+
+try:
+    import zstandard
+except ImportError:  # zstd support is optional
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # br support is optional
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Response types worth compressing
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+# Decompressed size below which the ratio check does not apply
+_RATIO_GRACE_BYTES = 1024 * 1024
+
+
+class _GzipCompressor:
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _ZstdCompressor:
+    def __init__(self, level):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class _BrotliCompressor:
+    def __init__(self, level):
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+# First two bytes of every gzip member
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class _GzipDecompressor:
+    """
+    Streaming gzip decoder for bodies of one or more members.
+
+    A gzip file may be several members back to back (RFC 1952), and
+    zlib stops at the end of the first one, so a fresh decoder is started
+    on whatever follows. Bytes that are not another member are an error.
+    """
+
+    def __init__(self):
+        self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._pending = b""
+
+    def decompress(self, data, limit):
+        """Decompress without ever producing more than `limit` + 1 bytes."""
+        chunks = []
+        produced = 0
+        data = self._pending + data
+        self._pending = b""
+        while data and produced <= limit:
+            if self._obj.eof:
+                if len(data) < len(_GZIP_MAGIC) and _GZIP_MAGIC.startswith(data):
+                    # The next member's header is split across request chunks
+                    self._pending = data
+                    break
+                if not data.startswith(_GZIP_MAGIC):
+                    raise zlib.error("trailing data after gzip stream")
+                self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            chunk = self._obj.decompress(data, limit + 1 - produced)
+            chunks.append(chunk)
+            produced += len(chunk)
+            data = self._obj.unused_data if self._obj.eof else self._obj.unconsumed_tail
+        return b"".join(chunks)
+
+    def finish(self):
+        if self._pending or not self._obj.eof:
+            raise zlib.error("truncated gzip stream")
+
+
+class _OutputLimitExceeded(Exception):
+    pass
+
+
+class _BoundedSink:
+    """File-like target for zstd output that stops once a limit is crossed."""
+
+    def __init__(self):
+        self.chunks = []
+        self.limit = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.limit -= len(data)
+        if self.limit < 0:
+            raise _OutputLimitExceeded()
+        return len(data)
+
+
+# First bytes of a zstd frame and of a skippable frame (low 4 bits vary), little-endian
+_ZSTD_MAGIC = 0xFD2FB528
+_ZSTD_SKIPPABLE_MAGIC = 0x184D2A50
+
+
+class _ZstdFrameTracker:
+    """
+    Follows zstd frame and block headers to tell whether a stream stopped mid-frame.
+
+    The streaming decompressor does not report the end of a frame, so the
+    compressed bytes are walked here: only headers are parsed, payloads are
+    skipped by length.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self._state = "magic"
+        self._needed = 4
+        self._buffer = b""
+        self._skip = 0
+        self._checksum = False
+
+    def feed(self, data):
+        pos = 0
+        while pos < len(data):
+            if self._skip:
+                step = min(self._skip, len(data) - pos)
+                self._skip -= step
+                pos += step
+                continue
+            take = min(self._needed - len(self._buffer), len(data) - pos)
+            self._buffer += data[pos:pos + take]
+            pos += take
+            if len(self._buffer) == self._needed:
+                field, self._buffer = self._buffer, b""
+                self._advance(field)
+
+    def _advance(self, field):
+        if self._state == "magic":
+            magic = int.from_bytes(field, "little")
+            if magic == _ZSTD_MAGIC:
+                self._state, self._needed = "descriptor", 1
+            elif magic & ~0xF == _ZSTD_SKIPPABLE_MAGIC:
+                self._state, self._needed = "skippable", 4
+            else:
+                raise ValueError("not a zstd frame")
+        elif self._state == "skippable":
+            self._skip = int.from_bytes(field, "little")
+            self._state, self._needed = "magic", 4
+        elif self._state == "descriptor":
+            descriptor = field[0]
+            single_segment = descriptor >> 5 & 1
+            self._checksum = bool(descriptor >> 2 & 1)
+            # Window descriptor, dictionary id and frame content size
+            self._skip = (
+                (0 if single_segment else 1)
+                + (0, 1, 2, 4)[descriptor & 3]
+                + (single_segment, 2, 4, 8)[descriptor >> 6]
+            )
+            self._state, self._needed = "block", 3
+        else:
+            header = int.from_bytes(field, "little")
+            block_type = header >> 1 & 3
+            if block_type == 3:
+                raise ValueError("reserved zstd block type")
+            # RLE blocks hold one byte however many they expand to
+            self._skip = 1 if block_type == 1 else header >> 3
+            if header & 1:
+                self._skip += 4 if self._checksum else 0
+                self._state, self._needed = "magic", 4
+                self.frames += 1
+
+    @property
+    def complete(self):
+        """True if at least one frame was seen and the stream ends between frames."""
+        return self.frames > 0 and self._state == "magic" and not self._buffer and not self._skip
+
+
+class _ZstdDecompressor:
+    def __init__(self):
+        self._sink = _BoundedSink()
+        self._writer = zstandard.ZstdDecompressor().stream_writer(self._sink, write_size=65536)
+        self._frames = _ZstdFrameTracker()
+
+    def decompress(self, data, limit):
+        self._frames.feed(data)
+        self._sink.limit = limit
+        try:
+            self._writer.write(data)
+        except _OutputLimitExceeded:
+            pass
+        out = b"".join(self._sink.chunks)
+        self._sink.chunks = []
+        return out
+
+    def finish(self):
+        if not self._frames.complete:
+            raise ValueError("truncated zstd stream")
+
+
+def available_encodings():
+    """Return the content codings this build can produce, in order of preference."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def _compressor(encoding, level):
+    if encoding == "zstd":
+        return _ZstdCompressor(level["zstd"])
+    if encoding == "br":
+        return _BrotliCompressor(level["br"])
+    return _GzipCompressor(level["gzip"])
+
+
+def _decompressor(encoding):
+    if encoding == "gzip":
+        return _GzipDecompressor()
+    if encoding == "zstd" and zstandard is not None:
+        return _ZstdDecompressor()
+    return None
+
+
+def negotiate_encoding(accept_encoding, encodings):
+    """
+    Pick a response coding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding (str): Header value, e.g. "gzip, br;q=0.9"
+        encodings (list): Codings the server can produce, most preferred first
+
+    Returns:
+        str: The chosen coding, or None to send the body uncompressed
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware for compressed request and response bodies.
+
+    Request bodies sent with `Content-Encoding: gzip` or `zstd` on the
+    configured paths are decompressed chunk by chunk as the application
+    reads them. Output is capped both in total size and in ratio to the
+    compressed input, so a decompression bomb is rejected with 413 after
+    at most one extra chunk of work.
+
+    Responses are compressed with the best coding the client accepts once
+    they reach `minimum_size`. Streaming responses are compressed and
+    flushed chunk by chunk rather than buffered.
+    """
+
+    def __init__(self, app, request_paths=(), minimum_size=None, max_decompressed_size=None,
+                 max_ratio=None, levels=None):
+        self.app = app
+        self.request_paths = tuple(request_paths)
+        self.minimum_size = minimum_size if minimum_size is not None else config.get("compression.minimum_size", 1024)
+        self.max_decompressed_size = max_decompressed_size or config.get("compression.max_request_bytes", 10 * 1024 * 1024)
+        self.max_ratio = max_ratio or config.get("compression.max_ratio", 100)
+        self.levels = {"gzip": 6, "zstd": 3, "br": 4}
+        self.levels.update(levels or {})
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_encoding = headers.get(b"content-encoding", b"").decode("latin-1").strip().lower()
+        if content_encoding and content_encoding != "identity" and scope["path"] in self.request_paths:
+            decompressor = _decompressor(content_encoding)
+            if decompressor is None:
+                await self._reject(send, 415, f"Unsupported Content-Encoding: {content_encoding}")
+                return
+            scope = dict(scope)
+            scope["headers"] = [
+                (name, value) for name, value in scope["headers"]
+                if name not in (b"content-encoding", b"content-length")
+            ]
+            receive = self._decompressing_receive(receive, decompressor)
+
+        encoding = negotiate_encoding(
+            headers.get(b"accept-encoding", b"").decode("latin-1"), self.encodings
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, self._compressing_send(send, encoding))
+
+    def _decompressing_receive(self, receive, decompressor):
+        consumed = 0
+        produced = 0
+
+        async def wrapped():
+            nonlocal consumed, produced
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            consumed += len(body)
+            try:
+                out = decompressor.decompress(body, self.max_decompressed_size - produced)
+                produced += len(out)
+                if produced > self.max_decompressed_size:
+                    raise HTTPException(status_code=413, detail="Decompressed request body too large")
+                if produced > _RATIO_GRACE_BYTES and produced > consumed * self.max_ratio:
+                    raise HTTPException(status_code=413, detail="Request body compression ratio too high")
+                if not more_body:
+                    decompressor.finish()
+            except (zlib.error, ValueError) as e:
+                raise HTTPException(status_code=400, detail=f"Invalid compressed body: {e}")
+            except HTTPException:
+                raise
+            except Exception as e:
+                if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                    raise HTTPException(status_code=400, detail=f"Invalid compressed body: {e}")
+                raise
+            return {"type": "http.request", "body": out, "more_body": more_body}
+
+        return wrapped
+
+    def _compressing_send(self, send, encoding):
+        start_message = None
+        compressor = None
+
+        async def wrapped(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                headers = dict(start_message.get("headers", []))
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                compressible = (
+                    b"content-encoding" not in headers
+                    and content_type.startswith(COMPRESSIBLE_TYPES)
+                    and (more_body or len(body) >= self.minimum_size)
+                )
+                if not compressible:
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+
+                compressor = _compressor(encoding, self.levels)
+                start_message["headers"] = [
+                    (name, value) for name, value in start_message.get("headers", [])
+                    if name != b"content-length"
+                ] + [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+                if not more_body:
+                    data = compressor.compress(body) + compressor.finish()
+                    start_message["headers"].append((b"content-length", str(len(data)).encode()))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                await send(start_message)
+                start_message = None
+
+            if compressor is None:
+                await send(message)
+                return
+            if more_body:
+                data = compressor.compress(body) + compressor.flush()
+            else:
+                data = compressor.compress(body) + compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        return wrapped
+
+    async def _reject(self, send, status_code, detail):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,136 @@
+import csv
+import importlib.util
+import io
+import json
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Columns written by the tabular formats; metadata is written as JSON text
+EXPORT_COLUMNS = (
+    "timestamp", "service", "level", "message", "metadata",
+    "_kafka_offset", "_kafka_timestamp", "_kafka_topic", "_kafka_partition", "_sample_rate",
+)
+
+
+def _json_default(value):
+    return str(value)
+
+
+def ndjson_chunks(batches):
+    """Serialize batches of records as newline-delimited JSON, one chunk per batch."""
+    for batch in batches:
+        yield "".join(json.dumps(log, default=_json_default) + "\n" for log in batch).encode()
+
+
+def _row(log):
+    row = {column: log.get(column) for column in EXPORT_COLUMNS}
+    if row["metadata"] is not None:
+        row["metadata"] = json.dumps(row["metadata"], default=_json_default)
+    return row
+
+
+def csv_chunks(batches):
+    """Serialize batches of records as CSV with a header row."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows(_row(log) for log in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Drain:
+    """Write-only file object that hands back what was written since the last take()."""
+
+    def __init__(self):
+        self._parts = []
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def parquet_available():
+    """Parquet export is optional and needs pyarrow, which is only imported when used."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("timestamp", pa.string()),
+        ("service", pa.string()),
+        ("level", pa.string()),
+        ("message", pa.string()),
+        ("metadata", pa.string()),
+        ("_kafka_offset", pa.int64()),
+        ("_kafka_timestamp", pa.int64()),
+        ("_kafka_topic", pa.string()),
+        ("_kafka_partition", pa.int64()),
+        ("_sample_rate", pa.float64()),
+    ])
+
+
+def parquet_chunks(batches):
+    """Serialize batches of records as Parquet, one row group per batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = parquet_schema()
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in batches:
+            rows = [_row(log) for log in batch]
+            columns = {}
+            for field in schema:
+                values = [row[field.name] for row in rows]
+                if pa.types.is_string(field.type):
+                    values = [None if value is None else str(value) for value in values]
+                columns[field.name] = values
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def export_chunks(export_format, batches):
+    """
+    Serialize record batches in an export format.
+
+    Args:
+        export_format (str): One of EXPORT_FORMATS
+        batches (iterable): Lists of records, as yielded by LogStore.scan()
+
+    Returns:
+        iterator: bytes chunks of the encoded export
+    """
+    if export_format == "csv":
+        return csv_chunks(batches)
+    if export_format == "parquet":
+        return parquet_chunks(batches)
+    return ndjson_chunks(batches)
@@ -26,6 +26,10 @@ class LogEntry(BaseModel):
         default_factory=dict,
         description="Additional contextual information"
     )
+    event_id: Optional[str] = Field(
+        None,
+        description="Client-generated id; entries repeating a recent id are ignored"
+    )
     
     class Config:
         schema_extra = {
@@ -1,44 +1,235 @@
-from fastapi import APIRouter, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
 from .models import LogEntry, BatchLogRequest
-from ..core.kafka_producer import kafka_logger
+from .export import EXPORT_FORMATS, MEDIA_TYPES, export_chunks, parquet_available
+from ..core.config import config
+from ..core.kafka_producer import get_kafka_logger
+from ..kafka_consumer import get_kafka_consumer
+from ..core.rate_limiter import rate_limiter, log_sampler, load_shedder, retry_after_header
+from ..core.dedup import dedup_cache
+from ..core.query import QueryError, compile_query
+from ..core.retention import GROUP_FIELDS
+from ..core.sketches import TOP_DIMENSIONS
+from ..core.avro import AvroError, SchemaError
+from ..core.schema_registry import IncompatibleSchemaError, RegistryFullError, log_subject, schema_registry
 import logging
 
 # Setup simple logger
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Content type of bulk uploads in the Avro wire format
+AVRO_CONTENT_TYPE = "application/vnd.log-entry+avro"
+
+# Bulk uploads re-check the store's water marks after this many entries
+BACKPRESSURE_CHECK_INTERVAL = 1000
+
+def _too_many_requests(detail, retry_after):
+    """Build a 429 response telling the client when to retry."""
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": retry_after_header(retry_after)}
+    )
+
+def _check_backpressure(processed=None):
+    """Reject ingestion while the log store is above its high-water mark."""
+    retry_after = load_shedder.check(get_kafka_logger().logs.retained)
+    if retry_after:
+        detail = "Log store is over capacity, retry later"
+        if processed is not None:
+            detail = f"{detail} ({processed} entries of the upload were processed)"
+        raise _too_many_requests(detail, retry_after)
+
+def _payload_too_large(detail):
+    return HTTPException(status_code=413, detail=detail)
+
+def _ingest(log_entry, idempotency_key=None):
+    """
+    Apply deduplication, rate limiting and sampling to a log entry and send it to Kafka.
+    
+    Args:
+        log_entry: The validated log entry
+        idempotency_key: Key from the Idempotency-Key header, overrides event_id
+    
+    Returns:
+        str: "accepted", "sampled_out" or "duplicate"
+    """
+    key = idempotency_key or log_entry.event_id
+    # Keys are scoped to the service so that clients cannot collide across services
+    dedup_key = f"{log_entry.service}\x00{key}" if key else None
+    # seen() and the add() below are not one atomic step. That is only safe because
+    # every caller runs on the event loop and nothing in between awaits; keep it so.
+    if dedup_key and dedup_cache.seen(dedup_key):
+        return "duplicate"
+    
+    retry_after = rate_limiter.acquire(log_entry.service)
+    if retry_after:
+        raise _too_many_requests(f"Rate limit exceeded for service {log_entry.service}", retry_after)
+    
+    log_data = log_entry.dict(exclude={"event_id"} if log_entry.event_id is None else None)
+    outcome = "sampled_out"
+    if log_sampler.keep(log_data):
+        response = get_kafka_logger().send_log(log_data)
+        
+        if response["status"] == "error":
+            logger.error(f"Failed to send log: {response['message']}")
+            raise HTTPException(status_code=500, detail=response["message"])
+        outcome = "accepted"
+    
+    # Only marked once the entry is stored (or sampled out), so a retry after a failure gets through
+    if dedup_key:
+        dedup_cache.add(dedup_key)
+    return outcome
+
 @router.post("/log")
-async def create_log(log_entry: LogEntry):
+async def create_log(log_entry: LogEntry, idempotency_key: str = Header(None)):
     """
     Submit a new log entry to the logging system.
     
     The log entry will be validated and sent to Kafka for processing.
+    Returns 429 with a Retry-After header when the service exceeds its rate
+    limit or the log store is over capacity. An entry whose Idempotency-Key
+    header or event_id was already seen recently is acknowledged but not
+    stored again.
     """
-    logger.debug(f"Received log entry: {log_entry.dict()}")
-    
-    response = kafka_logger.send_log(log_entry.dict())
+    logger.debug("Received log entry: %s", log_entry)
+    _check_backpressure()
     
-    if response["status"] == "error":
-        logger.error(f"Failed to send log: {response['message']}")
-        raise HTTPException(status_code=500, detail=response["message"])
+    outcome = _ingest(log_entry, idempotency_key)
+    if outcome == "sampled_out":
+        return {"status": "success", "message": "Log entry sampled out"}
+    if outcome == "duplicate":
+        return {"status": "success", "message": "Duplicate log entry ignored", "duplicate": True}
         
     return {"status": "success", "message": "Log entry accepted"}
 
+@router.post("/logs/bulk")
+async def create_logs_bulk(request: Request):
+    """
+    Submit many log entries as newline-delimited JSON, or as Avro.
+    
+    The NDJSON body is parsed line by line as it arrives, so large uploads
+    can be sent with Content-Encoding: gzip or zstd without being held in
+    memory. With Content-Type application/vnd.log-entry+avro the body is a
+    sequence of Avro-encoded entries, each prefixed with the magic byte 0 and
+    the 4-byte id of its schema in the schema registry; a malformed body is
+    rejected as a whole. Entries that fail validation or hit their service's
+    rate limit are counted and skipped rather than failing the whole upload,
+    as are entries whose event_id was already seen recently.
+    
+    Returns 413 once the body exceeds ingest.max_body_bytes or a line exceeds
+    ingest.max_line_bytes, and 429 if the log store goes over capacity
+    during the upload; entries before that point have been ingested.
+    """
+    _check_backpressure()
+    max_body = config.get("ingest.max_body_bytes", 64 * 1024 * 1024)
+    max_line = config.get("ingest.max_line_bytes", 1024 * 1024)
+    counts = {"accepted": 0, "sampled_out": 0, "duplicate": 0, "rate_limited": 0, "invalid": 0}
+    processed = 0
+    
+    def ingest(parse):
+        nonlocal processed
+        processed += 1
+        if processed % BACKPRESSURE_CHECK_INTERVAL == 0:
+            _check_backpressure(processed - 1)
+        try:
+            outcome = _ingest(parse())
+        except ValidationError:
+            counts["invalid"] += 1
+        except HTTPException as e:
+            if e.status_code != 429:
+                raise
+            counts["rate_limited"] += 1
+        else:
+            counts[outcome] += 1
+    
+    def ingest_line(line):
+        if len(line) > max_line:
+            raise _payload_too_large(f"Entry {processed + 1} is longer than {max_line} bytes")
+        if line.strip():
+            ingest(lambda: LogEntry.parse_raw(line))
+    
+    async def body_chunks():
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_body:
+                raise _payload_too_large(f"Request body is larger than {max_body} bytes")
+            yield chunk
+    
+    if request.headers.get("content-type", "").split(";")[0].strip() == AVRO_CONTENT_TYPE:
+        body = b"".join([chunk async for chunk in body_chunks()])
+        try:
+            records = schema_registry.decode_all(body, log_subject())
+        except (AvroError, SchemaError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid Avro body: {e}")
+        for record in records:
+            # Optional fields are always present in Avro, so unset ones arrive as null
+            ingest(lambda: LogEntry(**{key: value for key, value in record.items() if value is not None}))
+    else:
+        # The unfinished last line is kept as a list of pieces, so a long line is not re-scanned per chunk
+        pending = []
+        pending_size = 0
+        async for chunk in body_chunks():
+            *lines, tail = chunk.split(b"\n")
+            if lines:
+                lines[0] = b"".join(pending + [lines[0]])
+                pending, pending_size = [], 0
+                for line in lines:
+                    ingest_line(line)
+            if tail:
+                pending.append(tail)
+                pending_size += len(tail)
+                if pending_size > max_line:
+                    raise _payload_too_large(f"Entry {processed + 1} is longer than {max_line} bytes")
+        ingest_line(b"".join(pending))
+    
+    logger.info(f"Bulk upload processed: {counts}")
+    return {"status": "success", **counts}
+
+async def _kaggle_data():
+    """
+    Return the Kaggle dataset without blocking the event loop.
+
+    Until the startup warm-up finishes, loading or waiting for the dataset
+    takes seconds, so it is done in the threadpool where it cannot hold up
+    other requests such as /ready and /health.
+    """
+    dataset = get_kafka_logger().dataset
+    if dataset.loaded:
+        return dataset.get()
+    return await run_in_threadpool(dataset.get)
+
+def _kaggle_entry(kaggle_data, index):
+    """Validate a Kaggle dataset record as a log entry, so it goes through the same guards as /log."""
+    if not 0 <= index < len(kaggle_data):
+        raise HTTPException(status_code=404, detail=f"Index out of range (0-{len(kaggle_data)-1})")
+    return LogEntry(**kaggle_data[index])
+
 @router.get("/kaggle/{index}")
 async def send_kaggle_log(index: int):
     """
     Send a log entry from the Kaggle dataset.
     
+    Rate limits and sampling apply as for POST /log.
+    
     Args:
         index: Index in the Kaggle dataset
     """
     logger.info(f"Sending Kaggle log at index {index}")
-    response = kafka_logger.send_kaggle_log(index)
-    
-    if response["status"] == "error":
-        raise HTTPException(status_code=404, detail=response["message"])
+    _check_backpressure()
+    try:
+        entry = _kaggle_entry(await _kaggle_data(), index)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Dataset record {index} is not a valid log entry: {e}")
+    outcome = _ingest(entry)
+    if outcome == "sampled_out":
+        return {"status": "success", "message": f"Kaggle log at index {index} sampled out"}
         
     return {"status": "success", "message": f"Kaggle log at index {index} sent"}
 
@@ -47,23 +238,49 @@ async def send_batch_logs(request: BatchLogRequest):
     """
     Send multiple logs from the Kaggle dataset.
     
+    Rate limits and sampling apply as for POST /log; entries over their
+    service's rate limit or that are not valid log entries are counted and
+    skipped.
+    
     Args:
         request: Batch request parameters
     """
     logger.info(f"Sending batch of {request.count} Kaggle logs starting at index {request.start_index}")
-    response = kafka_logger.send_batch_logs(request.start_index, request.count)
+    _check_backpressure()
+    kaggle_data = await _kaggle_data()
+    end_index = min(request.start_index + request.count, len(kaggle_data))
+    if request.start_index < 0 or request.start_index >= end_index:
+        raise HTTPException(status_code=404, detail=f"Index out of range (0-{len(kaggle_data)-1})")
     
-    if response["status"] == "error":
-        raise HTTPException(status_code=500, detail=response["message"])
+    counts = {"accepted": 0, "sampled_out": 0, "duplicate": 0, "rate_limited": 0, "invalid": 0}
+    for index in range(request.start_index, end_index):
+        try:
+            counts[_ingest(_kaggle_entry(kaggle_data, index))] += 1
+        except ValidationError:
+            counts["invalid"] += 1
+        except HTTPException as e:
+            if e.status_code != 429:
+                raise
+            counts["rate_limited"] += 1
         
     return {
         "status": "success", 
-        "message": f"Sent {response['success_count']} logs",
-        "success_count": response["success_count"]
+        "message": f"Sent {counts['accepted']} logs",
+        "success_count": counts["accepted"],
+        **counts
     }
 
+def _compile_query(q):
+    """Compile a filter expression, turning syntax errors into a 400 response."""
+    if not q:
+        return None
+    try:
+        return compile_query(q)
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid query: {e}")
+
 @router.get("/logs")
-async def get_logs(limit: int = 10, service: str = None, level: str = None):
+async def get_logs(limit: int = 10, service: str = None, level: str = None, q: str = None):
     """
     Retrieve logs from the in-memory store.
     
@@ -71,17 +288,16 @@ async def get_logs(limit: int = 10, service: str = None, level: str = None):
         limit: Maximum number of logs to return
         service: Filter by service name
         level: Filter by log level
+        q: Filter expression, e.g. metadata.status >= 500 AND metadata.method = "POST"
     """
-    logs = kafka_logger.logs.copy()
-    
-    # Apply filters
-    if service:
-        logs = [log for log in logs if log.get("service") == service]
-    if level:
-        logs = [log for log in logs if log.get("level") == level]
+    where = _compile_query(q)
+    logs = []
     
-    # Get the most recent logs
-    logs = logs[:limit]
+    # Apply filters, stopping as soon as enough logs are found
+    for batch in get_kafka_logger().logs.scan(service=service or None, level=level or None, where=where):
+        logs.extend(batch[:limit - len(logs)])
+        if len(logs) >= limit:
+            break
     
     return {
         "status": "success",
@@ -89,6 +305,254 @@ async def get_logs(limit: int = 10, service: str = None, level: str = None):
         "logs": logs
     }
 
+def _epoch_ms(value):
+    return None if value is None else int(value.timestamp() * 1000)
+
+@router.get("/logs/export")
+def export_logs(format: str = "ndjson", start_offset: int = 0, end_offset: int = None,
+                since: datetime = None, until: datetime = None,
+                service: str = None, level: str = None, q: str = None):
+    """
+    Stream a filtered range of logs as NDJSON, CSV or Parquet.
+    
+    The export is generated one store chunk at a time, so memory use does
+    not depend on the size of the range. The range ends at the current
+    number of logs unless end_offset is given.
+    
+    Args:
+        format: ndjson, csv or parquet
+        start_offset: First Kafka offset to export
+        end_offset: Offset to stop before
+        since: Only logs received at or after this time (ISO-8601)
+        until: Only logs received before this time (ISO-8601)
+        service: Filter by service name
+        level: Filter by log level
+        q: Filter expression, as for GET /logs
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    where = _compile_query(q)
+    
+    store = get_kafka_logger().logs
+    if end_offset is None:
+        end_offset = len(store)
+    batches = store.scan(
+        start=start_offset, end=end_offset, service=service, level=level,
+        since_ms=_epoch_ms(since), until_ms=_epoch_ms(until), where=where
+    )
+    logger.info(f"Exporting logs {start_offset}-{end_offset} as {format}")
+    
+    return StreamingResponse(
+        export_chunks(format, batches),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="logs.{format}"'}
+    )
+
+@router.get("/logs/timeline")
+async def get_timeline(resolution: int = 60, since: datetime = None, until: datetime = None,
+                       service: str = None, group_by: str = "level"):
+    """
+    Count logs per time bucket, including history that is only kept as rollups.
+    
+    Recent logs are counted from the raw store, older ones from per-minute
+    and per-hour rollups. The resolution is raised to the coarsest rollup
+    tier the range reaches into; the effective value is returned.
+    
+    Args:
+        resolution: Requested bucket width in seconds
+        since: Start of the range (ISO-8601)
+        until: End of the range (ISO-8601)
+        service: Only logs from this service
+        group_by: level, service or status
+    """
+    if group_by not in GROUP_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Unsupported group_by: {group_by}")
+    if resolution < 1:
+        raise HTTPException(status_code=400, detail="resolution must be at least 1 second")
+    
+    timeline = get_kafka_logger().retention.timeline(
+        resolution_seconds=resolution, since_ms=_epoch_ms(since), until_ms=_epoch_ms(until),
+        service=service or None, group_by=group_by
+    )
+    return {"status": "success", **timeline}
+
+@router.get("/logs/rollups")
+async def get_rollups(tier: str = "minute", since: datetime = None, until: datetime = None, limit: int = 100):
+    """
+    List rollup buckets with counts by service, level and status, byte sums and top paths.
+    
+    Args:
+        tier: minute or hour
+        since: Start of the range (ISO-8601)
+        until: End of the range (ISO-8601)
+        limit: Maximum number of buckets to return, most recent last
+    """
+    if tier not in ("minute", "hour"):
+        raise HTTPException(status_code=400, detail=f"Unsupported tier: {tier}")
+    
+    retention = get_kafka_logger().retention
+    rollups = retention.rollups(tier, since_ms=_epoch_ms(since), until_ms=_epoch_ms(until))
+    return {
+        "status": "success",
+        "retention": retention.stats(),
+        "rollups": rollups[-limit:] if limit > 0 else []
+    }
+
+@router.get("/stats/top")
+async def get_top_values(dimension: str = "ip", k: int = 10, window: float = None):
+    """
+    Most frequent client IPs, request paths or user agents, from streaming sketches.
+    
+    Counts are upper bounds; the true count lies between count - error and count.
+    
+    Args:
+        dimension: ip, path or user_agent
+        k: Number of values to return
+        window: Seconds to look back, defaults to every window kept
+    """
+    if dimension not in TOP_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported dimension: {dimension}")
+    if k < 1:
+        raise HTTPException(status_code=400, detail="k must be at least 1")
+    if window is not None and window <= 0:
+        raise HTTPException(status_code=400, detail="window must be positive")
+    
+    sketches = get_kafka_logger().sketches
+    return {
+        "status": "success",
+        "dimension": dimension,
+        "window_seconds": window if window is not None else sketches.window * sketches.windows / 1000,
+        "top": sketches.top(dimension, k=k, window_seconds=window)
+    }
+
+@router.get("/stats/cardinality")
+async def get_cardinality(window: float = None, service: str = None):
+    """
+    Estimated unique client IPs per service, from HyperLogLog sketches.
+    
+    Args:
+        window: Seconds to look back, defaults to every window kept
+        service: Only this service
+    """
+    if window is not None and window <= 0:
+        raise HTTPException(status_code=400, detail="window must be positive")
+    
+    sketches = get_kafka_logger().sketches
+    estimate = sketches.cardinality(window_seconds=window, service=service or None)
+    return {
+        "status": "success",
+        "window_seconds": window if window is not None else sketches.window * sketches.windows / 1000,
+        "unique_ips": estimate["services"],
+        "total_unique_ips": estimate["total"]
+    }
+
+@router.get("/templates")
+async def get_templates(limit: int = 100):
+    """
+    List the message templates mined from stored logs.
+    
+    Args:
+        limit: Maximum number of templates to return, most frequent first
+    """
+    templates = get_kafka_logger().logs.template_counts()
+    
+    return {
+        "status": "success",
+        "total_templates": len(templates),
+        "templates": templates[:limit]
+    }
+
+@router.get("/dlq")
+async def get_dead_letters(limit: int = 100, subscriber: str = None):
+    """
+    Inspect messages that consumers failed to process.
+    
+    Args:
+        limit: Maximum number of entries to return, oldest first
+        subscriber: Only entries for this subscriber
+    """
+    consumer = get_kafka_consumer()
+    entries = consumer.dead_letters.list(limit=limit, subscriber=subscriber)
+    
+    return {
+        "status": "success",
+        "count": len(entries),
+        "total": len(consumer.dead_letters),
+        "dropped": consumer.dead_letters.dropped,
+        "subscribers": consumer.subscriber_status(),
+        "entries": entries
+    }
+
+@router.post("/dlq/{entry_id}/replay")
+async def replay_dead_letter(entry_id: int, reset_breaker: bool = False):
+    """
+    Redeliver a dead-lettered message to its subscriber.
+    
+    Args:
+        entry_id: Dead-letter entry id
+        reset_breaker: Close the subscriber's circuit breaker before replaying
+    """
+    response = get_kafka_consumer().replay_dead_letter(entry_id, reset_breaker=reset_breaker)
+    
+    if response["status"] == "error":
+        raise HTTPException(status_code=404, detail=response["message"])
+        
+    return response
+
+@router.get("/schemas/ids/{schema_id}")
+async def get_schema_by_id(schema_id: int):
+    """Return the schema with a given id, as used in the header of Avro messages."""
+    try:
+        return {"id": schema_id, "schema": schema_registry.get(schema_id).definition}
+    except SchemaError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/schemas/{subject}")
+async def get_schema(subject: str):
+    """
+    Return the latest schema version of a subject, e.g. logs-value for log entries.
+    """
+    versions = schema_registry.versions(subject)
+    if not versions:
+        raise HTTPException(status_code=404, detail=f"Unknown subject {subject}")
+    return {
+        "subject": subject,
+        "id": versions[-1],
+        "version": len(versions),
+        "versions": versions,
+        "compatibility": schema_registry.compatibility,
+        "schema": schema_registry.get(versions[-1]).definition
+    }
+
+@router.post("/schemas/{subject}")
+async def register_schema(subject: str, request: Request):
+    """
+    Register a new schema version for a subject.
+    
+    The body is the Avro schema. Returns 409 if it is not compatible with
+    the latest version under the registry's compatibility mode, and 507 if
+    the registry is full. Registration is disabled unless
+    schema_registry.allow_writes is set, since a compatible version can
+    still drop fields every log needs, and only the log entry subject can
+    be written unless schema_registry.allow_any_subject is set too.
+    """
+    if not config.get("schema_registry.allow_writes"):
+        raise HTTPException(status_code=403, detail="Schema registration is disabled")
+    if subject != log_subject() and not config.get("schema_registry.allow_any_subject"):
+        raise HTTPException(status_code=403, detail=f"Only {log_subject()} can be registered")
+    try:
+        schema_id = schema_registry.register(subject, await request.body())
+    except IncompatibleSchemaError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except RegistryFullError as e:
+        raise HTTPException(status_code=507, detail=str(e))
+    except SchemaError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid schema: {e}")
+    return {"status": "success", "subject": subject, "id": schema_id,
+            "version": schema_registry.versions(subject).index(schema_id) + 1}
+
 @router.get("/health")
 async def health_check():
     """
@@ -96,11 +560,27 @@ async def health_check():
     """
     return {"status": "healthy", "mode": "development"}
 
+@router.get("/ready")
+async def readiness_check():
+    """
+    Report whether the service is ready to serve dataset requests.
+    
+    Returns 503 until the dataset served by /kaggle and /dataset/info,
+    data/processed_web_logs.csv or the built-in mock data if it is missing,
+    has finished loading.
+    """
+    kafka_logger = get_kafka_logger()
+    if not kafka_logger.dataset.loaded:
+        return JSONResponse(status_code=503, content={"status": "loading", "dataset_loaded": False})
+    
+    return {"status": "ready", "dataset_loaded": True, "total_logs": len(kafka_logger.kaggle_data)}
+
 @router.get("/dataset/info")
 async def get_dataset_info():
     """Get information about the loaded Kaggle dataset."""
+    kaggle_data = await _kaggle_data()
     return {
         "status": "success",
-        "total_logs": len(kafka_logger.kaggle_data),
-        "sample": kafka_logger.kaggle_data[:3]
+        "total_logs": len(kaggle_data),
+        "sample": kaggle_data[:3]
     }
\ No newline at end of file
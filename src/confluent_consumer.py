@@ -0,0 +1,218 @@
+import logging
+import threading
+from collections import deque
+
+from .core.log_store import records_to_columns
+from .core.serializers import DESERIALIZERS, json_deserializer
+from .kafka_consumer import KafkaConsumer
+
+logger = logging.getLogger(__name__)
+
+
+class _InFlight:
+    """One consume() batch whose offsets are committed once every delivery has finished."""
+
+    __slots__ = ("last_messages", "outstanding")
+
+    def __init__(self, last_messages):
+        self.last_messages = last_messages  # (topic, partition) -> last message in the batch
+        self.outstanding = 1  # held by the dispatcher until all deliveries are started
+
+
+class ConfluentKafkaConsumer(KafkaConsumer):
+    """
+    Consumer backend reading a Kafka topic with confluent_kafka.Consumer.
+
+    Messages are fetched with batched consume() calls and decoded by a
+    pluggable deserializer. Per-message subscribers get each record, batch
+    subscribers get the batch in pieces of at most max_batch, so their
+    latency is bounded by the poll timeout rather than max_latency_ms.
+
+    Offsets are committed manually and asynchronously. A batch is committed
+    once every subscriber has received it or it was dead-lettered, and
+    only after all earlier batches, so a restart redelivers anything that
+    was still being retried. While more than max_in_flight batches are
+    uncommitted the assigned partitions are paused.
+    """
+
+    def __init__(self, client, topics, deserializer=json_deserializer, batch_size=500,
+                 poll_timeout=0.1, max_in_flight=20):
+        """
+        Args:
+            client: A confluent_kafka.Consumer, or an object with the same methods
+            topics (list): Topics to subscribe to
+            deserializer (callable): Turns a message value (bytes) into a log dict
+            batch_size (int): Largest number of messages per consume() call
+            poll_timeout (float): Longest time in seconds a consume() call waits
+            max_in_flight (int): Uncommitted batches allowed before partitions are paused
+        """
+        self._setup(topics[0])
+        self.client = client
+        self.topics = topics
+        self.deserializer = deserializer
+        self.batch_size = batch_size
+        self.poll_timeout = poll_timeout
+        self.max_in_flight = max_in_flight
+        self.paused = False
+        self._in_flight = deque()
+        self._ready = {}  # (topic, partition) -> last message that may be committed
+        self._commit_lock = threading.Lock()
+        logger.info(f"Kafka consumer initialized for topics {topics}")
+
+    @classmethod
+    def from_config(cls, cfg):
+        from confluent_kafka import Consumer
+
+        name = cfg.get("consumer.deserializer", "json")
+        if name not in DESERIALIZERS:
+            raise ValueError(f"Unknown consumer deserializer: {name}")
+        client = Consumer({
+            "bootstrap.servers": cfg.get("kafka.bootstrap_servers"),
+            "group.id": cfg.get("kafka.group_id", "kafka-log-api"),
+            "auto.offset.reset": cfg.get("kafka.auto_offset_reset", "earliest"),
+            "enable.auto.commit": False,
+        })
+        return cls(
+            client,
+            topics=[cfg.get("kafka.topic_name", "logs")],
+            deserializer=DESERIALIZERS[name],
+            batch_size=cfg.get("consumer.batch_size", 500),
+            poll_timeout=cfg.get("consumer.poll_timeout_ms", 100) / 1000,
+            max_in_flight=cfg.get("consumer.max_in_flight_batches", 20),
+        )
+
+    def _consume_loop(self):
+        """Main loop: consume a batch, dispatch it, commit what has finished."""
+        self.client.subscribe(self.topics, on_assign=self._on_assign, on_revoke=self._on_revoke)
+        try:
+            while self.is_running:
+                self._apply_backpressure()
+                # Paused partitions return nothing, but consume() still serves rebalance callbacks
+                messages = self.client.consume(num_messages=self.batch_size, timeout=self.poll_timeout)
+                if messages:
+                    try:
+                        self._dispatch(messages)
+                    except Exception:
+                        # The batch is not committed, so a restart redelivers it
+                        logger.exception(f"Failed to dispatch a batch of {len(messages)} messages")
+                self._commit_ready()
+        except Exception:
+            logger.exception("Kafka consume loop failed")
+            # Let start() run the loop again
+            self.is_running = False
+        finally:
+            self._commit_ready(asynchronous=False)
+            self.client.close()
+
+    def _dispatch(self, messages):
+        """Decode a consume() batch and deliver it to every subscriber."""
+        records = []
+        last_messages = {}
+        for message in messages:
+            error = message.error()
+            if error is not None:
+                logger.error(f"Kafka consume error: {error}")
+                continue
+            last_messages[(message.topic(), message.partition())] = message
+            value = message.value()
+            if value is None:
+                # A tombstone deletes a key under compaction; it carries no log
+                continue
+            try:
+                record = self.deserializer(value)
+                if not isinstance(record, dict):
+                    raise ValueError(f"Expected a log record, got {type(record).__name__}")
+            except Exception as e:
+                self.dead_letters.add("deserializer", {
+                    "topic": message.topic(),
+                    "partition": message.partition(),
+                    "offset": message.offset(),
+                    "value": repr(value[:1000]),
+                }, str(e), 1)
+                continue
+            record["_kafka_topic"] = message.topic()
+            record["_kafka_partition"] = message.partition()
+            record["_kafka_offset"] = message.offset()
+            record["_kafka_timestamp"] = message.timestamp()[1]
+            records.append(record)
+        if not last_messages:
+            return
+
+        batch = _InFlight(last_messages)
+        done = lambda: self._complete(batch)
+        with self.lock:
+            consumers, batch_consumers = list(self.consumers), list(self.batch_consumers)
+        with self._commit_lock:
+            self._in_flight.append(batch)
+            batch.outstanding += len(records) * len(consumers) + sum(
+                -(-len(records) // subscriber.max_batch) for subscriber in batch_consumers
+            )
+        # Delivered to the subscribers counted above, without holding the registration lock
+        for record in records:
+            self._process_message(record, done, consumers)
+        for subscriber in batch_consumers:
+            for start in range(0, len(records), subscriber.max_batch):
+                chunk = records[start:start + subscriber.max_batch]
+                if subscriber.columnar:
+                    chunk = records_to_columns(chunk)
+                self._deliver(subscriber, chunk, 0, done)
+        done()
+
+    def _complete(self, batch):
+        """Count down one delivery of a batch and release finished batches for commit, in order."""
+        with self._commit_lock:
+            batch.outstanding -= 1
+            while self._in_flight and self._in_flight[0].outstanding == 0:
+                self._ready.update(self._in_flight.popleft().last_messages)
+
+    def _commit_ready(self, asynchronous=True, partitions=None):
+        """Commit the offsets after the last finished message of each partition."""
+        with self._commit_lock:
+            if partitions is None:
+                ready, self._ready = self._ready, {}
+            else:
+                ready = {key: self._ready.pop(key) for key in partitions if key in self._ready}
+        for message in ready.values():
+            try:
+                self.client.commit(message=message, asynchronous=asynchronous)
+            except Exception as e:
+                logger.warning(f"Offset commit failed for {message.topic()}[{message.partition()}]: {e}")
+
+    def _apply_backpressure(self):
+        """Pause the assignment while too many batches are uncommitted, resume once they drain."""
+        with self._commit_lock:
+            in_flight = len(self._in_flight)
+        if not self.paused and in_flight > self.max_in_flight:
+            self.client.pause(self.client.assignment())
+            self.paused = True
+            logger.warning(f"Paused consumption with {in_flight} uncommitted batches")
+        elif self.paused and in_flight <= self.max_in_flight // 2:
+            self.client.resume(self.client.assignment())
+            self.paused = False
+            logger.info("Resumed consumption")
+
+    def _on_assign(self, client, partitions):
+        logger.info(f"Assigned partitions: {[(p.topic, p.partition) for p in partitions]}")
+        if self.paused:
+            client.pause(partitions)
+
+    def _on_revoke(self, client, partitions):
+        """Commit finished offsets of revoked partitions and stop tracking the rest."""
+        revoked = {(p.topic, p.partition) for p in partitions}
+        logger.info(f"Revoked partitions: {sorted(revoked)}")
+        with self._commit_lock:
+            # Unfinished messages of these partitions are redelivered to their new owner
+            for batch in self._in_flight:
+                for key in revoked:
+                    batch.last_messages.pop(key, None)
+        self._commit_ready(asynchronous=False, partitions=revoked)
+
+    def status(self):
+        """Return backpressure and commit state."""
+        with self._commit_lock:
+            in_flight = len(self._in_flight)
+        return {
+            "paused": self.paused,
+            "in_flight_batches": in_flight,
+            "assignment": [(p.topic, p.partition) for p in self.client.assignment()],
+        }
@@ -0,0 +1,702 @@
+"""
+Avro binary encoding for the subset of Avro used by log schemas.
+
+Supported types are null, boolean, int, long, float, double, bytes, string,
+record, enum, array, map, unions and references to named types, including
+recursive ones. fixed and logical types are not supported.
+
+Schemas are compiled once into closures. A decoder is compiled for a pair
+of schemas, the writer's and the reader's, and resolves one against the
+other as the Avro specification describes: fields the reader does not
+know are skipped, fields the writer did not have get the reader's default
+and numbers are promoted (int to long, float or double and so on). This
+is what lets data written with an older or newer schema version be read.
+"""
+import copy
+import json
+import struct
+
+PRIMITIVES = ("null", "boolean", "int", "long", "float", "double", "bytes", "string")
+
+# Writer types each reader type can be read from, besides itself
+_PROMOTIONS = {
+    "long": ("int",),
+    "float": ("int", "long"),
+    "double": ("int", "long", "float"),
+    "string": ("bytes",),
+    "bytes": ("string",),
+}
+
+_INT_RANGE = (-2 ** 31, 2 ** 31)
+_LONG_RANGE = (-2 ** 63, 2 ** 63)
+_FLOAT = struct.Struct("<f")
+_DOUBLE = struct.Struct("<d")
+_MISSING = object()
+
+# Array and map items one decoded value may hold; items such as nulls take no bytes
+MAX_ITEMS = 1 << 20
+
+# A zig-zag varint holding a 64-bit long is at most 10 bytes
+_MAX_VARINT_SHIFT = 7 * 10
+
+
+class SchemaError(ValueError):
+    """Raised for invalid schemas and for schemas that cannot read each other's data."""
+
+
+class AvroError(ValueError):
+    """Raised for values that do not match a schema and for malformed data."""
+
+
+class Cursor:
+    """Read position in a buffer holding one or more encoded values."""
+
+    __slots__ = ("data", "pos", "items_left")
+
+    def __init__(self, data, pos=0):
+        self.data = bytes(data)
+        self.pos = pos
+        self.items_left = MAX_ITEMS
+
+    def at_end(self):
+        return self.pos >= len(self.data)
+
+
+class Schema:
+    """A parsed schema with its named types, and its compiled encoder."""
+
+    def __init__(self, definition):
+        """
+        Args:
+            definition: The schema as JSON text or as parsed JSON
+
+        Raises:
+            SchemaError: If the schema is invalid or uses unsupported types
+        """
+        if isinstance(definition, (str, bytes)):
+            try:
+                definition = json.loads(definition)
+            except ValueError as e:
+                raise SchemaError(f"Schema is not valid JSON: {e}")
+        self.definition = definition
+        self.canonical = json.dumps(definition, sort_keys=True, separators=(",", ":"))
+        self.names = {}
+        self.root = _parse(definition, self.names, None)
+        self._encoder = None
+
+    def encode(self, value, out=None):
+        """
+        Append the binary encoding of a value to `out`.
+
+        Returns:
+            bytearray: `out`, or a new bytearray if none was given
+        """
+        if self._encoder is None:
+            self._encoder = _writer(self.root, self.names, {})
+        out = bytearray() if out is None else out
+        try:
+            self._encoder(value, out)
+        except (TypeError, AttributeError, OverflowError, UnicodeError) as e:
+            raise AvroError(f"Value does not match schema: {e}")
+        except RecursionError:
+            raise AvroError("Value is nested too deeply")
+        return out
+
+    def decoder(self, reader=None, max_items=MAX_ITEMS):
+        """
+        Compile a decoder for data written with this schema.
+
+        Args:
+            reader (Schema): Schema to resolve the data to, defaults to this one
+            max_items (int): Array and map items allowed in one decoded value
+
+        Returns:
+            callable: Takes a Cursor and returns the next decoded value
+        """
+        reader = reader or self
+        read = _reader(self.root, reader.root, self.names, reader.names, {})
+
+        def decode(cursor):
+            cursor.items_left = max_items
+            try:
+                return read(cursor)
+            except (IndexError, UnicodeDecodeError, struct.error) as e:
+                raise AvroError(f"Malformed data at byte {cursor.pos}: {e}")
+            except RecursionError:
+                raise AvroError(f"Data nested too deeply at byte {cursor.pos}")
+        return decode
+
+
+def _full_name(name, namespace):
+    if "." in name or not namespace:
+        return name
+    return f"{namespace}.{name}"
+
+
+def _parse(node, names, namespace):
+    """Normalize a schema node: primitives and references become names, unions lists."""
+    if isinstance(node, str):
+        if node in PRIMITIVES:
+            return node
+        for name in (_full_name(node, namespace), node):
+            if name in names:
+                return name
+        raise SchemaError(f"Unknown type: {node}")
+    if isinstance(node, list):
+        branches = [_parse(branch, names, namespace) for branch in node]
+        kinds = [_kind(branch, names) for branch in branches]
+        unnamed = [kind for kind, branch in zip(kinds, branches) if kind not in ("record", "enum")]
+        if len(set(unnamed)) != len(unnamed) or any(kind == "union" for kind in kinds):
+            raise SchemaError("Unions may not repeat a type or contain unions")
+        return branches
+    if not isinstance(node, dict) or "type" not in node:
+        raise SchemaError(f"Invalid schema: {node!r}")
+
+    kind = node["type"]
+    if kind in PRIMITIVES:
+        return kind
+    if kind == "array":
+        return {"type": "array", "items": _parse(node.get("items"), names, namespace)}
+    if kind == "map":
+        return {"type": "map", "values": _parse(node.get("values"), names, namespace)}
+    if kind in ("record", "enum"):
+        if not isinstance(node.get("name"), str):
+            raise SchemaError(f"A {kind} needs a name")
+        namespace = node.get("namespace", namespace)
+        name = _full_name(node["name"], namespace)
+        if name in names:
+            raise SchemaError(f"Type {name} is defined twice")
+        if "." in name:
+            namespace = name.rsplit(".", 1)[0]
+        if kind == "enum":
+            symbols = node.get("symbols")
+            if not isinstance(symbols, list) or len(set(symbols)) != len(symbols):
+                raise SchemaError(f"Enum {name} needs unique symbols")
+            names[name] = {"type": "enum", "name": name, "symbols": symbols, "default": node.get("default", _MISSING)}
+            return names[name]
+        record = names[name] = {"type": "record", "name": name, "fields": []}
+        for field in node.get("fields", ()):
+            if not isinstance(field, dict) or not isinstance(field.get("name"), str):
+                raise SchemaError(f"Invalid field in record {name}: {field!r}")
+            record["fields"].append({
+                "name": field["name"],
+                "type": _parse(field.get("type"), names, namespace),
+                "default": field.get("default", _MISSING),
+            })
+        return record
+    if isinstance(kind, (dict, list)) or kind in names:
+        return _parse(kind, names, namespace)
+    raise SchemaError(f"Unsupported type: {kind}")
+
+
+def _resolve(node, names):
+    return names[node] if isinstance(node, str) and node not in PRIMITIVES else node
+
+
+def _kind(node, names):
+    node = _resolve(node, names)
+    if isinstance(node, str):
+        return node
+    if isinstance(node, list):
+        return "union"
+    return node["type"]
+
+
+def _short_name(node):
+    return node["name"].rsplit(".", 1)[-1]
+
+
+# Encoding
+
+def _write_long(value, out):
+    if type(value) is not int or not _LONG_RANGE[0] <= value < _LONG_RANGE[1]:
+        raise AvroError(f"Expected a long, got {value!r}")
+    n = (value << 1) ^ (value >> 63)
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _write_int(value, out):
+    if type(value) is not int or not _INT_RANGE[0] <= value < _INT_RANGE[1]:
+        raise AvroError(f"Expected an int, got {value!r}")
+    _write_long(value, out)
+
+
+def _write_null(value, out):
+    if value is not None:
+        raise AvroError(f"Expected null, got {value!r}")
+
+
+def _write_boolean(value, out):
+    if type(value) is not bool:
+        raise AvroError(f"Expected a boolean, got {value!r}")
+    out.append(1 if value else 0)
+
+
+def _write_float(value, out):
+    if type(value) not in (float, int):
+        raise AvroError(f"Expected a float, got {value!r}")
+    out += _FLOAT.pack(value)
+
+
+def _write_double(value, out):
+    if type(value) not in (float, int):
+        raise AvroError(f"Expected a double, got {value!r}")
+    out += _DOUBLE.pack(value)
+
+
+def _write_bytes(value, out):
+    if not isinstance(value, (bytes, bytearray)):
+        raise AvroError(f"Expected bytes, got {value!r}")
+    _write_long(len(value), out)
+    out += value
+
+
+def _write_string(value, out):
+    if type(value) is not str:
+        raise AvroError(f"Expected a string, got {value!r}")
+    data = value.encode()
+    size = len(data)
+    if size < 0x40:
+        out.append(size << 1)
+    else:
+        _write_long(size, out)
+    out += data
+
+
+_PRIMITIVE_WRITERS = {
+    "null": _write_null,
+    "boolean": _write_boolean,
+    "int": _write_int,
+    "long": _write_long,
+    "float": _write_float,
+    "double": _write_double,
+    "bytes": _write_bytes,
+    "string": _write_string,
+}
+
+
+# Avro types that can hold a value of each Python type
+_TYPE_KINDS = {
+    type(None): ("null",),
+    bool: ("boolean",),
+    int: ("int", "long", "float", "double"),
+    float: ("float", "double"),
+    str: ("string", "enum"),
+    bytes: ("bytes",),
+    bytearray: ("bytes",),
+    list: ("array",),
+    tuple: ("array",),
+    dict: ("map", "record"),
+}
+
+
+def _accepts(node, names):
+    """Return a predicate telling whether a Python value fits a union branch."""
+    node = _resolve(node, names)
+    kind = _kind(node, names)
+    if kind == "null":
+        return lambda value: value is None
+    if kind == "boolean":
+        return lambda value: type(value) is bool
+    if kind == "int":
+        return lambda value: type(value) is int and _INT_RANGE[0] <= value < _INT_RANGE[1]
+    if kind == "long":
+        return lambda value: type(value) is int and _LONG_RANGE[0] <= value < _LONG_RANGE[1]
+    if kind in ("float", "double"):
+        return lambda value: type(value) in (float, int)
+    if kind == "bytes":
+        return lambda value: isinstance(value, (bytes, bytearray))
+    if kind == "string":
+        return lambda value: type(value) is str
+    if kind == "enum":
+        symbols = frozenset(node["symbols"])
+        return lambda value: type(value) is str and value in symbols
+    if kind == "array":
+        return lambda value: isinstance(value, (list, tuple))
+    return lambda value: isinstance(value, dict)
+
+
+def _writer(node, names, memo):
+    node = _resolve(node, names)
+    kind = _kind(node, names)
+    if kind in _PRIMITIVE_WRITERS:
+        return _PRIMITIVE_WRITERS[kind]
+
+    if kind == "union":
+        branches = []
+        for index, branch in enumerate(node):
+            prefix = bytearray()
+            _write_long(index, prefix)
+            branches.append((_accepts(branch, names), bytes(prefix), _writer(branch, names, memo)))
+        # A value whose Python type only one branch can hold skips the predicates
+        by_type = {}
+        kinds = [_kind(_resolve(branch, names), names) for branch in node]
+        for python_type, holders in _TYPE_KINDS.items():
+            candidates = [branches[i][1:] for i, kind in enumerate(kinds) if kind in holders]
+            if len(candidates) == 1:
+                by_type[python_type] = candidates[0]
+
+        def write_union(value, out):
+            branch = by_type.get(type(value))
+            if branch is not None:
+                out += branch[0]
+                branch[1](value, out)
+                return
+            for accepts, prefix, write in branches:
+                if accepts(value):
+                    out += prefix
+                    write(value, out)
+                    return
+            raise AvroError(f"Value {value!r} matches no branch of the union")
+        return write_union
+
+    if kind == "array":
+        write_item = _writer(node["items"], names, memo)
+
+        def write_array(value, out):
+            if not isinstance(value, (list, tuple)):
+                raise AvroError(f"Expected an array, got {value!r}")
+            if value:
+                _write_long(len(value), out)
+                for item in value:
+                    write_item(item, out)
+            out.append(0)
+        return write_array
+
+    if kind == "map":
+        write_value = _writer(node["values"], names, memo)
+
+        def write_map(value, out):
+            if not isinstance(value, dict):
+                raise AvroError(f"Expected a map, got {value!r}")
+            if value:
+                _write_long(len(value), out)
+                for key, item in value.items():
+                    _write_string(key, out)
+                    write_value(item, out)
+            out.append(0)
+        return write_map
+
+    if kind == "enum":
+        indexes = {symbol: index for index, symbol in enumerate(node["symbols"])}
+
+        def write_enum(value, out):
+            index = indexes.get(value)
+            if index is None:
+                raise AvroError(f"{value!r} is not a symbol of enum {node['name']}")
+            _write_long(index, out)
+        return write_enum
+
+    # Records may refer to themselves, so register a forwarder before compiling fields
+    name = node["name"]
+    if name in memo:
+        return memo[name]
+    compiled = []
+    memo[name] = lambda value, out: compiled[0](value, out)
+    fields = [(field["name"], _writer(field["type"], names, memo), field["default"]) for field in node["fields"]]
+
+    def write_record(value, out):
+        if not isinstance(value, dict):
+            raise AvroError(f"Expected a record {name}, got {value!r}")
+        for field, write, default in fields:
+            item = value.get(field, _MISSING)
+            if item is _MISSING:
+                if default is _MISSING:
+                    raise AvroError(f"Missing field {field} of record {name}")
+                item = default
+            write(item, out)
+    compiled.append(write_record)
+    memo[name] = write_record
+    return write_record
+
+
+# Decoding
+
+def _read_long(cursor):
+    data = cursor.data
+    pos = cursor.pos
+    byte = data[pos]
+    pos += 1
+    if byte < 0x80:
+        cursor.pos = pos
+        return (byte >> 1) ^ -(byte & 1)
+    n = byte & 0x7F
+    shift = 7
+    while byte & 0x80:
+        if shift >= _MAX_VARINT_SHIFT:
+            raise AvroError(f"Varint longer than 10 bytes at byte {cursor.pos}")
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        shift += 7
+    cursor.pos = pos
+    return (n >> 1) ^ -(n & 1)
+
+
+def _read_bytes(cursor):
+    data = cursor.data
+    start = cursor.pos
+    size = data[start]
+    if size < 0x80 and not size & 1:
+        # Lengths under 64 are a single byte
+        size >>= 1
+        start += 1
+    else:
+        size = _read_long(cursor)
+        start = cursor.pos
+    end = start + size
+    if size < 0 or end > len(data):
+        raise AvroError(f"Length {size} at byte {start} runs past the end of the data")
+    cursor.pos = end
+    return data[start:end]
+
+
+def _read_string(cursor):
+    try:
+        return _read_bytes(cursor).decode()
+    except UnicodeDecodeError as e:
+        raise AvroError(f"Invalid UTF-8 in string: {e}")
+
+
+def _read_null(cursor):
+    return None
+
+
+def _read_boolean(cursor):
+    value = cursor.data[cursor.pos]
+    cursor.pos += 1
+    return value == 1
+
+
+def _read_float(cursor):
+    (value,) = _FLOAT.unpack_from(cursor.data, cursor.pos)
+    cursor.pos += 4
+    return value
+
+
+def _read_double(cursor):
+    (value,) = _DOUBLE.unpack_from(cursor.data, cursor.pos)
+    cursor.pos += 8
+    return value
+
+
+_PRIMITIVE_READERS = {
+    "null": _read_null,
+    "boolean": _read_boolean,
+    "int": _read_long,
+    "long": _read_long,
+    "float": _read_float,
+    "double": _read_double,
+    "bytes": _read_bytes,
+    "string": _read_string,
+}
+
+
+def _promoted_reader(writer_kind, reader_kind):
+    read = _PRIMITIVE_READERS[writer_kind]
+    if reader_kind in ("float", "double") and writer_kind in ("int", "long"):
+        return lambda cursor: float(read(cursor))
+    if reader_kind == "bytes" and writer_kind == "string":
+        return _read_bytes
+    if reader_kind == "string" and writer_kind == "bytes":
+        return _read_string
+    return read
+
+
+def _unreadable(message):
+    def fail(cursor):
+        raise AvroError(message)
+    return fail
+
+
+def _block_count(cursor):
+    """
+    Read the item count of the next array or map block.
+
+    Counts are checked before any item is read: a block cannot claim more
+    items than there are bytes left, which zero-width items such as nulls
+    could otherwise do, nor more than the cursor's remaining item budget.
+    """
+    count = _read_long(cursor)
+    if count < 0:
+        count = -count
+        _read_long(cursor)  # block size in bytes, only useful for skipping
+    if count > len(cursor.data) - cursor.pos:
+        raise AvroError(f"Block of {count} items at byte {cursor.pos} is longer than the data")
+    cursor.items_left -= count
+    if cursor.items_left < 0:
+        raise AvroError(f"Too many array or map items at byte {cursor.pos}")
+    return count
+
+
+def _read_blocks(cursor, read_item):
+    """Yield the items of an array or map, which are written as counted blocks."""
+    while True:
+        count = _block_count(cursor)
+        if count == 0:
+            return
+        for _ in range(count):
+            yield read_item(cursor)
+
+
+def _reader(writer, reader, writer_names, reader_names, memo):
+    writer = _resolve(writer, writer_names)
+    reader = _resolve(reader, reader_names)
+    writer_kind = _kind(writer, writer_names)
+    reader_kind = _kind(reader, reader_names)
+
+    if writer_kind == "union":
+        # Branches the reader cannot handle only fail if the data actually uses them
+        branches = [_reader(branch, reader, writer_names, reader_names, memo) for branch in writer]
+
+        def read_union(cursor):
+            index = _read_long(cursor)
+            if not 0 <= index < len(branches):
+                raise AvroError(f"Union branch {index} out of range")
+            return branches[index](cursor)
+        return read_union
+
+    if reader_kind == "union":
+        for branch in reader:
+            if not _check(writer, branch, writer_names, reader_names, set(), "", []):
+                return _reader(writer, branch, writer_names, reader_names, memo)
+        return _unreadable(f"No branch of the reader's union can read {writer_kind}")
+
+    if writer_kind in PRIMITIVES:
+        if writer_kind == reader_kind or writer_kind in _PROMOTIONS.get(reader_kind, ()):
+            return _promoted_reader(writer_kind, reader_kind)
+        return _unreadable(f"Cannot read {writer_kind} as {reader_kind}")
+    if writer_kind != reader_kind:
+        return _unreadable(f"Cannot read {writer_kind} as {reader_kind}")
+
+    if writer_kind == "array":
+        read_item = _reader(writer["items"], reader["items"], writer_names, reader_names, memo)
+        return lambda cursor: list(_read_blocks(cursor, read_item))
+
+    if writer_kind == "map":
+        read_value = _reader(writer["values"], reader["values"], writer_names, reader_names, memo)
+
+        def read_map(cursor):
+            result = {}
+            while True:
+                count = _block_count(cursor)
+                if count == 0:
+                    return result
+                for _ in range(count):
+                    key = _read_string(cursor)
+                    result[key] = read_value(cursor)
+        return read_map
+
+    if writer_kind == "enum":
+        default = reader["default"]
+        known = set(reader["symbols"])
+        symbols = [symbol if symbol in known else default for symbol in writer["symbols"]]
+
+        def read_enum(cursor):
+            index = _read_long(cursor)
+            if not 0 <= index < len(symbols):
+                raise AvroError(f"Enum index {index} out of range")
+            symbol = symbols[index]
+            if symbol is _MISSING:
+                raise AvroError(f"Symbol unknown to reader enum {reader['name']}")
+            return symbol
+        return read_enum
+
+    if _short_name(writer) != _short_name(reader):
+        return _unreadable(f"Cannot read record {writer['name']} as {reader['name']}")
+    key = (writer["name"], reader["name"])
+    if key in memo:
+        return memo[key]
+    compiled = []
+    memo[key] = lambda cursor: compiled[0](cursor)
+
+    reader_fields = {field["name"]: field for field in reader["fields"]}
+    steps = []
+    for field in writer["fields"]:
+        target = reader_fields.get(field["name"])
+        if target is None:
+            steps.append((None, _reader(field["type"], field["type"], writer_names, writer_names, memo)))
+        else:
+            steps.append((field["name"], _reader(field["type"], target["type"], writer_names, reader_names, memo)))
+    written = {field["name"] for field in writer["fields"]}
+    defaults = [(field["name"], field["default"]) for field in reader["fields"] if field["name"] not in written]
+    missing = [name for name, default in defaults if default is _MISSING]
+    if missing:
+        compiled.append(_unreadable(f"Fields {missing} of record {reader['name']} have no default"))
+        return compiled[0]
+
+    def read_record(cursor):
+        record = {}
+        for name, read in steps:
+            value = read(cursor)
+            if name is not None:
+                record[name] = value
+        for name, default in defaults:
+            record[name] = copy.deepcopy(default) if isinstance(default, (dict, list)) else default
+        return record
+    compiled.append(read_record)
+    memo[key] = read_record
+    return read_record
+
+
+# Compatibility
+
+def _check(writer, reader, writer_names, reader_names, seen, path, errors):
+    """Append to `errors` the reasons data written with `writer` cannot be read with `reader`."""
+    writer = _resolve(writer, writer_names)
+    reader = _resolve(reader, reader_names)
+    writer_kind = _kind(writer, writer_names)
+    reader_kind = _kind(reader, reader_names)
+    where = path or "root"
+
+    if writer_kind == "union":
+        for branch in writer:
+            _check(branch, reader, writer_names, reader_names, seen, path, errors)
+    elif reader_kind == "union":
+        if all(_check(writer, branch, writer_names, reader_names, set(seen), path, [])
+               for branch in reader):
+            errors.append(f"{where}: no branch of the reader's union can read {writer_kind}")
+    elif writer_kind in PRIMITIVES or reader_kind in PRIMITIVES:
+        if writer_kind != reader_kind and writer_kind not in _PROMOTIONS.get(reader_kind, ()):
+            errors.append(f"{where}: cannot read {writer_kind} as {reader_kind}")
+    elif writer_kind != reader_kind:
+        errors.append(f"{where}: cannot read {writer_kind} as {reader_kind}")
+    elif writer_kind == "array":
+        _check(writer["items"], reader["items"], writer_names, reader_names, seen, f"{path}[]", errors)
+    elif writer_kind == "map":
+        _check(writer["values"], reader["values"], writer_names, reader_names, seen, f"{path}{{}}", errors)
+    elif writer_kind == "enum":
+        unknown = [symbol for symbol in writer["symbols"] if symbol not in reader["symbols"]]
+        if unknown and reader["default"] is _MISSING:
+            errors.append(f"{where}: reader enum {reader['name']} lacks symbols {unknown}")
+    elif _short_name(writer) != _short_name(reader):
+        errors.append(f"{where}: record {writer['name']} is not {reader['name']}")
+    elif (writer["name"], reader["name"]) not in seen:
+        seen.add((writer["name"], reader["name"]))
+        writer_fields = {field["name"]: field for field in writer["fields"]}
+        for field in reader["fields"]:
+            field_path = f"{path}.{field['name']}" if path else field["name"]
+            written = writer_fields.get(field["name"])
+            if written is None:
+                if field["default"] is _MISSING:
+                    errors.append(f"{field_path}: added without a default")
+            else:
+                _check(written["type"], field["type"], writer_names, reader_names, seen, field_path, errors)
+    return errors
+
+
+def compatibility_errors(reader, writer):
+    """
+    Check whether data written with one schema can be read with another.
+
+    Args:
+        reader (Schema): Schema the data is read with
+        writer (Schema): Schema the data was written with
+
+    Returns:
+        list: Reasons the reader cannot read the writer's data, empty if it can
+    """
+    return _check(writer.root, reader.root, writer.names, reader.names, set(), "", [])
@@ -10,11 +10,69 @@ class Config:
             "kafka.topic_name": os.getenv("KAFKA_TOPIC", "logs"),
             "kafka.request_timeout_ms": int(os.getenv("KAFKA_REQUEST_TIMEOUT_MS", "30000")),
             "kafka.retries": int(os.getenv("KAFKA_RETRIES", "3")),
+            "kafka.group_id": os.getenv("KAFKA_GROUP_ID", "kafka-log-api"),
+            "kafka.auto_offset_reset": os.getenv("KAFKA_AUTO_OFFSET_RESET", "earliest"),
+            # Message value format of produced logs ("" stores them as sent)
+            "producer.serializer": os.getenv("PRODUCER_SERIALIZER", ""),
+            # Local schema registry for Avro payloads ("" keeps it in memory)
+            "schema_registry.path": os.getenv("SCHEMA_REGISTRY_PATH", ""),
+            "schema_registry.compatibility": os.getenv("SCHEMA_COMPATIBILITY", "BACKWARD"),
+            "schema_registry.max_versions": int(os.getenv("SCHEMA_REGISTRY_MAX_VERSIONS", "1000")),
+            # Let POST /schemas/{subject} register schemas at all, and for other subjects
+            "schema_registry.allow_writes": os.getenv("SCHEMA_REGISTRY_ALLOW_WRITES", "false").lower() == "true",
+            "schema_registry.allow_any_subject": os.getenv("SCHEMA_REGISTRY_ALLOW_ANY_SUBJECT", "false").lower() == "true",
+            # Template-compress stored messages (saves little memory, costs ingest throughput)
+            "store.template_compression": os.getenv("STORE_TEMPLATE_COMPRESSION", "false").lower() == "true",
             "log_level": os.getenv("LOG_LEVEL", "INFO"),
+            "log_message_rate": float(os.getenv("LOG_MESSAGE_RATE", "10")),
+            "log_queue_size": int(os.getenv("LOG_QUEUE_SIZE", "10000")),
             "kaggle.dataset_path": os.getenv("KAGGLE_DATASET_PATH", "data/kaggle_logs.csv"),
+            "startup.warm_dataset": os.getenv("WARM_DATASET_ON_STARTUP", "true").lower() == "true",
+            # Ingestion guards (0 disables a limit)
+            "ingest.rate_limit": float(os.getenv("INGEST_RATE_LIMIT", "0")),
+            "ingest.rate_burst": float(os.getenv("INGEST_RATE_BURST", "0")),
+            "ingest.service_rate_limits": os.getenv("INGEST_SERVICE_RATE_LIMITS", ""),
+            "ingest.max_tracked_services": int(os.getenv("INGEST_MAX_TRACKED_SERVICES", "10000")),
+            "ingest.sample_rates": os.getenv("INGEST_SAMPLE_RATES", ""),
+            "ingest.high_water_mark": int(os.getenv("INGEST_HIGH_WATER_MARK", "0")),
+            "ingest.low_water_mark": int(os.getenv("INGEST_LOW_WATER_MARK", "0")),
+            "ingest.max_body_bytes": int(os.getenv("INGEST_MAX_BODY_BYTES", str(64 * 1024 * 1024))),
+            "ingest.max_line_bytes": int(os.getenv("INGEST_MAX_LINE_BYTES", str(1024 * 1024))),
+            "ingest.dedup_ttl_seconds": float(os.getenv("INGEST_DEDUP_TTL_SECONDS", "600")),
+            "ingest.dedup_max_entries": int(os.getenv("INGEST_DEDUP_MAX_ENTRIES", "1000000")),
+            # Consumer backend: "mock" reads the in-memory store, "confluent" a Kafka topic
+            "consumer.backend": os.getenv("CONSUMER_BACKEND", "mock"),
+            "consumer.deserializer": os.getenv("CONSUMER_DESERIALIZER", "json"),
+            "consumer.batch_size": int(os.getenv("CONSUMER_BATCH_SIZE", "500")),
+            "consumer.poll_timeout_ms": int(os.getenv("CONSUMER_POLL_TIMEOUT_MS", "100")),
+            "consumer.max_in_flight_batches": int(os.getenv("CONSUMER_MAX_IN_FLIGHT_BATCHES", "20")),
+            # Consumer retries and dead-lettering
+            "consumer.retry_max_attempts": int(os.getenv("CONSUMER_RETRY_MAX_ATTEMPTS", "3")),
+            "consumer.retry_base_delay_ms": int(os.getenv("CONSUMER_RETRY_BASE_DELAY_MS", "100")),
+            "consumer.retry_max_delay_ms": int(os.getenv("CONSUMER_RETRY_MAX_DELAY_MS", "10000")),
+            "consumer.max_pending_retries": int(os.getenv("CONSUMER_MAX_PENDING_RETRIES", "10000")),
+            "consumer.breaker_failure_threshold": int(os.getenv("CONSUMER_BREAKER_FAILURE_THRESHOLD", "5")),
+            "consumer.breaker_reset_timeout_ms": int(os.getenv("CONSUMER_BREAKER_RESET_TIMEOUT_MS", "30000")),
+            "consumer.dead_letter_max_entries": int(os.getenv("CONSUMER_DEAD_LETTER_MAX_ENTRIES", "10000")),
+            # Raw log retention and rollups (0 disables a window)
+            "retention.raw_window_seconds": float(os.getenv("RETENTION_RAW_WINDOW_SECONDS", "3600")),
+            "retention.raw_max_logs": int(os.getenv("RETENTION_RAW_MAX_LOGS", "500000")),
+            "retention.minute_window_seconds": float(os.getenv("RETENTION_MINUTE_WINDOW_SECONDS", "86400")),
+            "retention.hour_window_seconds": float(os.getenv("RETENTION_HOUR_WINDOW_SECONDS", str(30 * 86400))),
+            "retention.top_paths": int(os.getenv("RETENTION_TOP_PATHS", "20")),
+            # Streaming top-k and unique IP sketches
+            "stats.window_seconds": float(os.getenv("STATS_WINDOW_SECONDS", "60")),
+            "stats.windows": int(os.getenv("STATS_WINDOWS", "60")),
+            "stats.top_capacity": int(os.getenv("STATS_TOP_CAPACITY", "200")),
+            "stats.hll_precision": int(os.getenv("STATS_HLL_PRECISION", "12")),
+            "stats.max_services": int(os.getenv("STATS_MAX_SERVICES", "100")),
+            # HTTP body compression
+            "compression.minimum_size": int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024")),
+            "compression.max_request_bytes": int(os.getenv("COMPRESSION_MAX_REQUEST_BYTES", str(10 * 1024 * 1024))),
+            "compression.max_ratio": int(os.getenv("COMPRESSION_MAX_RATIO", "100")),
         }
     
     def get(self, key, default=None):
         return self.config.get(key, default)
 
-config = Config()
\ No newline at end of file
+config = Config()
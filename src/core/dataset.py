@@ -0,0 +1,29 @@
+import ast
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Written by process_csv_logs.py
+WEB_LOGS_PATH = "data/processed_web_logs.csv"
+
+
+def load_web_logs(path=WEB_LOGS_PATH):
+    """
+    Load the processed web logs dataset as log dicts.
+
+    Args:
+        path (str): CSV file written by process_csv_logs.py
+
+    Returns:
+        list: The records, or None if the file does not exist
+    """
+    if not os.path.exists(path):
+        return None
+    import pandas as pd
+    df = pd.read_csv(path)
+
+    # Convert string representation of metadata to actual dictionaries
+    df['metadata'] = df['metadata'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
+
+    return df.to_dict('records')
@@ -0,0 +1,75 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+
+class DeadLetterStore:
+    """
+    Bounded in-memory store of messages a subscriber could not process.
+
+    Entries are kept in arrival order; once `max_entries` is reached the
+    oldest entry is dropped to make room.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.dropped = 0
+        self._entries = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, subscriber, message, error, attempts):
+        """
+        Store a message that exhausted its retries.
+
+        Args:
+            subscriber (str): Name of the subscriber that failed
+            message (dict): The undelivered message
+            error (str): Last error seen
+            attempts (int): Number of delivery attempts made
+
+        Returns:
+            int: Id of the dead-letter entry
+        """
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = {
+                "id": entry_id,
+                "subscriber": subscriber,
+                "error": error,
+                "attempts": attempts,
+                "failed_at": time.time(),
+                "message": message,
+            }
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.dropped += 1
+            return entry_id
+
+    def list(self, limit=100, subscriber=None):
+        """Return up to `limit` entries, oldest first, optionally for one subscriber."""
+        with self._lock:
+            entries = list(self._entries.values())
+        if subscriber is not None:
+            entries = [entry for entry in entries if entry["subscriber"] == subscriber]
+        return entries[:limit]
+
+    def get(self, entry_id):
+        return self._entries.get(entry_id)
+
+    def pop(self, entry_id):
+        """Remove and return an entry, or None if it does not exist."""
+        with self._lock:
+            return self._entries.pop(entry_id, None)
+
+    def restore(self, entry):
+        """Put back an entry taken with pop(), under its original id."""
+        with self._lock:
+            self._entries[entry["id"]] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.dropped += 1
@@ -0,0 +1,110 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from .config import config
+
+
+class _Shard:
+    __slots__ = ("entries", "lock", "evicted")
+
+    def __init__(self):
+        self.entries = OrderedDict()  # key digest -> expiry, oldest first
+        self.lock = threading.Lock()
+        self.evicted = 0
+
+
+def _digest(key):
+    """128-bit digest of a key; collisions are too unlikely to merge distinct events."""
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+class DedupCache:
+    """
+    Remembers recently seen idempotency keys for a limited time.
+
+    Keys are reduced to a 128-bit blake2b digest, so every entry costs the
+    same no matter how long the client's key is. The cache is split into
+    shards with their own lock, and each shard evicts expired entries from
+    its oldest end on insert. When a shard is full its oldest entry is
+    evicted early, which bounds memory at the cost of forgetting keys
+    sooner.
+    """
+
+    def __init__(self, ttl_seconds=600, max_entries=1000000, shards=16):
+        """
+        Args:
+            ttl_seconds (float): How long a key is remembered
+            max_entries (int): Upper bound on remembered keys across all shards
+            shards (int): Number of independently locked shards
+        """
+        self.ttl = ttl_seconds
+        self.shard_capacity = max(1, max_entries // shards)
+        self._shards = [_Shard() for _ in range(shards)]
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(
+            ttl_seconds=cfg.get("ingest.dedup_ttl_seconds", 600),
+            max_entries=cfg.get("ingest.dedup_max_entries", 1000000),
+        )
+
+    def __len__(self):
+        return sum(len(shard.entries) for shard in self._shards)
+
+    @property
+    def evicted_early(self):
+        """Keys forgotten before their TTL because their shard was full."""
+        return sum(shard.evicted for shard in self._shards)
+
+    def _shard(self, digest):
+        return self._shards[int.from_bytes(digest[:8], "big") % len(self._shards)]
+
+    def seen(self, key, now=None):
+        """Return True if the key was recorded within the TTL."""
+        now = time.monotonic() if now is None else now
+        digest = _digest(key)
+        shard = self._shard(digest)
+        with shard.lock:
+            expiry = shard.entries.get(digest)
+            return expiry is not None and expiry > now
+
+    def add(self, key, now=None):
+        """
+        Record a key.
+
+        Args:
+            key (str): Idempotency key
+            now (float): Monotonic timestamp, defaults to time.monotonic()
+
+        Returns:
+            bool: True if the key is new, False if it was seen within the TTL
+        """
+        now = time.monotonic() if now is None else now
+        digest = _digest(key)
+        shard = self._shard(digest)
+        entries = shard.entries
+        with shard.lock:
+            expiry = entries.get(digest)
+            if expiry is not None:
+                if expiry > now:
+                    return False
+                del entries[digest]
+
+            # Entries share one TTL, so the expired ones are at the front
+            while entries:
+                oldest, oldest_expiry = next(iter(entries.items()))
+                if oldest_expiry > now:
+                    break
+                del entries[oldest]
+            if len(entries) >= self.shard_capacity:
+                entries.popitem(last=False)
+                shard.evicted += 1
+
+            entries[digest] = now + self.ttl
+            return True
+
+
+# Create a singleton instance
+dedup_cache = DedupCache.from_config(config)
@@ -1,10 +1,19 @@
-import json
 import logging
 from datetime import datetime
+import time
+
+from .lazy import Lazy
+from .config import config
+from .dataset import load_web_logs
+from .log_store import LogStore
+from .logger import RateLimitedLogger
+from .retention import RetentionManager
+from .serializers import DESERIALIZERS, SERIALIZERS
+from .sketches import StatsSketches
 
-# Create a simple logger for this module
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# One line per stored log would dominate ingestion, so these are rate-limited
+message_logger = RateLimitedLogger.from_config(logger, config)
 
 class KafkaLogger:
     def __init__(self):
@@ -12,12 +21,41 @@ class KafkaLogger:
         self.topic = "logs"
         logger.info(f"Mock Kafka producer initialized (development mode)")
         
-        # Create a simple in-memory store for logs
-        self.logs = []
+        # Message value format; the store then holds what a consumer decodes from it
+        self.wire_format = config.get("producer.serializer", "")
+        if self.wire_format and self.wire_format not in SERIALIZERS:
+            raise ValueError(f"Unknown producer serializer: {self.wire_format}")
+        
+        # In-memory columnar store for logs, optionally template-compressed
+        self.logs = LogStore.from_config(config)
+        
+        # Raw logs are kept for a window, older ones are summarized into rollups
+        self.retention = RetentionManager.from_config(self.logs, config)
         
-        # Create mock Kaggle data
-        self.kaggle_data = self._create_mock_data()
-        logger.info(f"Created mock Kaggle dataset with {len(self.kaggle_data)} entries")
+        # Windowed top-k and unique IP sketches, updated as logs are stored
+        self.sketches = StatsSketches.from_config(config)
+        
+        # Web logs dataset served by /kaggle and /dataset/info, parsed on first use or by warm_up()
+        self.dataset = Lazy(self._load_dataset, name="kaggle-dataset")
+    
+    @property
+    def kaggle_data(self):
+        """The Kaggle dataset, loaded on first access."""
+        return self.dataset.get()
+    
+    def _load_dataset(self):
+        """Load the processed web logs dataset, falling back to mock data if not available."""
+        try:
+            kaggle_data = load_web_logs()
+        except Exception as e:
+            logger.error(f"Error loading web logs data: {e}")
+            kaggle_data = None
+        if kaggle_data is not None:
+            logger.info(f"Loaded {len(kaggle_data)} logs from Web Logs dataset")
+            return kaggle_data
+        kaggle_data = self._create_mock_data()
+        logger.info(f"Created mock Kaggle dataset with {len(kaggle_data)} entries")
+        return kaggle_data
     
     def _create_mock_data(self):
         """Create some mock log data for development."""
@@ -62,8 +100,25 @@ class KafkaLogger:
         if "timestamp" not in log_data:
             log_data["timestamp"] = datetime.now().isoformat()
             
-        logger.info(f"Mock log sent: {json.dumps(log_data)[:100]}...")
+        if self.wire_format:
+            try:
+                value = SERIALIZERS[self.wire_format](log_data)
+            except (TypeError, ValueError, OverflowError) as e:
+                return {"status": "error", "message": f"Log could not be serialized as {self.wire_format}: {e}"}
+            log_data = DESERIALIZERS[self.wire_format](value)
+        
+        # Add Kafka metadata
+        log_data["_kafka_offset"] = len(self.logs)
+        log_data["_kafka_timestamp"] = int(time.time() * 1000)  # Milliseconds
+        log_data["_kafka_topic"] = self.topic
+        log_data["_kafka_partition"] = 0
+        # The mock consumer reads the store directly, so a record is received once stored
+        log_data["_received_at"] = datetime.now().isoformat()
+        
+        message_logger.info("Mock log sent: %.100s...", log_data)
         self.logs.append(log_data)
+        self.sketches.add(log_data)
+        self.retention.maybe_enforce()
         return {"status": "success", "message": "Log sent (development mode)"}
     
     def send_kaggle_log(self, index):
@@ -108,5 +163,9 @@ class KafkaLogger:
             "success_count": success_count
         }
 
-# Create a singleton instance
-kafka_logger = KafkaLogger()
\ No newline at end of file
+# Shared instance, created on first use rather than at import time
+_kafka_logger = Lazy(KafkaLogger)
+
+def get_kafka_logger():
+    """Return the shared KafkaLogger, creating it on first call."""
+    return _kafka_logger.get()
@@ -0,0 +1,66 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Lazy:
+    """
+    A value built on first use instead of at import time.
+
+    The factory runs at most once, even when several threads ask for the
+    value at the same time. warm_up() starts building it in a background
+    thread so that the first caller does not pay the full cost.
+    """
+
+    def __init__(self, factory, name=None):
+        self.factory = factory
+        self.name = name or getattr(factory, "__name__", "value")
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        """Return the value, building it if needed."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self.factory()
+                    self._loaded = True
+        return self._value
+
+    def warm_up(self):
+        """
+        Build the value in a background thread.
+
+        Returns:
+            threading.Thread: The warm-up thread, or None if already loaded
+        """
+        if self._loaded:
+            return None
+        with self._lock:
+            if self._warmup_thread is None:
+                self._warmup_thread = threading.Thread(
+                    target=self._warm, name=f"warm-up-{self.name}", daemon=True
+                )
+                self._warmup_thread.start()
+        return self._warmup_thread
+
+    def _warm(self):
+        try:
+            self.get()
+            logger.info(f"Warm-up of {self.name} finished")
+        except Exception as e:
+            logger.error(f"Warm-up of {self.name} failed: {e}")
+
+    def reset(self):
+        """Forget the value so the next get() builds a new one."""
+        with self._lock:
+            self._value = None
+            self._loaded = False
+            self._warmup_thread = None
@@ -0,0 +1,699 @@
+import enum
+import threading
+from array import array
+
+import numpy as np
+
+from .templates import TemplateMiner
+
+# Version id stored for records whose message is kept verbatim
+NO_TEMPLATE = -1
+
+# Rows per chunk; columns of a chunk are only ever appended to
+CHUNK_SIZE = 4096
+
+# Marks a missing value in object columns
+_ABSENT = object()
+
+# Marks a missing value in integer columns
+_INT_ABSENT = -2 ** 63
+
+# Marks a missing dictionary-encoded value
+_NO_CODE = 0
+
+# Top-level fields with a dedicated integer column
+_INT_FIELDS = ("_kafka_offset", "_kafka_timestamp", "_kafka_partition")
+
+# Top-level fields that are dictionary-encoded
+_CODED_FIELDS = ("service", "level", "_kafka_topic")
+
+# Top-level fields with a dedicated column of arbitrary values
+_OBJECT_FIELDS = ("timestamp", "_received_at")
+
+
+def _is_int64(value):
+    return type(value) is int and _INT_ABSENT < value < 2 ** 63
+
+
+def _numpy_column(column, first, stop):
+    """Copy part of an array column into a numpy array without locking the column."""
+    return np.frombuffer(column[first:stop], dtype=column.typecode)
+
+
+def _dictionary_encode(row_values):
+    """Encode a list of values as per-row codes into a list of distinct values."""
+    index = {}
+    values = []
+    codes = []
+    for value in row_values:
+        try:
+            # Keyed by type as well, so that 1, 1.0 and True stay distinct
+            key = (type(value), value)
+            code = index.get(key)
+            if code is None:
+                code = index[key] = len(values)
+                values.append(value)
+        except TypeError:  # unhashable, e.g. a nested dict
+            code = len(values)
+            values.append(value)
+        codes.append(code)
+    return np.array(codes, dtype=np.uint16), values
+
+
+def records_to_columns(records):
+    """
+    Turn record dicts into the columns LogStore.columns() would return for them.
+
+    For batches that are delivered but not stored, so no chunk has to be
+    built and read back.
+
+    Args:
+        records (list): Log records as dicts
+
+    Returns:
+        dict: field -> list of values, all of the same length
+    """
+    total = len(records)
+    columns = {field: [None] * total for field in ("timestamp", "message") + _CODED_FIELDS + _INT_FIELDS}
+
+    def column(name):
+        values = columns.get(name)
+        if values is None:
+            values = columns[name] = [None] * total
+        return values
+
+    for row, record in enumerate(records):
+        for field, value in record.items():
+            if field == "metadata" and type(value) is dict:
+                for key, item in value.items():
+                    column(f"metadata.{key}")[row] = item
+            else:
+                column(field)[row] = value
+    return columns
+
+
+class StringPool:
+    """Dictionary encoding of repeated values to small integer codes."""
+
+    def __init__(self):
+        self._codes = {}
+        self.values = [_ABSENT]  # code 0 is reserved for "missing"
+
+    def encode(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value):
+        """Return the code for a value, or None if it was never encoded."""
+        return self._codes.get(value)
+
+    def __len__(self):
+        return len(self.values) - 1
+
+
+class ColumnView:
+    """
+    One column of a chunk prepared for numpy filtering.
+
+    Integer columns are exposed as `ints` with a `present` mask. Every other
+    column is dictionary-encoded per chunk: `codes` holds one index into
+    `values`, an object array of the distinct values, per row. Missing
+    values are None.
+    """
+
+    __slots__ = ("ints", "present", "codes", "values")
+
+    def __init__(self, ints=None, present=None, codes=None, values=None):
+        self.ints = ints
+        self.present = present
+        self.codes = codes
+        self.values = values
+
+
+class LogChunk:
+    """
+    Struct-of-arrays storage for up to CHUNK_SIZE consecutive records.
+
+    Service, level and topic are dictionary codes into the store's
+    StringPool. Metadata values live in one column per key, keyed by the key
+    itself so that keys go away with the chunk; a column stays a compact
+    integer array for as long as every value is an int. Only the first
+    max_columns keys of a chunk get a column. Later keys, and anything else
+    that does not fit a column, are kept in the sparse `extras` map.
+    Dictionary-encoded views built for queries are cached in `views` once
+    the chunk is full and can no longer change, only for columns the chunk
+    actually has, so the cache never outgrows the chunk.
+    """
+
+    __slots__ = (
+        "base", "size", "objects", "coded", "ints", "sample_rates",
+        "templates", "params", "has_metadata", "metadata", "extras", "views",
+    )
+
+    def __init__(self, base):
+        self.base = base
+        self.size = 0
+        self.objects = {field: [] for field in _OBJECT_FIELDS}
+        self.coded = {field: array('I') for field in _CODED_FIELDS}
+        self.ints = {field: array('q') for field in _INT_FIELDS}
+        self.sample_rates = array('d')
+        self.templates = array('i')
+        self.params = []
+        self.has_metadata = array('b')
+        self.metadata = {}  # key -> column
+        self.extras = {}  # row -> dict of fields without a column
+        self.views = {}  # field -> ColumnView, only for full chunks and existing columns
+
+    def metadata_column(self, key):
+        column = self.metadata.get(key)
+        if column is None:
+            column = self.metadata[key] = array('q', [_INT_ABSENT]) * self.size
+        return column
+
+
+class LogStore:
+    """
+    In-memory, append-only store for log records.
+
+    Records are held in columnar LogChunks rather than one dict per record,
+    and are only turned back into dicts when they are read. With a
+    TemplateMiner, messages are template-compressed on write: each record
+    keeps a template version id and its variable tokens, and the message is
+    rebuilt on read. Without one, messages are stored as they are. Parameter
+    tokens and string metadata values are shared between records through a
+    bounded pool, so repeated values such as request paths are stored once.
+
+    Offsets are absolute: len() is the offset the next record will get, and
+    evict_chunks() drops the oldest records without renumbering the rest.
+    """
+
+    def __init__(self, miner=None, max_pooled_values=100000, max_metadata_columns=64):
+        self.miner = miner
+        self.max_pooled_values = max_pooled_values
+        # Each column costs a slot per row, so per-request keys such as trace ids must not get one
+        self.max_metadata_columns = max_metadata_columns
+        self.strings = StringPool()
+        self._chunks = []
+        self._size = 0
+        self._value_pool = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cfg):
+        # Template mining saves little memory over the columnar layout and costs ingest throughput
+        return cls(miner=TemplateMiner() if cfg.get("store.template_compression", False) else None)
+
+    def _pool(self, value):
+        pooled = self._value_pool.get(value)
+        if pooled is not None:
+            return pooled
+        if len(self._value_pool) < self.max_pooled_values:
+            self._value_pool[value] = value
+        return value
+
+    def _encode_message(self, message):
+        if self.miner is None:
+            return NO_TEMPLATE, message
+        version, params = self.miner.encode(message)
+        if version is None:
+            return NO_TEMPLATE, params
+        if len(params) == 1:
+            return version, self._pool(params[0])
+        return version, tuple(self._pool(param) for param in params) or None
+
+    def _append_metadata(self, chunk, metadata):
+        """
+        Append one row of metadata.
+
+        Returns:
+            dict: The items of keys past the chunk's column limit, to be kept
+            in `extras`, or None if the metadata cannot be stored as columns
+        """
+        row = chunk.size
+        overflow = {}
+        for key, value in metadata.items():
+            try:
+                column = chunk.metadata.get(key)
+            except TypeError:
+                return None
+            if column is None and len(chunk.metadata) >= self.max_metadata_columns:
+                overflow[key] = value
+                continue
+            column = chunk.metadata_column(key)
+            if len(column) != row:
+                # Two keys are equal as dict keys (e.g. 1 and True); keep the record exact
+                return None
+            if type(column) is array:
+                if _is_int64(value):
+                    column.append(value)
+                    continue
+                column = chunk.metadata[key] = [
+                    _ABSENT if item == _INT_ABSENT else item for item in column
+                ]
+            column.append(self._pool(value) if type(value) is str else value)
+        self._pad_metadata(chunk)
+        return overflow
+
+    def _pad_metadata(self, chunk, discard=False):
+        """Give every metadata column exactly one value for the current row."""
+        row = chunk.size
+        for column in chunk.metadata.values():
+            if discard:
+                del column[row:]
+            if len(column) == row:
+                column.append(_INT_ABSENT if type(column) is array else _ABSENT)
+
+    def append(self, log_data):
+        """
+        Store a log record.
+
+        Args:
+            log_data (dict): Log record; it is copied, not kept
+
+        Returns:
+            int: Offset of the stored record
+        """
+        record = dict(log_data)
+        message = record.pop("message", _ABSENT)
+        if message is _ABSENT:
+            version, params = NO_TEMPLATE, _ABSENT
+        else:
+            version, params = self._encode_message(message)
+
+        with self._lock:
+            chunk = self._chunks[-1] if self._chunks else None
+            if chunk is None or chunk.size >= CHUNK_SIZE:
+                chunk = LogChunk(self._size)
+                self._chunks.append(chunk)
+            row = chunk.size
+
+            chunk.templates.append(version)
+            chunk.params.append(params)
+            for field in _OBJECT_FIELDS:
+                chunk.objects[field].append(record.pop(field, _ABSENT))
+
+            for field in _CODED_FIELDS:
+                value = record.get(field, _ABSENT)
+                code = _NO_CODE
+                if value is not _ABSENT:
+                    if isinstance(value, enum.Enum):
+                        value = value.value
+                    try:
+                        code = self.strings.encode(value)
+                        del record[field]
+                    except TypeError:
+                        pass
+                chunk.coded[field].append(code)
+
+            for field in _INT_FIELDS:
+                value = record.get(field, _ABSENT)
+                if _is_int64(value):
+                    chunk.ints[field].append(value)
+                    del record[field]
+                else:
+                    chunk.ints[field].append(_INT_ABSENT)
+
+            rate = record.get("_sample_rate")
+            if type(rate) is float:
+                chunk.sample_rates.append(rate)
+                del record["_sample_rate"]
+            else:
+                chunk.sample_rates.append(float("nan"))
+
+            metadata = record.get("metadata", _ABSENT)
+            overflow = self._append_metadata(chunk, metadata) if type(metadata) is dict else None
+            if overflow is not None:
+                chunk.has_metadata.append(1)
+                if overflow:
+                    record["metadata"] = overflow
+                else:
+                    del record["metadata"]
+            else:
+                self._pad_metadata(chunk, discard=True)
+                chunk.has_metadata.append(0)
+
+            if record:
+                chunk.extras[row] = record
+            chunk.size += 1
+            self._size += 1
+            return chunk.base + row
+
+    def _decode_message(self, version, params):
+        if version == NO_TEMPLATE:
+            return params
+        if type(params) is str:
+            return self.miner.decode(version, (params,))
+        return self.miner.decode(version, params)
+
+    def _materialize(self, chunk, row):
+        values = self.strings.values
+        log = {}
+
+        timestamp = chunk.objects["timestamp"][row]
+        if timestamp is not _ABSENT:
+            log["timestamp"] = timestamp
+        for field in _CODED_FIELDS:
+            code = chunk.coded[field][row]
+            if code != _NO_CODE:
+                log[field] = values[code]
+
+        params = chunk.params[row]
+        if params is not _ABSENT:
+            log["message"] = self._decode_message(chunk.templates[row], params)
+
+        if chunk.has_metadata[row]:
+            metadata = log["metadata"] = {}
+            # Copy the items first: the writer may add a column concurrently
+            for key, column in tuple(chunk.metadata.items()):
+                value = column[row]
+                if type(column) is array:
+                    if value != _INT_ABSENT:
+                        metadata[key] = value
+                elif value is not _ABSENT:
+                    metadata[key] = value
+
+        rate = chunk.sample_rates[row]
+        if rate == rate:  # NaN means no sample rate was recorded
+            log["_sample_rate"] = rate
+        received = chunk.objects["_received_at"][row]
+        if received is not _ABSENT:
+            log["_received_at"] = received
+        for field in _INT_FIELDS:
+            value = chunk.ints[field][row]
+            if value != _INT_ABSENT:
+                log[field] = value
+
+        extras = chunk.extras.get(row)
+        if extras:
+            if chunk.has_metadata[row] and "metadata" in extras:
+                # Keys past the column limit of the chunk
+                extras = dict(extras, metadata={**log["metadata"], **extras["metadata"]})
+            log.update(extras)
+        return log
+
+    @staticmethod
+    def _chunk_at(chunks, offset):
+        # Chunks are replaced, never removed in place, so `chunks` is a consistent snapshot
+        return chunks[offset // CHUNK_SIZE - chunks[0].base // CHUNK_SIZE]
+
+    def _locate(self, offset):
+        if offset < 0:
+            offset += self._size
+        if not self.first_offset <= offset < self._size:
+            raise IndexError("log offset out of range")
+        return self._chunk_at(self._chunks, offset), offset % CHUNK_SIZE
+
+    @property
+    def first_offset(self):
+        """Offset of the oldest record still held."""
+        chunks = self._chunks
+        return chunks[0].base if chunks else self._size
+
+    @property
+    def retained(self):
+        """Number of records still held."""
+        return self._size - self.first_offset
+
+    def sealed_chunks(self):
+        """Return the full chunks, oldest first; only these can be evicted."""
+        chunks = self._chunks
+        return chunks[:-1]
+
+    def evict_chunks(self, count):
+        """
+        Drop up to `count` of the oldest full chunks.
+
+        Returns:
+            list: The evicted chunks
+        """
+        with self._lock:
+            count = min(count, len(self._chunks) - 1)
+            if count <= 0:
+                return []
+            evicted = self._chunks[:count]
+            self._chunks = self._chunks[count:]
+            return evicted
+
+    def get(self, offset):
+        """Return the record at an offset as a dict."""
+        return self._materialize(*self._locate(offset))
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._size)
+            if step != 1:
+                return [self.get(i) for i in range(start, stop, step)]
+            return list(self.iter_range(start, stop))
+        return self.get(index)
+
+    def __iter__(self):
+        return self.iter_range(0, self._size)
+
+    def iter_chunks(self, start=0, end=None):
+        """
+        Yield the chunks covering a range of offsets.
+
+        Args:
+            start (int): First offset
+            end (int): Offset to stop before, defaults to the current size
+
+        Yields:
+            tuple: (chunk, first_row, stop_row) for each chunk in the range
+        """
+        size = self._size
+        # Read after the size, so that the snapshot covers every offset below it
+        chunks = self._chunks
+        end = size if end is None else min(end, size)
+        offset = max(start, chunks[0].base) if chunks else end
+        while offset < end:
+            chunk = self._chunk_at(chunks, offset)
+            first = offset - chunk.base
+            stop = min(chunk.size, end - chunk.base)
+            yield chunk, first, stop
+            offset = chunk.base + stop
+
+    def iter_range(self, start=0, end=None):
+        """Yield the records between two offsets as dicts."""
+        for chunk, first, stop in self.iter_chunks(start, end):
+            for row in range(first, stop):
+                yield self._materialize(chunk, row)
+
+    def columns(self, start=0, end=None):
+        """
+        Return the records between two offsets as columns.
+
+        The columns are built straight from the chunk arrays, so no dict is
+        created per record. Top-level fields are keyed by name and metadata
+        by "metadata.<key>"; records without a field have None in its column.
+        A "metadata" column only appears for metadata that is not a dict.
+
+        Args:
+            start (int): First offset
+            end (int): Offset to stop before, defaults to the current size
+
+        Returns:
+            dict: field -> list of values, all of the same length
+        """
+        lookup = list(self.strings.values)
+        lookup[_NO_CODE] = None
+        columns = {}
+        total = 0
+
+        def column(name):
+            values = columns.get(name)
+            if values is None:
+                values = columns[name] = [None] * total
+            return values
+
+        for chunk, first, stop in self.iter_chunks(start, end):
+            for field in _OBJECT_FIELDS:
+                values = chunk.objects[field][first:stop]
+                if field == "timestamp" or any(value is not _ABSENT for value in values):
+                    column(field).extend(None if value is _ABSENT else value for value in values)
+            for field in _CODED_FIELDS:
+                column(field).extend([lookup[code] for code in chunk.coded[field][first:stop]])
+            column("message").extend(
+                None if params is _ABSENT else self._decode_message(version, params)
+                for version, params in zip(chunk.templates[first:stop], chunk.params[first:stop])
+            )
+            for field in _INT_FIELDS:
+                column(field).extend(
+                    None if value == _INT_ABSENT else value for value in chunk.ints[field][first:stop]
+                )
+            rates = chunk.sample_rates[first:stop]
+            if any(rate == rate for rate in rates):
+                column("_sample_rate").extend(None if rate != rate else rate for rate in rates)
+            for key, values in tuple(chunk.metadata.items()):
+                if type(values) is array:
+                    values = [None if value == _INT_ABSENT else value for value in values[first:stop]]
+                else:
+                    values = [None if value is _ABSENT else value for value in values[first:stop]]
+                column(f"metadata.{key}").extend(values)
+
+            total += stop - first
+            for values in columns.values():
+                if len(values) < total:
+                    values.extend([None] * (total - len(values)))
+
+            base = total - (stop - first) - first
+            for row, extras in tuple(chunk.extras.items()):
+                if not first <= row < stop:
+                    continue
+                for field, value in extras.items():
+                    if field == "metadata" and type(value) is dict:
+                        for key, item in value.items():
+                            column(f"metadata.{key}")[base + row] = item
+                    else:
+                        column(field)[base + row] = value
+        return columns
+
+    def _extra_values(self, chunk, field, size):
+        """Return {row: value} for a field held in `extras` instead of a column."""
+        key = field[len("metadata."):] if field.startswith("metadata.") else None
+        found = {}
+        for row, extras in tuple(chunk.extras.items()):
+            if row >= size:
+                continue
+            if key is None:
+                if field in extras:
+                    found[row] = extras[field]
+            else:
+                metadata = extras.get("metadata")
+                if type(metadata) is dict and key in metadata:
+                    found[row] = metadata[key]
+        return found
+
+    def _build_view(self, chunk, field, size):
+        overrides = self._extra_values(chunk, field, size)
+
+        if field.startswith("metadata."):
+            column = chunk.metadata.get(field[len("metadata."):])
+            if column is None:
+                row_values = [None] * size
+            elif type(column) is array:
+                if not overrides:
+                    ints = _numpy_column(column, 0, size)
+                    return ColumnView(ints=ints, present=ints != _INT_ABSENT)
+                row_values = [None if value == _INT_ABSENT else value for value in column[:size]]
+            else:
+                row_values = [None if value is _ABSENT else value for value in column[:size]]
+        elif field in _INT_FIELDS:
+            if not overrides:
+                ints = _numpy_column(chunk.ints[field], 0, size)
+                return ColumnView(ints=ints, present=ints != _INT_ABSENT)
+            row_values = [None if value == _INT_ABSENT else value for value in chunk.ints[field][:size]]
+        elif field in _CODED_FIELDS:
+            pooled, codes = np.unique(_numpy_column(chunk.coded[field], 0, size), return_inverse=True)
+            values = self.strings.values
+            view = ColumnView(
+                codes=codes.astype(np.uint16),
+                values=[None if code == _NO_CODE else values[code] for code in pooled.tolist()],
+            )
+            row_values = None
+        elif field in _OBJECT_FIELDS:
+            row_values = [None if value is _ABSENT else value for value in chunk.objects[field][:size]]
+        else:
+            raise KeyError(f"Unknown field: {field}")
+
+        if row_values is not None:
+            codes, values = _dictionary_encode(row_values)
+            view = ColumnView(codes=codes, values=values)
+        for row, value in overrides.items():
+            view.codes[row] = len(view.values)
+            view.values.append(value)
+        view.values = np.fromiter(view.values, dtype=object, count=len(view.values))
+        return view
+
+    def column_view(self, chunk, field, size):
+        """
+        Return the first `size` rows of a chunk column for vectorized filtering.
+
+        Args:
+            chunk (LogChunk): Chunk to read
+            field (str): A top-level field or "metadata.<key>"
+            size (int): Number of rows to include
+
+        Returns:
+            ColumnView: The column's values, cached if the chunk is full
+        """
+        view = chunk.views.get(field)
+        if view is None:
+            view = self._build_view(chunk, field, size)
+            # Integer views are cheap to rebuild and would double the column's memory
+            if size == CHUNK_SIZE and view.ints is None and self._has_column(chunk, field):
+                chunk.views[field] = view
+        return view
+
+    def sample_weights(self, chunk, size):
+        """
+        Return how many logs each of the first `size` rows of a chunk stands for.
+
+        A row kept by the log sampler at rate r stands for 1 / r logs; rows
+        that were not sampled count once.
+
+        Returns:
+            numpy.ndarray: float64 weights, one per row
+        """
+        rates = _numpy_column(chunk.sample_rates, 0, size)
+        return np.where(rates > 0, 1.0 / np.where(rates > 0, rates, 1.0), 1.0)
+
+    def _has_column(self, chunk, field):
+        """Return True if a chunk holds a column for a field; queries may name any metadata key."""
+        if not field.startswith("metadata."):
+            return True
+        return field[len("metadata."):] in chunk.metadata
+
+    def scan(self, start=0, end=None, service=None, level=None, since_ms=None, until_ms=None,
+             where=None):
+        """
+        Yield the records matching simple filters, one chunk at a time.
+
+        Filters are evaluated against the encoded columns with numpy, so only
+        matching records are turned into dicts.
+
+        Args:
+            start (int): First offset
+            end (int): Offset to stop before, defaults to the current size
+            service (str): Only records from this service
+            level (str): Only records with this level
+            since_ms (int): Only records with _kafka_timestamp >= since_ms
+            until_ms (int): Only records with _kafka_timestamp < until_ms
+            where (Query): Only records matching a compiled query, see src.core.query
+
+        Yields:
+            list: Matching records of one chunk as dicts
+        """
+        codes = {}
+        for field, value in (("service", service), ("level", level)):
+            if value is not None:
+                code = self.strings.lookup(value)
+                if code is None:
+                    return
+                codes[field] = code
+
+        for chunk, first, stop in self.iter_chunks(start, end):
+            mask = np.ones(stop - first, dtype=bool)
+            for field, code in codes.items():
+                mask &= _numpy_column(chunk.coded[field], first, stop) == code
+            if since_ms is not None or until_ms is not None:
+                stamps = _numpy_column(chunk.ints["_kafka_timestamp"], first, stop)
+                mask &= stamps != _INT_ABSENT
+                if since_ms is not None:
+                    mask &= stamps >= since_ms
+                if until_ms is not None:
+                    mask &= stamps < until_ms
+            if where is not None and mask.any():
+                mask &= where.mask(self, chunk, stop)[first:]
+            rows = np.flatnonzero(mask)
+            if len(rows):
+                yield [self._materialize(chunk, first + row) for row in rows.tolist()]
+
+    def template_counts(self):
+        """Return the mined templates with their record counts, none without a miner."""
+        return self.miner.templates() if self.miner is not None else []
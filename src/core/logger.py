@@ -1,19 +1,118 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+import threading
+
+from .config import config
+from .rate_limiter import TokenBucket
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+_configure_lock = threading.Lock()
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Counts and drops records when the queue is full instead of blocking the caller."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(level=None, stream=None, queue_size=None):
+    """
+    Set up application logging once, writing records on a background thread.
+
+    The root logger gets the configured level and a queue handler, and a
+    QueueListener thread formats and writes the records, so request and
+    consumer threads never wait on stream I/O. If the queue is full, records
+    are dropped. Like logging.basicConfig, handlers are only installed when
+    the root logger has none, e.g. when no host application configured logging.
+
+    Args:
+        level (str): Log level, defaults to config "log_level"
+        stream: Stream to write to, defaults to sys.stderr
+        queue_size (int): Records buffered for the writer thread, defaults to config "log_queue_size"
+
+    Returns:
+        logging.handlers.QueueListener: The listener, or None if logging was configured elsewhere
+    """
+    global _listener
+    root = logging.getLogger()
+    with _configure_lock:
+        if level is not None or _listener is None:
+            root.setLevel(level or config.get("log_level", "INFO"))
+        if _listener is not None or root.handlers:
+            return _listener
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        log_queue = queue.Queue(queue_size or config.get("log_queue_size", 10000))
+        root.addHandler(_DroppingQueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        # Write out what is still queued when the process exits
+        atexit.register(shutdown_logging)
+        return _listener
+
+
+def shutdown_logging():
+    """Write out queued records and stop the background thread started by configure_logging()."""
+    global _listener
+    with _configure_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+class RateLimitedLogger:
+    """
+    Passes at most `rate` records per second to a logger, for lines logged per message.
+
+    Records over the limit are dropped before a LogRecord is created, and the
+    next record let through says how many were suppressed. Pass the message
+    arguments separately (logger-style %s formatting) so that suppressed lines
+    are never formatted. A rate of 0 lets everything through.
+    """
+
+    def __init__(self, logger, rate, burst=None):
+        self.logger = logger
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.suppressed = 0
+        self._lock = threading.Lock()  # the dispatch and retry threads log through one instance
+
+    @classmethod
+    def from_config(cls, logger, cfg):
+        return cls(logger, rate=cfg.get("log_message_rate", 10.0))
+
+    def log(self, level, msg, *args):
+        if not self.logger.isEnabledFor(level):
+            return
+        if self.bucket is not None:
+            with self._lock:
+                if self.bucket.try_acquire() > 0:
+                    self.suppressed += 1
+                    return
+                suppressed, self.suppressed = self.suppressed, 0
+            if suppressed:
+                msg = f"{msg} ({suppressed} similar messages suppressed)"
+        self.logger.log(level, msg, *args)
+
+    def debug(self, msg, *args):
+        self.log(logging.DEBUG, msg, *args)
+
+    def info(self, msg, *args):
+        self.log(logging.INFO, msg, *args)
+
 
 def setup_logger(name):
-    """Set up and return a logger instance with standardized configuration."""
-    logger = logging.getLogger(name)
-    
-    # Set log level
-    logger.setLevel(logging.INFO)
-    
-    # Create console handler if not already added
-    if not logger.handlers:
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-    
-    return logger
\ No newline at end of file
+    """Set up application logging if needed and return the named logger."""
+    configure_logging()
+    return logging.getLogger(name)
@@ -0,0 +1,301 @@
+"""
+A small filter language for stored logs.
+
+    metadata.status >= 500 AND metadata.method = "POST"
+    level IN ("WARN", "ERROR") AND NOT metadata.referrer = null
+
+Fields are service, level, timestamp, _kafka_topic, _kafka_offset,
+_kafka_timestamp, _kafka_partition or metadata.<key>. Values are numbers,
+quoted strings, true, false or null. A comparison is false when the field
+is missing or its type cannot be compared with the value, except that
+`= null` matches missing values and `!= null` matches present ones.
+
+Expressions are compiled once into a tree of numpy mask operations that is
+evaluated against whole LogStore chunks.
+"""
+import ast
+import operator
+import re
+from functools import lru_cache
+
+import numpy as np
+
+MAX_QUERY_LENGTH = 2000
+
+TOP_LEVEL_FIELDS = (
+    "service", "level", "timestamp",
+    "_kafka_topic", "_kafka_offset", "_kafka_timestamp", "_kafka_partition",
+)
+
+_OPERATORS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+_ALIASES = {"==": "=", "<>": "!="}
+
+_KEYWORDS = ("AND", "OR", "NOT", "IN", "TRUE", "FALSE", "NULL")
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+      | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<op><=|>=|!=|<>|==|=|<|>)
+      | (?P<punct>[(),])
+      | (?P<word>[A-Za-z_][\w.\-]*)
+    )""", re.VERBOSE)
+
+
+class QueryError(ValueError):
+    """Raised for expressions that cannot be parsed."""
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise QueryError(f"Unexpected character at position {position}: {text[position]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        start = match.start(kind)
+        if kind == "word" and value.upper() in _KEYWORDS:
+            kind, value = "keyword", value.upper()
+        elif kind == "op":
+            value = _ALIASES.get(value, value)
+        tokens.append((kind, value, start))
+        position = match.end()
+    return tokens
+
+
+def _matches(value, op, literal):
+    """Evaluate one comparison for a single stored value."""
+    if op == "in":
+        return any(_matches(value, "=", item) for item in literal)
+    if literal is None:
+        return value is None if op == "=" else value is not None if op == "!=" else False
+    if value is None:
+        return False
+    try:
+        return bool(_OPERATORS[op](value, literal))
+    except TypeError:
+        return False
+
+
+def _value_table(values, op, literal):
+    """Evaluate a comparison for each distinct value of a dictionary-encoded column."""
+    try:
+        # Elementwise comparisons of object arrays follow Python semantics
+        if op == "in":
+            table = np.zeros(len(values), dtype=bool)
+            for item in literal:
+                table |= _value_table(values, "=", item)
+            return table
+        if op == "=":
+            return np.asarray(values == literal, dtype=bool)
+        if op == "!=" and literal is not None:
+            return np.asarray((values != literal) & (values != None), dtype=bool)  # noqa: E711
+    except (TypeError, ValueError):
+        pass
+    return np.fromiter((_matches(value, op, literal) for value in values), dtype=bool, count=len(values))
+
+
+class Comparison:
+    """`field op value`, or `field IN (values)` with op "in"."""
+
+    def __init__(self, field, op, value):
+        self.field = field
+        self.op = op
+        self.value = value
+
+    def mask(self, store, chunk, size, views):
+        view = views.get(self.field)
+        if view is None:
+            view = views[self.field] = store.column_view(chunk, self.field, size)
+        if view.ints is not None:
+            return self._int_mask(view, self.op, self.value)
+        return _value_table(view.values, self.op, self.value)[view.codes]
+
+    @classmethod
+    def _int_mask(cls, view, op, literal):
+        if op == "in":
+            mask = np.zeros(len(view.ints), dtype=bool)
+            for item in literal:
+                mask |= cls._int_mask(view, "=", item)
+            return mask
+        if literal is None:
+            if op == "=":
+                return ~view.present
+            return view.present.copy() if op == "!=" else np.zeros_like(view.present)
+        if isinstance(literal, (int, float)):
+            return view.present & _OPERATORS[op](view.ints, literal)
+        # A string is never equal to, or ordered against, an integer
+        return view.present.copy() if op == "!=" else np.zeros_like(view.present)
+
+    def __repr__(self):
+        return f"Comparison({self.field!r}, {self.op!r}, {self.value!r})"
+
+
+class And:
+    def __init__(self, children):
+        self.children = children
+
+    def mask(self, store, chunk, size, views):
+        mask = self.children[0].mask(store, chunk, size, views)
+        for child in self.children[1:]:
+            if not mask.any():
+                break
+            mask &= child.mask(store, chunk, size, views)
+        return mask
+
+
+class Or:
+    def __init__(self, children):
+        self.children = children
+
+    def mask(self, store, chunk, size, views):
+        mask = self.children[0].mask(store, chunk, size, views)
+        for child in self.children[1:]:
+            if mask.all():
+                break
+            mask |= child.mask(store, chunk, size, views)
+        return mask
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+
+    def mask(self, store, chunk, size, views):
+        return ~self.child.mask(store, chunk, size, views)
+
+
+class _Parser:
+    """Recursive-descent parser: OR binds loosest, then AND, then NOT."""
+
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.index = 0
+
+    def _peek(self):
+        return self.tokens[self.index] if self.index < len(self.tokens) else (None, None, -1)
+
+    def _next(self, expected=None):
+        kind, value, position = self._peek()
+        if kind is None:
+            raise QueryError("Unexpected end of expression")
+        if expected is not None and value != expected:
+            raise QueryError(f"Expected {expected!r} at position {position}, got {value!r}")
+        self.index += 1
+        return kind, value, position
+
+    def _accept(self, value):
+        if self._peek()[1] == value:
+            self.index += 1
+            return True
+        return False
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError("Empty expression")
+        node = self._or()
+        kind, value, position = self._peek()
+        if kind is not None:
+            raise QueryError(f"Unexpected {value!r} at position {position}")
+        return node
+
+    def _or(self):
+        children = [self._and()]
+        while self._accept("OR"):
+            children.append(self._and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def _and(self):
+        children = [self._not()]
+        while self._accept("AND"):
+            children.append(self._not())
+        return children[0] if len(children) == 1 else And(children)
+
+    def _not(self):
+        if self._accept("NOT"):
+            return Not(self._not())
+        if self._accept("("):
+            node = self._or()
+            self._next(")")
+            return node
+        return self._comparison()
+
+    def _comparison(self):
+        kind, field, position = self._next()
+        if kind != "word":
+            raise QueryError(f"Expected a field name at position {position}, got {field!r}")
+        if field not in TOP_LEVEL_FIELDS and not (field.startswith("metadata.") and len(field) > 9):
+            raise QueryError(f"Unknown field {field!r} at position {position}")
+
+        if self._accept("IN"):
+            self._next("(")
+            values = [self._literal()]
+            while self._accept(","):
+                values.append(self._literal())
+            self._next(")")
+            return Comparison(field, "in", tuple(values))
+
+        kind, op, position = self._next()
+        if kind != "op":
+            raise QueryError(f"Expected a comparison operator at position {position}, got {op!r}")
+        value = self._literal()
+        if value is None and op not in ("=", "!="):
+            raise QueryError(f"null can only be compared with = or != (position {position})")
+        return Comparison(field, op, value)
+
+    def _literal(self):
+        kind, value, position = self._next()
+        if kind == "number":
+            return float(value) if any(c in value for c in ".eE") else int(value)
+        if kind == "string":
+            return ast.literal_eval(value)
+        if kind == "keyword" and value in ("TRUE", "FALSE", "NULL"):
+            return {"TRUE": True, "FALSE": False, "NULL": None}[value]
+        raise QueryError(f"Expected a value at position {position}, got {value!r}")
+
+
+class Query:
+    """A compiled filter expression, see compile_query()."""
+
+    def __init__(self, text, root):
+        self.text = text
+        self.root = root
+
+    def mask(self, store, chunk, size):
+        """
+        Evaluate the query over the first `size` rows of a chunk.
+
+        Returns:
+            numpy.ndarray: One bool per row
+        """
+        return self.root.mask(store, chunk, size, {})
+
+    def __repr__(self):
+        return f"Query({self.text!r})"
+
+
+@lru_cache(maxsize=256)
+def compile_query(text):
+    """
+    Parse a filter expression, reusing the result for repeated expressions.
+
+    Raises:
+        QueryError: If the expression is invalid
+    """
+    if len(text) > MAX_QUERY_LENGTH:
+        raise QueryError(f"Expression is longer than {MAX_QUERY_LENGTH} characters")
+    try:
+        return Query(text, _Parser(text).parse())
+    except RecursionError:
+        raise QueryError("Expression is nested too deeply")
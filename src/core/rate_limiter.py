@@ -0,0 +1,231 @@
+import math
+import random
+import threading
+import time
+import logging
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# Services beyond max_tracked_services share this bucket so that a client
+# inventing service names cannot grow the bucket table without bound.
+OVERFLOW_SERVICE = "__overflow__"
+
+
+class TokenBucket:
+    """A token bucket that refills lazily whenever it is asked for tokens."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "lock")
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self, tokens=1.0, now=None):
+        """
+        Take tokens from the bucket if enough are available.
+
+        Args:
+            tokens (float): Number of tokens to take
+            now (float): Monotonic timestamp, defaults to time.monotonic()
+
+        Returns:
+            float: 0.0 if the tokens were taken, otherwise the number of
+            seconds until they will be available
+        """
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            elapsed = now - self.updated
+            if elapsed > 0:
+                self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+                self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+
+class ServiceRateLimiter:
+    """Per-service token buckets with optional per-service overrides."""
+
+    def __init__(self, default_rate=0.0, default_burst=0.0, overrides=None, max_services=10000):
+        """
+        Args:
+            default_rate (float): Logs per second allowed per service, 0 disables limiting
+            default_burst (float): Bucket capacity, defaults to one second of traffic
+            overrides (dict): service -> (rate, burst) for services with their own limit
+            max_services (int): Number of services tracked before sharing one bucket
+        """
+        self.default_rate = default_rate
+        self.default_burst = default_burst or default_rate
+        self.overrides = overrides or {}
+        self.max_services = max_services
+        self._buckets = {}
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(
+            default_rate=cfg.get("ingest.rate_limit", 0.0),
+            default_burst=cfg.get("ingest.rate_burst", 0.0),
+            overrides=parse_rate_overrides(cfg.get("ingest.service_rate_limits", "")),
+            max_services=cfg.get("ingest.max_tracked_services", 10000),
+        )
+
+    def _bucket_for(self, service):
+        bucket = self._buckets.get(service)
+        if bucket is not None:
+            return bucket
+
+        rate, burst = self.overrides.get(service, (self.default_rate, self.default_burst))
+        if rate <= 0:
+            return None
+        if service not in self.overrides and len(self._buckets) >= self.max_services:
+            service = OVERFLOW_SERVICE
+        # setdefault is atomic, so concurrent first requests share one bucket
+        # without a table-wide lock.
+        return self._buckets.setdefault(service, TokenBucket(rate, burst))
+
+    def acquire(self, service):
+        """
+        Account one log against the service's budget.
+
+        Args:
+            service (str): Name of the service sending the log
+
+        Returns:
+            float: 0.0 if the log is allowed, otherwise seconds to wait
+        """
+        bucket = self._bucket_for(service)
+        if bucket is None:
+            return 0.0
+        return bucket.try_acquire()
+
+
+class LogSampler:
+    """Level-aware probabilistic sampling of log records."""
+
+    def __init__(self, rates=None, default_rate=1.0):
+        """
+        Args:
+            rates (dict): level -> fraction of logs to keep (0.0-1.0)
+            default_rate (float): Fraction kept for levels not in rates
+        """
+        self.rates = {level.upper(): rate for level, rate in (rates or {}).items()}
+        self.default_rate = default_rate
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(rates=parse_sample_rates(cfg.get("ingest.sample_rates", "")))
+
+    def rate_for(self, level):
+        level = getattr(level, "value", level)
+        return self.rates.get(str(level).upper(), self.default_rate)
+
+    def keep(self, log_data):
+        """
+        Decide whether to keep a log record.
+
+        Kept records get a `_sample_rate` field so that counts can be
+        re-weighted by 1 / _sample_rate downstream.
+
+        Args:
+            log_data (dict): Log record, modified in place when kept
+
+        Returns:
+            bool: True if the record should be stored
+        """
+        rate = self.rate_for(log_data.get("level"))
+        if rate < 1.0 and random.random() >= rate:
+            return False
+        log_data["_sample_rate"] = rate
+        return True
+
+
+class LoadShedder:
+    """Global backpressure based on a high/low water mark over a queue depth."""
+
+    def __init__(self, high_water_mark=0, low_water_mark=0, retry_after=1.0):
+        """
+        Args:
+            high_water_mark (int): Depth at which ingestion starts being rejected, 0 disables
+            low_water_mark (int): Depth below which ingestion resumes, defaults to 90% of high
+            retry_after (float): Seconds clients are told to wait while shedding
+        """
+        self.high_water_mark = high_water_mark
+        self.low_water_mark = low_water_mark or int(high_water_mark * 0.9)
+        self.retry_after = retry_after
+        self.shedding = False
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(
+            high_water_mark=cfg.get("ingest.high_water_mark", 0),
+            low_water_mark=cfg.get("ingest.low_water_mark", 0),
+        )
+
+    def check(self, depth):
+        """
+        Check the current depth against the water marks.
+
+        Args:
+            depth (int): Current producer queue or store depth
+
+        Returns:
+            float: 0.0 if ingestion may proceed, otherwise seconds to wait
+        """
+        if not self.high_water_mark:
+            return 0.0
+        if self.shedding:
+            if depth <= self.low_water_mark:
+                self.shedding = False
+                logger.info(f"Load shedding stopped at depth {depth}")
+        elif depth >= self.high_water_mark:
+            self.shedding = True
+            logger.warning(f"Load shedding started at depth {depth}")
+        return self.retry_after if self.shedding else 0.0
+
+
+def parse_rate_overrides(spec):
+    """
+    Parse per-service limits of the form "svc-a=100:200,svc-b=10".
+
+    Returns:
+        dict: service -> (rate, burst)
+    """
+    overrides = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        service, _, value = item.partition("=")
+        rate, _, burst = value.partition(":")
+        rate = float(rate)
+        overrides[service.strip()] = (rate, float(burst) if burst else rate)
+    return overrides
+
+
+def parse_sample_rates(spec):
+    """
+    Parse level sample rates of the form "INFO=0.1,DEBUG=0.01".
+
+    Returns:
+        dict: level -> fraction of logs to keep
+    """
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        level, _, rate = item.partition("=")
+        rates[level.strip().upper()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+def retry_after_header(seconds):
+    """Format a wait time as a Retry-After header value (whole seconds, at least 1)."""
+    return str(max(1, math.ceil(seconds)))
+
+
+# Create singleton instances
+rate_limiter = ServiceRateLimiter.from_config(config)
+log_sampler = LogSampler.from_config(config)
+load_shedder = LoadShedder.from_config(config)
@@ -0,0 +1,371 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from .log_store import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+
+# Rollup keys are (service, level, status); timelines group by one of them
+GROUP_FIELDS = {"service": 0, "level": 1, "status": 2}
+
+# Metadata fields read when rolling up records
+STATUS_FIELD = "metadata.status"
+BYTES_FIELD = "metadata.size_bytes"
+PATH_FIELDS = ("metadata.request", "metadata.path")
+
+# Largest magnitude a byte count can have and still be summed in an int64
+_MAX_NUMBER = 2 ** 62
+
+
+def _dimension(value):
+    """Return a metadata value as a hashable scalar; anything but int, str and None is stringified."""
+    return value if value is None or isinstance(value, (int, str)) else str(value)
+
+
+def _categories(view):
+    """Return (codes, values) for a column view, with None for missing values."""
+    if view.ints is None:
+        return view.codes, [_dimension(value) for value in view.values]
+    uniques, codes = np.unique(view.ints, return_inverse=True)
+    present = view.present
+    values = [int(value) for value in uniques.tolist()]
+    if not present.all():
+        absent = int(view.ints[~present][0])
+        values = [None if value == absent else value for value in values]
+    return codes, values
+
+
+def _numbers(view, default):
+    """Return a column view as an int64 array, using `default` for non-numeric values."""
+    if view.ints is not None:
+        return np.where(view.present, view.ints, default)
+    table = np.array(
+        [int(value) if type(value) in (int, float) and -_MAX_NUMBER < value < _MAX_NUMBER else default
+         for value in view.values],
+        dtype=np.int64,
+    )
+    return table[view.codes]
+
+
+class Rollup:
+    """
+    Aggregated counts, byte sums and top paths for one time bucket.
+
+    Sampled logs are weighted by 1 / _sample_rate, so counts and sums are
+    estimates of what was sent and are kept as floats until reported.
+    """
+
+    __slots__ = ("start", "counts", "bytes", "paths")
+
+    def __init__(self, start):
+        self.start = start
+        self.counts = Counter()  # (service, level, status) -> logs
+        self.bytes = Counter()  # (service, level, status) -> sum of size_bytes
+        self.paths = Counter()  # path -> logs, trimmed to the most frequent
+
+    def merge(self, other, top_paths):
+        self.counts.update(other.counts)
+        self.bytes.update(other.bytes)
+        self.paths.update(other.paths)
+        self.trim(top_paths)
+
+    def trim(self, top_paths):
+        """Keep only the most frequent paths; counts of the rest are lost."""
+        if len(self.paths) > top_paths:
+            self.paths = Counter(dict(self.paths.most_common(top_paths)))
+
+    def to_dict(self):
+        by_field = {field: Counter() for field in GROUP_FIELDS}
+        for key, count in self.counts.items():
+            for field, index in GROUP_FIELDS.items():
+                by_field[field][key[index]] += count
+        return {
+            "start_ms": self.start,
+            "count": round(sum(self.counts.values())),
+            "bytes": round(sum(self.bytes.values())),
+            "by_service": {service: round(count) for service, count in by_field["service"].items()},
+            "by_level": {level: round(count) for level, count in by_field["level"].items()},
+            "by_status": {str(status): round(count) for status, count in by_field["status"].items()},
+            "top_paths": [{"path": path, "count": round(count)} for path, count in self.paths.most_common()],
+        }
+
+
+class RollupTier:
+    """Rollups of one bucket width, keyed by bucket start in epoch ms."""
+
+    def __init__(self, name, width_ms):
+        self.name = name
+        self.width = width_ms
+        self.buckets = {}
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def bucket(self, timestamp_ms):
+        start = timestamp_ms // self.width * self.width
+        rollup = self.buckets.get(start)
+        if rollup is None:
+            rollup = self.buckets[start] = Rollup(start)
+        return rollup
+
+    def pop_before(self, cutoff_ms):
+        """Remove and return the rollups that end at or before cutoff_ms, oldest first."""
+        starts = sorted(start for start in self.buckets if start + self.width <= cutoff_ms)
+        return [self.buckets.pop(start) for start in starts]
+
+    def in_range(self, since_ms=None, until_ms=None):
+        """Return the rollups overlapping [since_ms, until_ms), oldest first."""
+        return [
+            self.buckets[start] for start in sorted(self.buckets)
+            if (since_ms is None or start + self.width > since_ms)
+            and (until_ms is None or start < until_ms)
+        ]
+
+
+class RetentionManager:
+    """
+    Keeps a bounded raw window of logs and summarizes everything older.
+
+    Full store chunks that fall out of the raw window (by age or by count)
+    are evicted and rolled up into per-minute buckets. Minute buckets older
+    than their window are merged into per-hour buckets, and hour buckets
+    older than theirs are dropped, so memory is bounded by the window sizes
+    rather than by total history. Each record is counted in exactly one
+    tier at a time, so timelines add up the tiers they overlap. Records kept
+    by the log sampler count 1 / _sample_rate times in every tier.
+    """
+
+    def __init__(self, store, raw_window_seconds=3600, raw_max_logs=500000,
+                 minute_window_seconds=86400, hour_window_seconds=30 * 86400, top_paths=20):
+        """
+        Args:
+            store (LogStore): Store whose oldest chunks are evicted
+            raw_window_seconds (float): Age after which raw logs are rolled up (0 keeps them)
+            raw_max_logs (int): Raw logs kept regardless of age (0 for no limit)
+            minute_window_seconds (float): Age after which minute rollups become hourly (0 keeps them)
+            hour_window_seconds (float): Age after which hour rollups are dropped (0 keeps them)
+            top_paths (int): Paths kept per rollup bucket
+        """
+        self.store = store
+        self.raw_window = int(raw_window_seconds * 1000)
+        self.raw_max_logs = raw_max_logs
+        self.minute_window = int(minute_window_seconds * 1000)
+        self.hour_window = int(hour_window_seconds * 1000)
+        self.top_paths = top_paths
+        self.minutes = RollupTier("minute", MINUTE_MS)
+        self.hours = RollupTier("hour", HOUR_MS)
+        self._lock = threading.Lock()
+        self._checked_size = 0
+        self._checked_at = 0.0
+
+    @classmethod
+    def from_config(cls, store, cfg):
+        return cls(
+            store,
+            raw_window_seconds=cfg.get("retention.raw_window_seconds", 3600),
+            raw_max_logs=cfg.get("retention.raw_max_logs", 500000),
+            minute_window_seconds=cfg.get("retention.minute_window_seconds", 86400),
+            hour_window_seconds=cfg.get("retention.hour_window_seconds", 30 * 86400),
+            top_paths=cfg.get("retention.top_paths", 20),
+        )
+
+    def maybe_enforce(self):
+        """Cheap check for the write path: enforce once per chunk or once per second."""
+        size = len(self.store)
+        now = time.monotonic()
+        if size - self._checked_size < CHUNK_SIZE and now - self._checked_at < 1.0:
+            return
+        # Another thread is already enforcing, or a timeline query is running
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_size = size
+            self._checked_at = now
+            self._enforce(int(time.time() * 1000))
+        except Exception:
+            # Retention must not fail the write that happened to trigger it
+            logger.exception("Enforcing log retention failed")
+        finally:
+            self._lock.release()
+
+    def enforce(self, now_ms=None):
+        """Evict and roll up everything outside the configured windows."""
+        with self._lock:
+            self._enforce(int(time.time() * 1000) if now_ms is None else now_ms)
+
+    def _evictable(self, now_ms):
+        chunks = self.store.sealed_chunks()
+        count = 0
+        if self.raw_max_logs:
+            excess = self.store.retained - self.raw_max_logs
+            while count < len(chunks) and excess > 0:
+                excess -= chunks[count].size
+                count += 1
+        if self.raw_window:
+            cutoff = now_ms - self.raw_window
+            while count < len(chunks):
+                newest = chunks[count].ints["_kafka_timestamp"][-1]
+                if newest >= cutoff:
+                    break
+                count += 1
+        return count
+
+    def _enforce(self, now_ms):
+        # Each chunk is rolled up before it is evicted, so a failure leaves its logs in the raw window
+        for chunk in self.store.sealed_chunks()[:self._evictable(now_ms)]:
+            for rollup in self._roll_up(chunk, now_ms):
+                self.minutes.bucket(rollup.start).merge(rollup, self.top_paths)
+            self.store.evict_chunks(1)
+        if self.minute_window:
+            for rollup in self.minutes.pop_before(now_ms - self.minute_window):
+                self.hours.bucket(rollup.start).merge(rollup, self.top_paths)
+        if self.hour_window:
+            self.hours.pop_before(now_ms - self.hour_window)
+
+    def _roll_up(self, chunk, now_ms):
+        """Summarize a chunk into minute rollups, to be merged into the minute tier."""
+        store, size = self.store, chunk.size
+        stamps = _numbers(store.column_view(chunk, "_kafka_timestamp", size), now_ms)
+        minutes = stamps // MINUTE_MS
+        first_minute = int(minutes.min())
+        minutes -= first_minute
+
+        dimensions = [
+            _categories(store.column_view(chunk, field, size))
+            for field in ("service", "level", STATUS_FIELD)
+        ]
+        key = minutes
+        for codes, values in dimensions:
+            key = key * len(values) + codes
+        weights = store.sample_weights(chunk, size)
+        groups, inverse = np.unique(key, return_inverse=True)
+        counts = np.bincount(inverse, weights=weights)
+        sizes = np.bincount(inverse, weights=_numbers(store.column_view(chunk, BYTES_FIELD, size), 0) * weights)
+        rollups = RollupTier("minute", MINUTE_MS)
+        for group, count, total in zip(groups.tolist(), counts.tolist(), sizes.tolist()):
+            parts = []
+            for codes, values in reversed(dimensions):
+                group, code = divmod(group, len(values))
+                parts.append(values[code])
+            status, level, service = parts
+            rollup = rollups.bucket((first_minute + group) * MINUTE_MS)
+            rollup.counts[(service, level, status)] += count
+            rollup.bytes[(service, level, status)] += total
+
+        for field in PATH_FIELDS:
+            codes, values = _categories(store.column_view(chunk, field, size))
+            if all(value is None for value in values):
+                continue
+            groups, inverse = np.unique(minutes * len(values) + codes, return_inverse=True)
+            counts = np.bincount(inverse, weights=weights)
+            for group, count in zip(groups.tolist(), counts.tolist()):
+                minute, code = divmod(group, len(values))
+                if values[code] is not None:
+                    rollups.bucket((first_minute + minute) * MINUTE_MS).paths[values[code]] += count
+        return list(rollups.buckets.values())
+
+    def _raw_timeline(self, counts, resolution, since_ms, until_ms, service, group_index):
+        store = self.store
+        field = ("service", "level", STATUS_FIELD)[group_index]
+        for chunk, first, stop in store.iter_chunks():
+            stamps = store.column_view(chunk, "_kafka_timestamp", stop)
+            if stamps.ints is None:
+                stamps_ms, mask = _numbers(stamps, 0), np.ones(stop, dtype=bool)
+            else:
+                stamps_ms, mask = stamps.ints, stamps.present.copy()
+            mask[:first] = False
+            if since_ms is not None:
+                mask &= stamps_ms >= since_ms
+            if until_ms is not None:
+                mask &= stamps_ms < until_ms
+            if service is not None:
+                view = store.column_view(chunk, "service", stop)
+                mask &= np.asarray(view.values == service, dtype=bool)[view.codes]
+            if not mask.any():
+                continue
+
+            codes, values = _categories(store.column_view(chunk, field, stop))
+            buckets = stamps_ms[mask] // resolution
+            first_bucket = int(buckets.min())
+            key = (buckets - first_bucket) * len(values) + codes[mask]
+            weights = store.sample_weights(chunk, stop)[mask]
+            sizes = _numbers(store.column_view(chunk, BYTES_FIELD, stop), 0)[mask] * weights
+            groups, inverse = np.unique(key, return_inverse=True)
+            group_counts = np.bincount(inverse, weights=weights)
+            group_sizes = np.bincount(inverse, weights=sizes)
+            for group, count, total in zip(groups.tolist(), group_counts.tolist(), group_sizes.tolist()):
+                bucket, code = divmod(group, len(values))
+                entry = counts[((first_bucket + bucket) * resolution, values[code])]
+                entry[0] += count
+                entry[1] += total
+
+    def timeline(self, resolution_seconds=60, since_ms=None, until_ms=None, service=None, group_by="level"):
+        """
+        Count logs per time bucket across the raw window and both rollup tiers.
+
+        The requested resolution is raised to the width of the coarsest tier
+        that has data in the range, since finer detail no longer exists there.
+
+        Args:
+            resolution_seconds (int): Requested bucket width
+            since_ms (int): Start of the range in epoch ms
+            until_ms (int): End of the range in epoch ms
+            service (str): Only logs from this service
+            group_by (str): "level", "service" or "status"
+
+        Returns:
+            dict: Effective resolution, tiers used and buckets of
+                {"time_ms", "group", "count", "bytes"}, oldest first; sampled
+                logs are counted 1 / _sample_rate times
+        """
+        group_index = GROUP_FIELDS[group_by]
+        with self._lock:
+            hours = self.hours.in_range(since_ms, until_ms)
+            minutes = self.minutes.in_range(since_ms, until_ms)
+            width = HOUR_MS if hours else MINUTE_MS if minutes else 1
+            resolution = max(int(resolution_seconds * 1000), width, 1000)
+            resolution = -(-resolution // width) * width
+
+            counts = defaultdict(lambda: [0, 0])
+            for rollup in hours + minutes:
+                bucket = rollup.start // resolution * resolution
+                for key, count in rollup.counts.items():
+                    if service is not None and key[0] != service:
+                        continue
+                    entry = counts[(bucket, key[group_index])]
+                    entry[0] += count
+                    entry[1] += rollup.bytes.get(key, 0)
+            self._raw_timeline(counts, resolution, since_ms, until_ms, service, group_index)
+
+        tiers = [name for name, used in (("hour", hours), ("minute", minutes)) if used]
+        if self.store.retained:
+            tiers.append("raw")
+        return {
+            "resolution_seconds": resolution / 1000,
+            "tiers": tiers,
+            "buckets": [
+                {"time_ms": bucket, "group": group, "count": round(count), "bytes": round(size)}
+                for (bucket, group), (count, size) in sorted(counts.items(), key=lambda item: (item[0][0], str(item[0][1])))
+            ],
+        }
+
+    def rollups(self, tier="minute", since_ms=None, until_ms=None):
+        """Return the rollup buckets of a tier overlapping a range, oldest first."""
+        tiers = {"minute": self.minutes, "hour": self.hours}
+        with self._lock:
+            return [rollup.to_dict() for rollup in tiers[tier].in_range(since_ms, until_ms)]
+
+    def stats(self):
+        return {
+            "raw_logs": self.store.retained,
+            "first_offset": self.store.first_offset,
+            "minute_buckets": len(self.minutes),
+            "hour_buckets": len(self.hours),
+        }
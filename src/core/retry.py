@@ -0,0 +1,199 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter and a cap on attempts."""
+
+    def __init__(self, max_attempts=3, base_delay=0.1, max_delay=10.0, jitter=True):
+        """
+        Args:
+            max_attempts (int): Deliveries tried in total, including the first
+            base_delay (float): Delay in seconds before the first retry
+            max_delay (float): Upper bound on any delay in seconds
+            jitter (bool): Pick a random delay up to the backoff instead of the backoff itself
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(
+            max_attempts=cfg.get("consumer.retry_max_attempts", 3),
+            base_delay=cfg.get("consumer.retry_base_delay_ms", 100) / 1000,
+            max_delay=cfg.get("consumer.retry_max_delay_ms", 10000) / 1000,
+        )
+
+    def should_retry(self, attempts):
+        """Return True if a message that failed `attempts` times may be tried again."""
+        return attempts < self.max_attempts
+
+    def delay(self, attempts):
+        """
+        Seconds to wait before the next attempt.
+
+        Args:
+            attempts (int): Number of failed attempts so far (1 after the first failure)
+        """
+        backoff = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        if self.jitter:
+            return random.uniform(0, backoff)
+        return backoff
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing subscriber for a while.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    allow() returns False until `reset_timeout` has passed. It then lets
+    one call through (half-open): a success closes it again, a failure
+    re-opens it for another timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(
+            failure_threshold=cfg.get("consumer.breaker_failure_threshold", 5),
+            reset_timeout=cfg.get("consumer.breaker_reset_timeout_ms", 30000) / 1000,
+        )
+
+    def allow(self, now=None):
+        """Return True if the subscriber may be called now."""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        if self.state != self.CLOSED or self.failures:
+            with self._lock:
+                if self.state != self.CLOSED:
+                    logger.info("Circuit breaker closed")
+                self.state = self.CLOSED
+                self.failures = 0
+
+    def reset(self):
+        """Close the breaker regardless of its current state."""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit breaker opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = now
+
+
+class RetryScheduler:
+    """
+    Runs delayed tasks on a single background thread.
+
+    Retries are kept in a heap ordered by due time, so waiting retries cost
+    nothing on the thread that dispatches new messages. Tasks still waiting
+    when the scheduler stops are not run; their on_cancel callback is
+    called instead.
+    """
+
+    def __init__(self, max_pending=10000, name="retry-scheduler"):
+        self.max_pending = max_pending
+        self.name = name
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, delay, task, on_cancel=None):
+        """
+        Run `task()` after `delay` seconds.
+
+        Args:
+            delay (float): Seconds to wait
+            task (callable): Called on the scheduler thread
+            on_cancel (callable): Called instead if the scheduler stops before the task is due
+
+        Returns:
+            bool: False if the scheduler is full and the task was not accepted
+        """
+        with self._condition:
+            if len(self._heap) >= self.max_pending:
+                return False
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), task, on_cancel))
+            self._condition.notify()
+        self._ensure_started()
+        return True
+
+    def _ensure_started(self):
+        if self._running:
+            return
+        with self._condition:
+            if not self._running:
+                self._running = True
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stop the thread and cancel the tasks that are still waiting."""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        with self._condition:
+            pending, self._heap = self._heap, []
+        for _, _, _, on_cancel in sorted(pending):
+            if on_cancel is None:
+                continue
+            try:
+                on_cancel()
+            except Exception as e:
+                logger.error(f"Error cancelling scheduled retry: {e}")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._condition.wait(timeout)
+                if not self._running:
+                    return
+                _, _, task, _ = heapq.heappop(self._heap)
+            try:
+                task()
+            except Exception as e:
+                logger.error(f"Error in scheduled retry: {e}")
+
@@ -0,0 +1,229 @@
+import json
+import os
+import struct
+import threading
+
+from .avro import AvroError, Cursor, Schema, SchemaError, compatibility_errors
+from .config import config
+
+# Confluent wire format: magic byte 0, then the schema id as a 4-byte big-endian integer
+MAGIC_BYTE = 0
+HEADER = struct.Struct(">bI")
+
+COMPATIBILITY_MODES = ("NONE", "BACKWARD", "FORWARD", "FULL")
+
+# Version 1 of the log entry schema. Metadata values must be scalars.
+LOG_ENTRY_SCHEMA = {
+    "type": "record",
+    "name": "LogEntry",
+    "namespace": "kafka_log_api",
+    "fields": [
+        {"name": "service", "type": "string"},
+        {"name": "level", "type": "string"},
+        {"name": "message", "type": "string"},
+        {"name": "timestamp", "type": ["null", "string"], "default": None},
+        {"name": "metadata", "type": {"type": "map", "values": ["null", "boolean", "long", "double", "string"]},
+         "default": {}},
+        {"name": "event_id", "type": ["null", "string"], "default": None},
+    ],
+}
+
+
+class IncompatibleSchemaError(SchemaError):
+    """Raised when a new schema version breaks the subject's compatibility mode."""
+
+
+class RegistryFullError(SchemaError):
+    """Raised when registering a schema would exceed the registry's version limit."""
+
+
+def log_subject(topic=None):
+    """Subject of the log entry schema, named after the topic like a Kafka record value."""
+    return f"{topic or config.get('kafka.topic_name', 'logs')}-value"
+
+
+class SchemaRegistry:
+    """
+    In-process stand-in for a Confluent-style schema registry.
+
+    Schemas get global integer ids and are registered as versions of a
+    subject. A new version must satisfy the compatibility mode against the
+    subject's latest version: BACKWARD means it can read data written with
+    the latest version, FORWARD that the latest can read its data, FULL both.
+    With a path, the registry is loaded from and saved to a JSON file. At
+    most max_versions versions are kept across all subjects.
+
+    Encoded messages carry their schema id, and decoding resolves the
+    writer's schema against the reader's, so producers and consumers can
+    upgrade independently. Encoders and decoders are compiled once per
+    schema id, or pair of writer and reader ids, and cached.
+    """
+
+    def __init__(self, path=None, compatibility="BACKWARD", max_versions=1000):
+        if compatibility not in COMPATIBILITY_MODES:
+            raise ValueError(f"Unknown compatibility mode: {compatibility}")
+        self.path = path
+        self.compatibility = compatibility
+        self.max_versions = max_versions
+        self._schemas = {}  # id -> Schema
+        self._subjects = {}  # subject -> [ids], oldest version first
+        self._decoders = {}  # (writer id, reader id) -> decoder
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    @classmethod
+    def from_config(cls, cfg):
+        registry = cls(
+            path=cfg.get("schema_registry.path") or None,
+            compatibility=cfg.get("schema_registry.compatibility", "BACKWARD"),
+            max_versions=cfg.get("schema_registry.max_versions", 1000),
+        )
+        registry.register(log_subject(cfg.get("kafka.topic_name", "logs")), LOG_ENTRY_SCHEMA)
+        return registry
+
+    def _load(self):
+        with open(self.path) as f:
+            state = json.load(f)
+        self._schemas = {int(schema_id): Schema(definition) for schema_id, definition in state["schemas"].items()}
+        self._subjects = {subject: list(ids) for subject, ids in state["subjects"].items()}
+
+    def _save(self):
+        state = {
+            "schemas": {schema_id: schema.definition for schema_id, schema in self._schemas.items()},
+            "subjects": self._subjects,
+        }
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(temporary, self.path)
+
+    def register(self, subject, definition):
+        """
+        Register a schema as the newest version of a subject.
+
+        Registering a schema the subject already has returns its id.
+
+        Returns:
+            int: Schema id
+
+        Raises:
+            SchemaError: If the schema is invalid
+            IncompatibleSchemaError: If it breaks the compatibility mode
+            RegistryFullError: If the registry already holds max_versions versions
+        """
+        schema = Schema(definition)
+        with self._lock:
+            versions = self._subjects.get(subject, [])
+            for schema_id in versions:
+                if self._schemas[schema_id].canonical == schema.canonical:
+                    return schema_id
+
+            if versions and self.compatibility != "NONE":
+                latest = self._schemas[versions[-1]]
+                problems = []
+                if self.compatibility in ("BACKWARD", "FULL"):
+                    problems += compatibility_errors(reader=schema, writer=latest)
+                if self.compatibility in ("FORWARD", "FULL"):
+                    problems += compatibility_errors(reader=latest, writer=schema)
+                if problems:
+                    raise IncompatibleSchemaError(
+                        f"Schema is not {self.compatibility} compatible with version {len(versions)} "
+                        f"of {subject}: {'; '.join(problems)}"
+                    )
+
+            if sum(len(ids) for ids in self._subjects.values()) >= self.max_versions:
+                raise RegistryFullError(f"Schema registry is full ({self.max_versions} versions)")
+
+            # The same schema gets the same id in every subject
+            schema_id = next(
+                (i for i, known in self._schemas.items() if known.canonical == schema.canonical),
+                len(self._schemas) + 1,
+            )
+            self._schemas.setdefault(schema_id, schema)
+            self._subjects[subject] = versions + [schema_id]
+            if self.path:
+                self._save()
+            return schema_id
+
+    def get(self, schema_id):
+        """Return the Schema with an id, raising SchemaError if it is unknown."""
+        schema = self._schemas.get(schema_id)
+        if schema is None:
+            raise SchemaError(f"Unknown schema id {schema_id}")
+        return schema
+
+    def versions(self, subject):
+        """Return the schema ids of a subject, oldest first."""
+        return list(self._subjects.get(subject, ()))
+
+    def subjects(self):
+        return sorted(self._subjects)
+
+    def latest_id(self, subject):
+        versions = self._subjects.get(subject)
+        if not versions:
+            raise SchemaError(f"Unknown subject {subject}")
+        return versions[-1]
+
+    def encode(self, subject, value, schema_id=None):
+        """
+        Encode a value with its schema id in front.
+
+        Args:
+            subject (str): Subject whose latest version is used
+            value: Value to encode
+            schema_id (int): Encode with this schema instead
+
+        Returns:
+            bytes: Magic byte, schema id and Avro body
+        """
+        schema_id = schema_id or self.latest_id(subject)
+        out = bytearray(HEADER.pack(MAGIC_BYTE, schema_id))
+        return bytes(self.get(schema_id).encode(value, out))
+
+    def _decoder(self, writer_id, reader_id):
+        decoder = self._decoders.get((writer_id, reader_id))
+        if decoder is None:
+            writer = self.get(writer_id)
+            decoder = writer.decoder(self.get(reader_id) if reader_id else writer)
+            self._decoders[(writer_id, reader_id)] = decoder
+        return decoder
+
+    def decode_from(self, cursor, subject=None):
+        """
+        Decode the next message in a cursor.
+
+        Args:
+            cursor (Cursor): Position of the message
+            subject (str): Resolve the data to this subject's latest version,
+                defaults to the schema it was written with
+
+        Raises:
+            AvroError: If the data is not a well-formed message
+            SchemaError: If the schema id is unknown
+        """
+        if len(cursor.data) - cursor.pos < HEADER.size:
+            raise AvroError(f"Truncated message header at byte {cursor.pos}")
+        magic, writer_id = HEADER.unpack_from(cursor.data, cursor.pos)
+        if magic != MAGIC_BYTE:
+            raise AvroError(f"Unknown magic byte {magic} at byte {cursor.pos}")
+        cursor.pos += HEADER.size
+        reader_id = self.latest_id(subject) if subject else None
+        return self._decoder(writer_id, reader_id)(cursor)
+
+    def decode(self, data, subject=None):
+        """Decode one message, see decode_from()."""
+        return self.decode_from(Cursor(data), subject)
+
+    def decode_all(self, data, subject=None):
+        """Decode a buffer of back-to-back messages."""
+        cursor = Cursor(data)
+        values = []
+        while not cursor.at_end():
+            values.append(self.decode_from(cursor, subject))
+        return values
+
+
+# Create a singleton instance
+schema_registry = SchemaRegistry.from_config(config)
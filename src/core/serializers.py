@@ -0,0 +1,54 @@
+import json
+
+from .schema_registry import log_subject, schema_registry
+
+try:
+    import msgpack
+except ImportError:  # msgpack support is optional
+    msgpack = None
+
+
+def json_serializer(log_data):
+    """Encode a log dict as JSON."""
+    return json.dumps(log_data).encode()
+
+
+def json_deserializer(value):
+    """Decode a JSON message value into a log dict."""
+    return json.loads(value)
+
+
+def avro_serializer(log_data):
+    """Encode a log dict with the latest log entry schema, prefixed by its schema id."""
+    return schema_registry.encode(log_subject(), log_data)
+
+
+def avro_deserializer(value):
+    """Decode a schema-id-prefixed Avro message into a log dict of the latest log entry schema."""
+    return schema_registry.decode(value, log_subject())
+
+
+def msgpack_serializer(log_data):
+    """Encode a log dict as MessagePack."""
+    return msgpack.packb(log_data)
+
+
+def msgpack_deserializer(value):
+    """Decode a MessagePack message value into a log dict."""
+    return msgpack.unpackb(value)
+
+
+# Message value formats by name; producer.serializer and consumer.deserializer pick one
+SERIALIZERS = {
+    "json": json_serializer,
+    "avro": avro_serializer,
+}
+
+DESERIALIZERS = {
+    "json": json_deserializer,
+    "avro": avro_deserializer,
+}
+
+if msgpack is not None:
+    SERIALIZERS["msgpack"] = msgpack_serializer
+    DESERIALIZERS["msgpack"] = msgpack_deserializer
@@ -0,0 +1,288 @@
+import hashlib
+import heapq
+import math
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+# Values tracked for top-k queries, by the metadata fields they are read from
+TOP_DIMENSIONS = {
+    "ip": ("ip",),
+    "path": ("request", "path"),
+    "user_agent": ("user_agent",),
+}
+
+
+def stable_hash(value):
+    """64-bit hash that is the same in every process, unlike hash()."""
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+
+@lru_cache(maxsize=65536)
+def _register(value, precision):
+    """HyperLogLog register index and rank of a value; client IPs repeat, so these are cached."""
+    digest = stable_hash(value)
+    rest = digest & ((1 << (64 - precision)) - 1)
+    return digest >> (64 - precision), 64 - precision - rest.bit_length() + 1
+
+
+class SpaceSaving:
+    """
+    Approximate top-k counts in fixed memory (Metwally et al.).
+
+    At most `capacity` values are tracked. A new value replaces the one
+    with the smallest count and inherits that count as its error, so the
+    true count of a reported value lies between count - error and count.
+    """
+
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.counts = {}  # value -> [count, error]
+        self._heap = []  # one (count, value) per tracked value; counts may be stale
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, value, count=1):
+        entry = self.counts.get(value)
+        if entry is not None:
+            entry[0] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[value] = [count, 0]
+            heapq.heappush(self._heap, (count, value))
+            return
+
+        # Counts only grow, so refresh stale heap entries until the true minimum is on top
+        while True:
+            low, victim = self._heap[0]
+            current = self.counts[victim][0]
+            if low == current:
+                break
+            heapq.heapreplace(self._heap, (current, victim))
+        del self.counts[victim]
+        self.counts[value] = [low + count, low]
+        heapq.heapreplace(self._heap, (low + count, value))
+
+    def minimum(self):
+        """Smallest tracked count, an upper bound for any untracked value when full."""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counts.values())
+
+    def merge(self, other):
+        """Add the counts of another summary, keeping the `capacity` largest."""
+        own_floor, other_floor = self.minimum(), other.minimum()
+        merged = {}
+        for value in self.counts.keys() | other.counts.keys():
+            count, error = self.counts.get(value, (own_floor, own_floor))
+            other_count, other_error = other.counts.get(value, (other_floor, other_floor))
+            merged[value] = [count + other_count, error + other_error]
+        top = sorted(merged.items(), key=lambda item: item[1][0], reverse=True)[:self.capacity]
+        self.counts = dict(top)
+        self._heap = [(entry[0], value) for value, entry in top]
+        heapq.heapify(self._heap)
+
+    def top(self, k=10):
+        """Return the k largest counts as dicts of value, count and error."""
+        items = sorted(self.counts.items(), key=lambda item: item[1][0], reverse=True)[:k]
+        return [{"value": value, "count": count, "error": error} for value, (count, error) in items]
+
+
+class HyperLogLog:
+    """Distinct-value estimate in 2 ** precision bytes, with about 1.04 / sqrt(2 ** precision) error."""
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        index, rank = _register(value, self.precision)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        merged = np.maximum(np.frombuffer(self.registers, dtype=np.uint8),
+                            np.frombuffer(other.registers, dtype=np.uint8))
+        self.registers = bytearray(merged.tobytes())
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        ranks = np.frombuffer(self.registers, dtype=np.uint8)
+        estimate = alpha * m * m / float(np.ldexp(1.0, -ranks.astype(np.int32)).sum())
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty
+            return round(m * math.log(m / zeros))
+        return round(estimate)
+
+
+class SketchWindow:
+    """Top-k summaries and per-service unique IP counts for one time window."""
+
+    __slots__ = ("start", "top", "unique_ips")
+
+    def __init__(self, start, top_capacity):
+        self.start = start
+        self.top = {dimension: SpaceSaving(top_capacity) for dimension in TOP_DIMENSIONS}
+        self.unique_ips = {}  # service -> HyperLogLog
+
+
+class StatsSketches:
+    """
+    Heavy hitters and unique clients over a ring of fixed-size time windows.
+
+    Each window holds one Space-Saving summary per dimension and one
+    HyperLogLog per service (up to max_services, the rest share "_other"),
+    so memory per window is fixed. Queries over several windows, or over
+    other workers' sketches, merge the per-window sketches.
+    """
+
+    OTHER_SERVICES = "_other"
+
+    def __init__(self, window_seconds=60, windows=60, top_capacity=200, precision=12, max_services=100):
+        self.window = int(window_seconds * 1000)
+        self.windows = windows
+        self.top_capacity = top_capacity
+        self.precision = precision
+        self.max_services = max_services
+        self._windows = {}  # window index -> SketchWindow
+        self._latest = (None, None)  # index and window of the latest add
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(
+            window_seconds=cfg.get("stats.window_seconds", 60),
+            windows=cfg.get("stats.windows", 60),
+            top_capacity=cfg.get("stats.top_capacity", 200),
+            precision=cfg.get("stats.hll_precision", 12),
+            max_services=cfg.get("stats.max_services", 100),
+        )
+
+    def _window_for(self, index):
+        window = self._windows.get(index)
+        if window is None:
+            window = self._windows[index] = SketchWindow(index * self.window, self.top_capacity)
+            for old in [i for i in self._windows if i <= index - self.windows]:
+                del self._windows[old]
+            self._latest = (None, None)
+        return window
+
+    def add(self, log_data):
+        """
+        Update the sketches with one stored log, using its _kafka_timestamp.
+
+        A log kept by the sampler at rate r adds 1 / r to the top-k counts.
+        Unique IP counts cannot be re-weighted and only see the kept logs.
+        """
+        metadata = log_data.get("metadata")
+        if type(metadata) is not dict:
+            return
+        timestamp = log_data.get("_kafka_timestamp")
+        if type(timestamp) is not int:
+            timestamp = int(time.time() * 1000)
+        rate = log_data.get("_sample_rate")
+        weight = 1.0 / rate if type(rate) is float and rate > 0 else 1
+
+        ip = metadata.get("ip")
+        path = metadata.get("request")
+        if path is None:
+            path = metadata.get("path")
+        user_agent = metadata.get("user_agent")
+
+        index = timestamp // self.window
+        with self._lock:
+            latest, window = self._latest
+            if index != latest:
+                window = self._window_for(index)
+                self._latest = (index, window)
+            top = window.top
+            if path is not None:
+                path = str(path)
+                if "?" in path:
+                    path = path.split("?", 1)[0]
+                top["path"].add(path, weight)
+            if user_agent is not None:
+                top["user_agent"].add(str(user_agent), weight)
+            if ip is not None:
+                ip = str(ip)
+                top["ip"].add(ip, weight)
+                service = str(log_data.get("service"))
+                sketch = window.unique_ips.get(service)
+                if sketch is None:
+                    if len(window.unique_ips) >= self.max_services:
+                        service = self.OTHER_SERVICES
+                    sketch = window.unique_ips.setdefault(service, HyperLogLog(self.precision))
+                sketch.add(ip)
+
+    def _recent(self, window_seconds, now_ms):
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        current = now_ms // self.window
+        count = self.windows if window_seconds is None else max(1, math.ceil(window_seconds * 1000 / self.window))
+        return [window for index, window in sorted(self._windows.items()) if current - count < index <= current]
+
+    def top(self, dimension, k=10, window_seconds=None, now_ms=None):
+        """
+        Return the most frequent values of a dimension over recent windows.
+
+        Args:
+            dimension (str): One of TOP_DIMENSIONS
+            k (int): Number of values to return
+            window_seconds (float): How far back to look, defaults to all windows kept
+            now_ms (int): Current time in epoch ms
+
+        Returns:
+            list: Dicts of value, count and error, largest count first; counts
+                of sampled logs are estimates, rounded to whole logs
+        """
+        merged = SpaceSaving(self.top_capacity)
+        with self._lock:
+            for window in self._recent(window_seconds, now_ms):
+                merged.merge(window.top[dimension])
+        return [
+            {**item, "count": round(item["count"]), "error": round(item["error"])}
+            for item in merged.top(k)
+        ]
+
+    def cardinality(self, window_seconds=None, service=None, now_ms=None):
+        """
+        Estimate unique IPs per service over recent windows.
+
+        Returns:
+            dict: {"services": {service: estimate}, "total": estimate across services}
+        """
+        per_service = {}
+        with self._lock:
+            for window in self._recent(window_seconds, now_ms):
+                for name, sketch in window.unique_ips.items():
+                    if service is not None and name != service:
+                        continue
+                    merged = per_service.get(name)
+                    if merged is None:
+                        merged = per_service[name] = HyperLogLog(self.precision)
+                    merged.merge(sketch)
+        total = HyperLogLog(self.precision)
+        for sketch in per_service.values():
+            total.merge(sketch)
+        return {
+            "services": {name: sketch.count() for name, sketch in per_service.items()},
+            "total": total.count(),
+        }
+
+    def merge(self, other):
+        """Fold in another worker's sketches; both must use the same window size."""
+        if other.window != self.window:
+            raise ValueError("Cannot merge sketches with different window sizes")
+        with self._lock:
+            for index, theirs in other._windows.items():
+                ours = self._window_for(index)
+                for dimension, summary in theirs.top.items():
+                    ours.top[dimension].merge(summary)
+                for service, sketch in theirs.unique_ips.items():
+                    ours.unique_ips.setdefault(service, HyperLogLog(self.precision)).merge(sketch)
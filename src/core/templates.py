@@ -0,0 +1,185 @@
+import re
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+WILDCARD = "<*>"
+
+_has_digit = re.compile(r"\d").search
+
+
+class LogCluster:
+    """A group of messages sharing one template."""
+
+    __slots__ = ("cluster_id", "tokens", "version", "count")
+
+    def __init__(self, cluster_id, tokens, version):
+        self.cluster_id = cluster_id
+        self.tokens = tokens
+        self.version = version
+        self.count = 0
+
+    @property
+    def template(self):
+        return " ".join(self.tokens)
+
+
+class TemplateMiner:
+    """
+    Online log template extraction in the style of Drain.
+
+    Messages are split on single spaces and routed through a fixed-depth
+    prefix tree (token count, then the first `depth` tokens) to a short list
+    of candidate clusters. A message joins the most similar cluster when at
+    least `similarity` of its tokens match, and positions that disagree
+    become wildcards.
+
+    Each record is encoded as a template version id plus the tokens found at
+    the wildcard positions. Generalising a cluster creates a new version
+    instead of rewriting the old one, so records encoded earlier still
+    decode to their original message.
+
+    Clusters are capped per leaf and in total. Old versions must stay
+    decodable, so clusters are never evicted; once a cap is reached,
+    messages that match no existing cluster are stored verbatim.
+    """
+
+    def __init__(self, depth=2, similarity=0.5, max_children=100, max_tokens=64,
+                 max_leaf_clusters=50, max_clusters=10000):
+        """
+        Args:
+            depth (int): Number of leading tokens used to route a message
+            similarity (float): Fraction of matching tokens needed to join a cluster
+            max_children (int): Distinct tokens per tree node before falling back to a wildcard branch
+            max_tokens (int): Messages with more tokens are stored verbatim
+            max_leaf_clusters (int): Clusters compared against per message
+            max_clusters (int): Clusters across the whole tree
+        """
+        self.depth = depth
+        self.similarity = similarity
+        self.max_children = max_children
+        self.max_tokens = max_tokens
+        self.max_leaf_clusters = max_leaf_clusters
+        self.max_clusters = max_clusters
+        self.clusters = []
+        self.versions = []  # version id -> (cluster, template tokens)
+        self._tree = {}
+        self._lock = threading.Lock()
+
+    def _route(self, tokens):
+        """Return the leaf list of clusters for a token sequence, creating nodes as needed."""
+        node = self._tree.setdefault(len(tokens), {})
+        for token in tokens[:self.depth]:
+            child = node.get(token)
+            if child is None:
+                # Tokens with digits are likely variables, never branch on them
+                if _has_digit(token) or len(node) >= self.max_children:
+                    token = WILDCARD
+                child = node.setdefault(token, {})
+            node = child
+        return node.setdefault(None, [])
+
+    def _best_match(self, leaf, tokens):
+        best, best_score = None, -1.0
+        for cluster in leaf:
+            same = sum(a == b or a == WILDCARD for a, b in zip(cluster.tokens, tokens))
+            score = same / len(tokens)
+            if score > best_score:
+                best, best_score = cluster, score
+        if best_score >= self.similarity:
+            return best
+        return None
+
+    def _new_version(self, cluster, tokens):
+        cluster.version = len(self.versions)
+        cluster.tokens = tokens
+        self.versions.append((cluster, tokens))
+
+    def encode(self, message):
+        """
+        Encode a message as a template reference.
+
+        Args:
+            message (str): Log message
+
+        Returns:
+            tuple: (version_id, params), or (None, message) when the message
+            is not templated
+        """
+        if not isinstance(message, str):
+            return None, message
+        tokens = tuple(message.split(" "))
+        if not message or len(tokens) > self.max_tokens:
+            return None, message
+
+        params = []
+        with self._lock:
+            leaf = self._route(tokens)
+            cluster = self._best_match(leaf, tokens)
+            if cluster is None:
+                if len(leaf) >= self.max_leaf_clusters or len(self.clusters) >= self.max_clusters:
+                    return None, message
+                cluster = LogCluster(len(self.clusters), None, None)
+                self.clusters.append(cluster)
+                self._new_version(cluster, tokens)
+                leaf.append(cluster)
+            else:
+                # One pass collects the parameters and notices positions that
+                # need to become wildcards
+                changed = False
+                for slot, token in zip(cluster.tokens, tokens):
+                    if slot == WILDCARD:
+                        params.append(token)
+                    elif slot != token:
+                        changed = True
+                        params.append(token)
+                if changed:
+                    self._new_version(cluster, tuple(
+                        slot if slot == token else WILDCARD
+                        for slot, token in zip(cluster.tokens, tokens)
+                    ))
+            cluster.count += 1
+            version = cluster.version
+
+        return version, tuple(params)
+
+    def decode(self, version, params):
+        """
+        Rebuild the original message from a template reference.
+
+        Args:
+            version (int): Template version id returned by encode()
+            params (tuple): Wildcard tokens returned by encode()
+
+        Returns:
+            str: The original message
+        """
+        if version is None:
+            return params
+        template = self.versions[version][1]
+        if not params:
+            return " ".join(template)
+        values = iter(params)
+        return " ".join(next(values) if token == WILDCARD else token for token in template)
+
+    def cluster_id(self, version):
+        """Return the stable cluster id for a template version, or None."""
+        if version is None:
+            return None
+        return self.versions[version][0].cluster_id
+
+    def templates(self):
+        """
+        Summarise the current templates.
+
+        Returns:
+            list: dicts with template_id, template and count, most frequent first
+        """
+        with self._lock:
+            summary = [
+                {"template_id": cluster.cluster_id, "template": cluster.template, "count": cluster.count}
+                for cluster in self.clusters
+            ]
+        summary.sort(key=lambda item: item["count"], reverse=True)
+        return summary
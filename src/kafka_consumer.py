@@ -4,31 +4,178 @@ import time
 import logging
 from datetime import datetime
 from queue import Queue
-from .kafka_producer import kafka_logger
+from .core.config import config
+from .core.dead_letter import DeadLetterStore
+from .core.lazy import Lazy
+from .core.logger import RateLimitedLogger
+from .core.retry import RetryPolicy, CircuitBreaker, RetryScheduler
+from .core.kafka_producer import get_kafka_logger
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# One line per message would dominate dispatch, so these are rate-limited
+message_logger = RateLimitedLogger.from_config(logger, config)
+
+# Shortest sleep between polls, so a max_latency_ms of 0 does not spin the loop
+MIN_POLL_INTERVAL = 0.001
+
+class Subscriber:
+    """A registered callback with its own retry policy and circuit breaker."""
+
+    def __init__(self, callback, name, retry_policy, breaker):
+        self.callback = callback
+        self.name = name
+        self.retry_policy = retry_policy
+        self.breaker = breaker
+
+    def status(self):
+        return {
+            "name": self.name,
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+class BatchSubscriber(Subscriber):
+    """
+    A callback that receives messages in batches.
+
+    Pending messages are tracked as a range of store offsets and only read
+    when the batch is delivered, either as a list of dicts or, with
+    `columnar`, as a dict of columns from LogStore.columns().
+    """
+
+    def __init__(self, callback, name, retry_policy, breaker, max_batch, max_latency, columnar):
+        super().__init__(callback, name, retry_policy, breaker)
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.columnar = columnar
+        self.pending_start = None
+        self.pending_end = None
+        self.pending_since = 0.0
+
+    def add(self, start, end, now):
+        """Mark offsets [start, end) as pending."""
+        if self.pending_start is None:
+            self.pending_start = start
+            self.pending_since = now
+        self.pending_end = end
+
+    def take(self, now, force=False):
+        """
+        Return the offset ranges that are due for delivery.
+
+        Full batches are always due; a partial batch is due once it has
+        waited max_latency, or when forced.
+        """
+        ranges = []
+        if self.pending_start is None:
+            return ranges
+        start, end = self.pending_start, self.pending_end
+        while end - start >= self.max_batch:
+            ranges.append((start, start + self.max_batch))
+            start += self.max_batch
+        if start < end and (force or now - self.pending_since >= self.max_latency):
+            ranges.append((start, end))
+            start = end
+        if start == end:
+            self.pending_start = None
+        else:
+            self.pending_start = start
+            if ranges:
+                self.pending_since = now
+        return ranges
+
+    def status(self):
+        status = super().status()
+        status["pending"] = 0 if self.pending_start is None else self.pending_end - self.pending_start
+        return status
 
 class KafkaConsumer:
-    def __init__(self):
-        """Initialize a mock Kafka consumer for development."""
-        self.topic = kafka_logger.topic
-        self.is_running = False
-        self.consumers = []
-        self.lock = threading.Lock()  # Lock for thread-safe access to logs
-        self.consumer_thread = None
+    def __init__(self, producer=None):
+        """Initialize a mock Kafka consumer for development, reading the API's log store by default."""
+        kafka_logger = producer or get_kafka_logger()
+        self._setup(kafka_logger.topic)
         logger.info("Mock Kafka consumer initialized (development mode)")
         
         # Connect to the producer's log store
         self.logs = kafka_logger.logs
+        self.position = 0  # Offset of the next record to dispatch, kept across restarts
 
-    def register_consumer(self, callback):
-        """Register a callback function to receive messages."""
+    def _setup(self, topic):
+        """Initialize the subscriber registry and delivery machinery shared by all backends."""
+        self.topic = topic
+        self.is_running = False
+        self.consumers = []
+        self.batch_consumers = []
+        self.lock = threading.Lock()  # Guards the subscriber lists and pending batches, never held during callbacks
+        self.consumer_thread = None
+        
+        # Failed deliveries are retried off the dispatch thread, then dead-lettered
+        self.retries = RetryScheduler(max_pending=config.get("consumer.max_pending_retries", 10000))
+        self.dead_letters = DeadLetterStore(max_entries=config.get("consumer.dead_letter_max_entries", 10000))
+
+    def register_consumer(self, callback, retry_policy=None, name=None):
+        """
+        Register a callback function to receive messages.
+        
+        Args:
+            callback (callable): Called with each message dict
+            retry_policy (RetryPolicy): Retries for failed deliveries, defaults to the configured policy
+            name (str): Name shown in dead-letter entries, defaults to the callback's name
+            
+        Returns:
+            int: Index of the registered consumer
+        """
         with self.lock:
-            self.consumers.append(callback)
+            index = len(self.consumers)
+            subscriber = Subscriber(
+                callback,
+                name or f"{getattr(callback, '__name__', 'consumer')}-{index}",
+                retry_policy or RetryPolicy.from_config(config),
+                CircuitBreaker.from_config(config),
+            )
+            self.consumers.append(subscriber)
         logger.info(f"New consumer registered. Total consumers: {len(self.consumers)}")
-        return len(self.consumers) - 1
+        return index
+
+    def register_batch_consumer(self, callback, max_batch=1000, max_latency_ms=100, columnar=False,
+                                retry_policy=None, name=None):
+        """
+        Register a callback function to receive messages in batches.
+        
+        A batch is delivered as soon as max_batch messages are pending, or
+        once the oldest pending message has waited max_latency_ms. Messages
+        are not logged or modified individually. A failed batch is retried
+        and dead-lettered as a whole.
+        
+        Args:
+            callback (callable): Called with a list of message dicts, or a dict of columns if columnar
+            max_batch (int): Largest number of messages per call
+            max_latency_ms (float): Longest time a message waits for its batch to fill; 0 delivers on the next poll
+            columnar (bool): Deliver LogStore.columns() output instead of a list of dicts
+            retry_policy (RetryPolicy): Retries for failed batches, defaults to the configured policy
+            name (str): Name shown in dead-letter entries, defaults to the callback's name
+            
+        Returns:
+            int: Index of the registered batch consumer
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        if max_latency_ms < 0:
+            raise ValueError("max_latency_ms must not be negative")
+        with self.lock:
+            index = len(self.batch_consumers)
+            subscriber = BatchSubscriber(
+                callback,
+                name or f"{getattr(callback, '__name__', 'consumer')}-batch-{index}",
+                retry_policy or RetryPolicy.from_config(config),
+                CircuitBreaker.from_config(config),
+                max_batch,
+                max_latency_ms / 1000,
+                columnar,
+            )
+            self.batch_consumers.append(subscriber)
+        logger.info(f"New batch consumer registered. Total batch consumers: {len(self.batch_consumers)}")
+        return index
 
     def start(self):
         """Start consuming messages."""
@@ -51,42 +198,169 @@ class KafkaConsumer:
         if self.consumer_thread:
             self.consumer_thread.join(timeout=1.0)
             self.consumer_thread = None
+        self.retries.stop()
         logger.info("Consumer stopped")
 
     def _consume_loop(self):
         """Main loop for consuming messages."""
-        last_log_count = 0
-
         while self.is_running:
+            self.position = self._poll(self.position)
+
+            # Sleep to reduce CPU usage, waking often enough for the tightest batch latency
+            time.sleep(max(MIN_POLL_INTERVAL, min([0.1] + [s.max_latency for s in self.batch_consumers])))
+
+        self._flush_batches(force=True)
+
+    def _poll(self, last_log_count):
+        """
+        Dispatch the logs added since last_log_count and flush due batches.
+        
+        Returns:
+            int: The new log count
+        """
+        current_log_count = len(self.logs)
+
+        # Check if new logs have been added
+        if current_log_count > last_log_count:
+            if self.consumers:
+                new_logs = self.logs[last_log_count:current_log_count]
+                for log_entry in new_logs:
+                    self._process_message(log_entry)
+            now = time.monotonic()
             with self.lock:
-                current_log_count = len(self.logs)
+                for subscriber in self.batch_consumers:
+                    subscriber.add(last_log_count, current_log_count, now)
 
-                # Check if new logs have been added
-                if current_log_count > last_log_count:
-                    new_logs = self.logs[last_log_count:current_log_count]
-                    for log_entry in new_logs:
-                        self._process_message(log_entry)
-                    last_log_count = current_log_count
+        self._flush_batches()
+        return current_log_count
 
-            # Sleep to reduce CPU usage
-            time.sleep(0.1)
+    def _flush_batches(self, force=False):
+        """Deliver the batches that are full or have waited long enough."""
+        now = time.monotonic()
+        with self.lock:
+            due = [
+                (subscriber, start, end)
+                for subscriber in self.batch_consumers
+                for start, end in subscriber.take(now, force)
+            ]
+        # Callbacks run without the lock, so a slow sink cannot block registration or status
+        for subscriber, start, end in due:
+            batch = self.logs.columns(start, end) if subscriber.columnar else self.logs[start:end]
+            logger.debug("Delivering batch of offsets %d-%d to %s", start, end, subscriber.name)
+            self._deliver(subscriber, batch, 0)
 
-    def _process_message(self, message):
-        """Process a message and send it to all registered consumers."""
-        logger.debug(f"Processing message: {message}")
+    def _process_message(self, message, on_done=None, subscribers=None):
+        """
+        Process a message and send it to all registered consumers.
         
-        # Add reception timestamp
-        message['_received_at'] = datetime.now().isoformat()
+        Args:
+            message (dict): The message
+            on_done (callable): Called once per subscriber when it is delivered or dead-lettered
+            subscribers (list): Deliver to these instead of the currently registered consumers
+        """
+        message_logger.debug("Processing message: %s", message)
+        
+        # Add reception timestamp, unless the mock producer stored one with the record
+        message.setdefault('_received_at', datetime.now().isoformat())
         
         # Notify all consumers
-        for consumer in self.consumers:
-            try:
-                consumer(message)
-            except Exception as e:
-                logger.error(f"Error in consumer callback: {e}")
-                logger.debug(f"Faulty message: {message}")
+        for subscriber in self.consumers if subscribers is None else subscribers:
+            self._deliver(subscriber, message, 0, on_done)
+        
+        message_logger.info("Processed message from service: %s, level: %s",
+                            message.get('service', 'UNKNOWN'), message.get('level', 'UNKNOWN'))
+
+    def _deliver(self, subscriber, message, attempts, on_done=None):
+        """
+        Deliver a message, or a batch for batch subscribers, to one subscriber.
+        
+        A failed delivery is retried on the retry scheduler according to the
+        subscriber's policy; once attempts run out, the retry queue is full or
+        the subscriber's circuit breaker is open, the message is dead-lettered.
+        on_done, if given, is called once the message was delivered or
+        dead-lettered, possibly from the retry thread.
+        """
+        if not subscriber.breaker.allow():
+            self._dead_letter(subscriber, message, "circuit breaker open", attempts, on_done)
+            return
         
-        logger.info(f"Processed message from service: {message.get('service', 'UNKNOWN')}, level: {message.get('level', 'UNKNOWN')}")
+        try:
+            subscriber.callback(message)
+        except Exception as e:
+            attempts += 1
+            subscriber.breaker.record_failure()
+            logger.error(f"Error in consumer callback {subscriber.name} (attempt {attempts}): {e}")
+            logger.debug("Faulty message: %s", message)
+            
+            policy = subscriber.retry_policy
+            if policy.should_retry(attempts):
+                error = str(e)
+                retry = lambda: self._deliver(subscriber, message, attempts, on_done)
+                # Retries still waiting when the consumer stops are dead-lettered, not lost
+                cancel = lambda: self._dead_letter(
+                    subscriber, message, f"consumer stopped before retry ({error})", attempts, on_done
+                )
+                if self.retries.schedule(policy.delay(attempts), retry, on_cancel=cancel):
+                    return
+            self._dead_letter(subscriber, message, str(e), attempts, on_done)
+        else:
+            subscriber.breaker.record_success()
+            if on_done is not None:
+                on_done()
+
+    def _dead_letter(self, subscriber, message, error, attempts, on_done=None):
+        self.dead_letters.add(subscriber.name, message, error, attempts)
+        if on_done is not None:
+            on_done()
+
+    def subscriber_status(self):
+        """Return the name and circuit breaker state of every subscriber."""
+        return [subscriber.status() for subscriber in self.consumers + self.batch_consumers]
+
+    def replay_dead_letter(self, entry_id, reset_breaker=False):
+        """
+        Redeliver a dead-lettered message to the subscriber that failed it.
+        
+        Args:
+            entry_id (int): Dead-letter entry id
+            reset_breaker (bool): Close the subscriber's circuit breaker first
+            
+        Returns:
+            dict: Status of the operation
+        """
+        # Taken out first, so that concurrent replays cannot deliver the same entry twice
+        entry = self.dead_letters.pop(entry_id)
+        if entry is None:
+            return {"status": "error", "message": f"Dead-letter entry {entry_id} not found"}
+        
+        subscriber = next(
+            (s for s in self.consumers + self.batch_consumers if s.name == entry["subscriber"]), None
+        )
+        if subscriber is None:
+            self.dead_letters.restore(entry)
+            return {"status": "error", "message": f"Subscriber {entry['subscriber']} is no longer registered"}
+        
+        if reset_breaker:
+            subscriber.breaker.reset()
+        replay = lambda: self._deliver(subscriber, entry["message"], 0)
+        if not self.retries.schedule(0, replay, on_cancel=lambda: self.dead_letters.restore(entry)):
+            self.dead_letters.restore(entry)
+            return {"status": "error", "message": "Retry queue is full"}
+        return {"status": "success", "message": f"Dead-letter entry {entry_id} queued for replay"}
+
+def _create_consumer():
+    """Build the consumer backend selected by consumer.backend."""
+    backend = config.get("consumer.backend", "mock")
+    if backend == "confluent":
+        from .confluent_consumer import ConfluentKafkaConsumer
+        return ConfluentKafkaConsumer.from_config(config)
+    if backend != "mock":
+        raise ValueError(f"Unknown consumer backend: {backend}")
+    return KafkaConsumer()
+
+# Shared instance, created on first use rather than at import time
+_kafka_consumer = Lazy(_create_consumer, name="kafka-consumer")
 
-# Create a singleton instance
-kafka_consumer = KafkaConsumer()
\ No newline at end of file
+def get_kafka_consumer():
+    """Return the shared KafkaConsumer, creating it on first call."""
+    return _kafka_consumer.get()
@@ -1,17 +1,38 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from .api.routes import router
+from .api.compression import CompressionMiddleware
+from .core.config import config
+from .core.kafka_producer import get_kafka_logger
+from .core.logger import configure_logging
+from .kafka_consumer import get_kafka_consumer
 
-# Setup simple logger
-logging.basicConfig(level=logging.INFO)
+# Log through a background thread at the configured level
+configure_logging()
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app):
+    logger.info("Starting up Log Streaming API in development mode")
+    kafka_logger = get_kafka_logger()
+    if config.get("startup.warm_dataset"):
+        # Load the dataset in the background; /api/v1/ready reports when it is done
+        kafka_logger.dataset.warm_up()
+    # Feeds the registered subscribers and the /dlq endpoints
+    consumer = get_kafka_consumer()
+    consumer.start()
+    yield
+    logger.info("Shutting down Log Streaming API")
+    consumer.stop()
+
 # Create FastAPI app
 app = FastAPI(
     title="Log Streaming API",
     description="A robust API for sending logs to Kafka using Kaggle datasets",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -23,17 +44,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress responses and accept compressed bodies on the ingestion endpoints
+app.add_middleware(
+    CompressionMiddleware,
+    request_paths=("/api/v1/log", "/api/v1/logs/bulk", "/api/v1/kaggle/batch"),
+)
+
 # Include routes
 app.include_router(router, prefix="/api/v1")
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Starting up Log Streaming API in development mode")
-    
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Shutting down Log Streaming API")
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("src.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
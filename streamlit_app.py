@@ -46,6 +46,20 @@ def get_logs(level=None, service=None, limit=100):
         st.error(f"Error connecting to API: {e}")
         return {"status": "error", "logs": []}
 
+def get_timeline(resolution=3600, group_by="level"):
+    """Fetch log counts per time bucket, including history kept only as rollups."""
+    try:
+        response = requests.get(f"{API_URL}/api/v1/logs/timeline",
+                                params={"resolution": resolution, "group_by": group_by})
+        if response.status_code == 200:
+            return response.json()
+        else:
+            st.error(f"Error fetching timeline: {response.status_code} - {response.text}")
+            return {"status": "error", "buckets": []}
+    except Exception as e:
+        st.error(f"Error connecting to API: {e}")
+        return {"status": "error", "buckets": []}
+
 def get_dataset_info():
     """Fetch dataset information from the API."""
     try:
@@ -169,22 +183,12 @@ with col1:
 
 with col2:
     st.subheader("Log Timeline")
-    if log_data["status"] == "success" and log_data["logs"]:
-        df_logs = pd.DataFrame(log_data["logs"])
-        
-        # Ensure timestamp is parsed properly
-        if "_kafka_timestamp" in df_logs.columns:
-            df_logs["timestamp"] = pd.to_datetime(df_logs["_kafka_timestamp"], unit="ms")
-        else:
-            # Try multiple formats if exact format is unknown
-            try:
-                df_logs["timestamp"] = pd.to_datetime(df_logs["timestamp"])
-            except:
-                df_logs["timestamp"] = datetime.now()
-        
-        # Group by time and level
-        df_logs["hour"] = df_logs["timestamp"].dt.floor("H")
-        timeline_data = df_logs.groupby(["hour", "level"]).size().reset_index(name="count")
+    timeline = get_timeline(resolution=3600)
+    if timeline["status"] == "success" and timeline["buckets"]:
+        # Counts per hour and level, computed by the API over raw logs and rollups
+        timeline_data = pd.DataFrame(timeline["buckets"])
+        timeline_data["hour"] = pd.to_datetime(timeline_data["time_ms"], unit="ms")
+        timeline_data = timeline_data.rename(columns={"group": "level"})
         
         # Create line chart
         fig = px.line(timeline_data, x="hour", y="count", color="level",
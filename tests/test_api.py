@@ -1,6 +1,10 @@
+import threading
+import time
 import pytest
 from fastapi.testclient import TestClient
 from src.main import app
+from src.core.kafka_producer import KafkaLogger, get_kafka_logger
+from src.core.lazy import Lazy
 
 client = TestClient(app)
 
@@ -49,4 +53,52 @@ def test_send_log():
             log["message"] == "Test error message"):
             log_found = True
             break
-    assert log_found, "Sent log was not found in logs endpoint response"
\ No newline at end of file
+    assert log_found, "Sent log was not found in logs endpoint response"
+
+def test_ready_endpoint_after_warm_up():
+    """Test that readiness reports the dataset once the startup warm-up finishes."""
+    with TestClient(app) as started_client:
+        for _ in range(50):
+            response = started_client.get("/api/v1/ready")
+            if response.status_code == 200:
+                break
+            assert response.json()["status"] == "loading"
+            time.sleep(0.1)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["dataset_loaded"] is True
+        assert data["total_logs"] > 0
+
+def test_dataset_warm_up_does_not_block_other_requests(monkeypatch):
+    """Test that dataset requests waiting for the warm-up leave the event loop free."""
+    release = threading.Event()
+    def slow_dataset():
+        release.wait(5)
+        return [{"service": "svc", "level": "INFO", "message": "loaded"}]
+    monkeypatch.setattr(get_kafka_logger(), "dataset", Lazy(slow_dataset))
+
+    with TestClient(app) as started_client:
+        responses = []
+        waiting = threading.Thread(target=lambda: responses.append(started_client.get("/api/v1/dataset/info")))
+        waiting.start()
+        time.sleep(0.1)
+        started = time.monotonic()
+        assert started_client.get("/api/v1/health").status_code == 200
+        assert started_client.get("/api/v1/ready").status_code == 503
+        assert time.monotonic() - started < 1
+        release.set()
+        waiting.join(5)
+    assert responses[0].json()["total_logs"] == 1
+
+def test_app_serves_processed_dataset_when_present(tmp_path, monkeypatch):
+    """Test that the API's dataset, which /ready waits for, is the processed CSV when it exists."""
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "processed_web_logs.csv").write_text(
+        "timestamp,level,service,message,metadata\n"
+        "17/May/2015:11:05:51 +0000,INFO,web-server,Request successful for /index.html,\"{'ip': '10.0.0.1'}\"\n"
+    )
+    monkeypatch.chdir(tmp_path)
+    assert KafkaLogger().kaggle_data == [{
+        "timestamp": "17/May/2015:11:05:51 +0000", "level": "INFO", "service": "web-server",
+        "message": "Request successful for /index.html", "metadata": {"ip": "10.0.0.1"}
+    }]
@@ -0,0 +1,84 @@
+import threading
+import time
+import pytest
+from types import SimpleNamespace
+from src.core.log_store import LogStore
+from src.core.retry import RetryPolicy
+from src.kafka_consumer import MIN_POLL_INTERVAL, KafkaConsumer
+
+def make_consumer(count):
+    store = LogStore()
+    for i in range(count):
+        store.append({"service": "svc", "level": "INFO", "message": f"request {i}", "_kafka_offset": i})
+    return KafkaConsumer(producer=SimpleNamespace(topic="logs", logs=store))
+
+def test_batches_are_cut_by_size_then_by_latency():
+    """Test that full batches are delivered at once and the remainder after max_latency_ms."""
+    consumer = make_consumer(25)
+    batches = []
+    consumer.register_batch_consumer(batches.append, max_batch=10, max_latency_ms=50)
+
+    consumer._poll(0)
+    assert [len(batch) for batch in batches] == [10, 10]
+    assert consumer.subscriber_status()[0]["pending"] == 5
+
+    time.sleep(0.06)
+    consumer._poll(25)
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert [log["_kafka_offset"] for batch in batches for log in batch] == list(range(25))
+
+def test_columnar_batches():
+    consumer = make_consumer(5)
+    batches = []
+    consumer.register_batch_consumer(batches.append, max_batch=3, max_latency_ms=0, columnar=True)
+
+    consumer._poll(0)
+    assert [batch["_kafka_offset"] for batch in batches] == [[0, 1, 2], [3, 4]]
+    assert batches[1]["message"] == ["request 3", "request 4"]
+
+def test_failed_batch_is_dead_lettered_as_a_whole():
+    consumer = make_consumer(4)
+
+    def failing(batch):
+        raise ValueError("sink unavailable")
+
+    consumer.register_batch_consumer(failing, max_batch=4, retry_policy=RetryPolicy(max_attempts=1), name="sink")
+    consumer._poll(0)
+
+    entry = consumer.dead_letters.list()[0]
+    assert entry["subscriber"] == "sink"
+    assert len(entry["message"]) == 4
+
+def test_callbacks_run_without_the_consumer_lock():
+    """Test that a batch callback can register another subscriber without deadlocking the consumer."""
+    consumer = make_consumer(3)
+    registered = []
+    consumer.register_batch_consumer(
+        lambda batch: registered.append(consumer.register_consumer(lambda message: None)), max_latency_ms=0
+    )
+
+    poller = threading.Thread(target=consumer._poll, args=(0,), daemon=True)
+    poller.start()
+    poller.join(timeout=1.0)
+    assert not poller.is_alive()
+    assert len(registered) == 1
+
+def test_zero_latency_consumer_does_not_spin():
+    """Test that the consume loop still sleeps between polls with max_latency_ms=0."""
+    consumer = make_consumer(0)
+    polls = []
+    poll = consumer._poll
+
+    def counting_poll(position):
+        polls.append(position)
+        return poll(position)
+
+    consumer._poll = counting_poll
+    consumer.register_batch_consumer(lambda batch: None, max_latency_ms=0)
+
+    consumer.start()
+    time.sleep(0.05)
+    consumer.stop()
+    assert 0 < len(polls) <= 0.05 / MIN_POLL_INTERVAL + 5
+    with pytest.raises(ValueError):
+        consumer.register_batch_consumer(lambda batch: None, max_latency_ms=-1)
@@ -0,0 +1,126 @@
+import gzip
+import json
+import pytest
+from fastapi.testclient import TestClient
+from src.main import app
+from src.api import routes
+from src.api.compression import negotiate_encoding, zstandard, _GzipDecompressor, _ZstdFrameTracker
+from src.core.config import config
+from src.core.rate_limiter import LoadShedder
+
+client = TestClient(app)
+
+def ndjson(entries):
+    return "".join(json.dumps(entry) + "\n" for entry in entries).encode()
+
+def test_gzip_request_body_is_decompressed():
+    """Test that a gzip-encoded log entry is accepted."""
+    body = gzip.compress(json.dumps({"service": "gzip-service", "level": "INFO", "message": "compressed"}).encode())
+    response = client.post(
+        "/api/v1/log",
+        content=body,
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "success"
+
+@pytest.mark.skipif(zstandard is None, reason="zstandard not installed")
+def test_zstd_bulk_upload():
+    """Test that a zstd-encoded NDJSON upload is ingested line by line."""
+    entries = [{"service": "bulk-service", "level": "INFO", "message": f"entry {i}"} for i in range(50)]
+    entries.append({"service": "bulk-service"})
+    body = zstandard.ZstdCompressor().compress(ndjson(entries))
+    response = client.post("/api/v1/logs/bulk", content=body, headers={"Content-Encoding": "zstd"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["accepted"] == 50
+    assert data["invalid"] == 1
+
+def test_decompression_bomb_is_rejected():
+    """Test that a body expanding past the size limit is rejected with 413."""
+    body = gzip.compress(b" " * (20 * 1024 * 1024))
+    response = client.post("/api/v1/logs/bulk", content=body, headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 413
+
+def test_unsupported_request_encoding():
+    """Test that an unknown Content-Encoding is rejected with 415."""
+    response = client.post("/api/v1/log", content=b"xx", headers={"Content-Encoding": "compress"})
+    assert response.status_code == 415
+
+def test_response_compression_negotiation():
+    """Test that large responses are compressed and small ones are not."""
+    entries = [{"service": "resp-service", "level": "INFO", "message": f"padding {i} " * 5} for i in range(30)]
+    client.post("/api/v1/logs/bulk", content=ndjson(entries))
+
+    large = client.get("/api/v1/logs?limit=30&service=resp-service", headers={"Accept-Encoding": "gzip"})
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.headers["vary"] == "Accept-Encoding"
+    assert large.json()["count"] == 30
+
+    small = client.get("/api/v1/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+def test_negotiate_encoding():
+    """Test Accept-Encoding parsing with q-values and wildcards."""
+    assert negotiate_encoding("gzip, br;q=0.5", ["zstd", "br", "gzip"]) == "gzip"
+    assert negotiate_encoding("*", ["zstd", "gzip"]) == "zstd"
+    assert negotiate_encoding("gzip;q=0, identity", ["gzip"]) is None
+    assert negotiate_encoding("", ["gzip"]) is None
+
+def test_zstd_frame_tracker_detects_truncation():
+    """Test that a stream cut inside a frame is told apart from a complete one."""
+    # Single-segment frame with a 1-byte content size and one raw, last block holding "hello"
+    frame = b"\x28\xb5\x2f\xfd\x20\x05\x29\x00\x00hello"
+    tracker = _ZstdFrameTracker()
+    for i in range(len(frame) * 2):
+        tracker.feed((frame + frame)[i:i + 1])
+        assert tracker.complete == ((i + 1) % len(frame) == 0)
+    assert tracker.frames == 2
+    assert not _ZstdFrameTracker().complete
+    with pytest.raises(ValueError):
+        _ZstdFrameTracker().feed(b"not zstd")
+
+def test_truncated_gzip_body_is_rejected():
+    """Test that a gzip body cut short is rejected with 400."""
+    body = gzip.compress(ndjson([{"service": "gzip-service", "level": "INFO", "message": "m"}] * 50))
+    response = client.post("/api/v1/logs/bulk", content=body[:-8], headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 400
+
+def test_multi_member_gzip_body():
+    """Test that every member of a concatenated gzip body is read and trailing garbage is rejected."""
+    entry = {"service": "gzip-service", "level": "INFO", "message": "member"}
+    body = gzip.compress(ndjson([entry])) + gzip.compress(ndjson([entry] * 2))
+    response = client.post("/api/v1/logs/bulk", content=body, headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 3
+
+    decompressor = _GzipDecompressor()
+    split = len(gzip.compress(ndjson([entry]))) + 1
+    out = decompressor.decompress(body[:split], 1 << 20) + decompressor.decompress(body[split:], 1 << 20)
+    decompressor.finish()
+    assert out == ndjson([entry] * 3)
+
+    response = client.post("/api/v1/logs/bulk", content=body + b"garbage", headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 400
+
+def test_bulk_upload_limits(monkeypatch):
+    """Test that overlong lines and bodies are rejected with 413 without buffering them."""
+    monkeypatch.setitem(config.config, "ingest.max_line_bytes", 200)
+    entry = {"service": "limit-service", "level": "INFO", "message": "ok"}
+    assert client.post("/api/v1/logs/bulk", content=ndjson([entry] * 3)).json()["accepted"] == 3
+    response = client.post("/api/v1/logs/bulk", content=ndjson([entry, {**entry, "message": "x" * 300}]))
+    assert response.status_code == 413
+    assert client.post("/api/v1/logs/bulk", content=b"x" * 1000).status_code == 413
+
+    monkeypatch.setitem(config.config, "ingest.max_body_bytes", 500)
+    assert client.post("/api/v1/logs/bulk", content=ndjson([entry] * 20)).status_code == 413
+
+def test_bulk_upload_rechecks_backpressure(monkeypatch):
+    """Test that an upload stops with 429 once the store crosses its high-water mark."""
+    store_size = routes.get_kafka_logger().logs.retained
+    monkeypatch.setattr(routes, "load_shedder", LoadShedder(high_water_mark=store_size + 1500))
+    monkeypatch.setattr(routes, "BACKPRESSURE_CHECK_INTERVAL", 1000)
+    entries = [{"service": "shed-service", "level": "INFO", "message": f"entry {i}"} for i in range(3000)]
+    response = client.post("/api/v1/logs/bulk", content=ndjson(entries))
+    assert response.status_code == 429
+    assert "1999 entries" in response.json()["detail"]
@@ -0,0 +1,232 @@
+import json
+import sys
+import time
+from types import SimpleNamespace
+import pytest
+from src.core.config import config
+from src.core.retry import RetryPolicy
+from src.core.serializers import DESERIALIZERS
+from src.confluent_consumer import ConfluentKafkaConsumer
+from src.kafka_consumer import KafkaConsumer, _create_consumer
+
+class FakeMessage:
+    """Stand-in for confluent_kafka.Message."""
+
+    def __init__(self, partition, offset, value, topic="logs", error=None):
+        self._partition = partition
+        self._offset = offset
+        self._value = value
+        self._topic = topic
+        self._error = error
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def value(self):
+        return self._value
+
+    def error(self):
+        return self._error
+
+    def timestamp(self):
+        return (1, 1700000000000 + self._offset)
+
+class FakeClient:
+    """Stand-in for confluent_kafka.Consumer that serves queued batches."""
+
+    def __init__(self, batches=()):
+        self.batches = list(batches)
+        self.commits = []
+        self.paused = []
+        self.resumed = []
+        self.partitions = [SimpleNamespace(topic="logs", partition=0), SimpleNamespace(topic="logs", partition=1)]
+        self.closed = False
+
+    def subscribe(self, topics, on_assign=None, on_revoke=None):
+        self.on_assign = on_assign
+        self.on_revoke = on_revoke
+        on_assign(self, self.partitions)
+
+    def consume(self, num_messages=1, timeout=-1):
+        if self.batches:
+            return self.batches.pop(0)[:num_messages]
+        time.sleep(timeout)
+        return []
+
+    def commit(self, message=None, asynchronous=True):
+        self.commits.append((message.topic(), message.partition(), message.offset(), asynchronous))
+
+    def assignment(self):
+        return self.partitions
+
+    def pause(self, partitions):
+        self.paused.append(list(partitions))
+
+    def resume(self, partitions):
+        self.resumed.append(list(partitions))
+
+    def close(self):
+        self.closed = True
+
+def batch(partition, offsets):
+    return [
+        FakeMessage(partition, offset, json.dumps({"service": "svc", "level": "INFO", "message": f"m{offset}"}).encode())
+        for offset in offsets
+    ]
+
+def test_records_are_delivered_and_offsets_committed():
+    """Test that consumed records reach both kinds of subscriber before their offsets are committed."""
+    client = FakeClient([batch(0, range(3)) + batch(1, range(10, 12))])
+    consumer = ConfluentKafkaConsumer(client, ["logs"], batch_size=100, poll_timeout=0.01)
+    received, batches = [], []
+    consumer.register_consumer(received.append)
+    consumer.register_batch_consumer(batches.append, max_batch=2, columnar=True)
+
+    consumer.start()
+    deadline = time.time() + 2
+    while not client.commits and time.time() < deadline:
+        time.sleep(0.01)
+    consumer.stop()
+
+    assert [(r["_kafka_partition"], r["_kafka_offset"]) for r in received] == [
+        (0, 0), (0, 1), (0, 2), (1, 10), (1, 11)
+    ]
+    assert received[0]["_kafka_timestamp"] == 1700000000000
+    assert [b["message"] for b in batches] == [["m0", "m1"], ["m2", "m10"], ["m11"]]
+    assert sorted(client.commits) == [("logs", 0, 2, True), ("logs", 1, 11, True)]
+    assert client.closed
+
+def test_commits_wait_for_retries_and_keep_order():
+    """Test that a batch being retried holds back its own and later commits."""
+    client = FakeClient()
+    consumer = ConfluentKafkaConsumer(client, ["logs"])
+    failures = []
+
+    def flaky(record):
+        if record["message"] == "m0" and not failures:
+            failures.append(record)
+            raise RuntimeError("temporary")
+
+    consumer.register_consumer(flaky, retry_policy=RetryPolicy(max_attempts=2, base_delay=0.05, jitter=False))
+    consumer._dispatch(batch(0, [0]))
+    consumer._dispatch(batch(0, [1]))
+    consumer._commit_ready()
+    assert client.commits == []
+    assert len(consumer._in_flight) == 2
+
+    time.sleep(0.2)
+    consumer._commit_ready()
+    assert client.commits == [("logs", 0, 1, True)]
+    consumer.retries.stop()
+
+def test_undecodable_messages_are_dead_lettered_and_committed():
+    """Test that messages the deserializer rejects are dead-lettered and do not hold back the commit."""
+    client = FakeClient()
+    consumer = ConfluentKafkaConsumer(client, ["logs"])
+    received = []
+    consumer.register_consumer(received.append)
+
+    consumer._dispatch([FakeMessage(0, 0, b"not json"), FakeMessage(0, 1, b"[1, 2]")] + batch(0, [2]))
+    consumer._commit_ready()
+
+    assert [r["_kafka_offset"] for r in received] == [2]
+    entries = consumer.dead_letters.list()
+    assert [entry["subscriber"] for entry in entries] == ["deserializer", "deserializer"]
+    assert client.commits == [("logs", 0, 2, True)]
+
+def test_tombstones_and_failing_batches_do_not_stop_the_loop():
+    """Test that null values are skipped and a batch that fails to dispatch does not end consumption."""
+    class BrokenMessage(FakeMessage):
+        def timestamp(self):
+            raise RuntimeError("broken")
+
+    client = FakeClient([
+        [FakeMessage(0, 0, None)] + batch(0, [1]),
+        [BrokenMessage(0, 2, b"{}")],
+        batch(0, [3]),
+    ])
+    consumer = ConfluentKafkaConsumer(client, ["logs"], poll_timeout=0.01)
+    received = []
+    consumer.register_consumer(received.append)
+
+    consumer.start()
+    deadline = time.time() + 2
+    while len(received) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert consumer.is_running
+    consumer.stop()
+
+    assert [r["_kafka_offset"] for r in received] == [1, 3]
+    assert ("logs", 0, 1, True) in client.commits
+    assert consumer.dead_letters.list() == []
+
+def test_client_failure_stops_the_consumer():
+    """Test that a consume loop ended by a client error closes the client and reports itself stopped."""
+    client = FakeClient()
+    client.consume = lambda num_messages=1, timeout=-1: 1 / 0
+    consumer = ConfluentKafkaConsumer(client, ["logs"])
+    consumer.start()
+    consumer.consumer_thread.join(1)
+    assert not consumer.is_running and client.closed
+
+def test_pause_and_resume_on_uncommitted_batches():
+    """Test that partitions are paused while too many batches are in flight."""
+    client = FakeClient()
+    consumer = ConfluentKafkaConsumer(client, ["logs"], max_in_flight=2)
+    consumer.register_consumer(lambda record: 1 / 0, retry_policy=RetryPolicy(max_attempts=2, base_delay=10))
+    for offset in range(3):
+        consumer._dispatch(batch(0, [offset]))
+
+    consumer._apply_backpressure()
+    assert consumer.paused and client.paused == [client.partitions]
+    consumer._on_assign(client, client.partitions[:1])
+    assert client.paused[-1] == client.partitions[:1]
+
+    consumer._in_flight.clear()
+    consumer._apply_backpressure()
+    assert not consumer.paused and client.resumed == [client.partitions]
+    consumer.retries.stop()
+
+def test_revoke_commits_finished_partitions_synchronously():
+    """Test that revoked partitions are committed at once and synchronously, the rest on the next commit."""
+    client = FakeClient()
+    consumer = ConfluentKafkaConsumer(client, ["logs"])
+    consumer._dispatch(batch(0, [5]) + batch(1, [7]))
+
+    consumer._on_revoke(client, client.partitions[1:])
+    assert client.commits == [("logs", 1, 7, False)]
+    consumer._commit_ready()
+    assert client.commits[-1] == ("logs", 0, 5, True)
+
+def test_backend_is_selected_by_config(monkeypatch):
+    """Test that consumer.backend picks the consumer class and that confluent reads its settings from config."""
+    monkeypatch.setitem(config.config, "consumer.backend", "mock")
+    assert type(_create_consumer()) is KafkaConsumer
+
+    settings = []
+    monkeypatch.setitem(sys.modules, "confluent_kafka", SimpleNamespace(
+        Consumer=lambda conf: settings.append(conf) or FakeClient()
+    ))
+    monkeypatch.setitem(config.config, "consumer.backend", "confluent")
+    monkeypatch.setitem(config.config, "consumer.deserializer", "avro")
+    monkeypatch.setitem(config.config, "kafka.bootstrap_servers", "broker:9092")
+    monkeypatch.setitem(config.config, "consumer.batch_size", 50)
+    consumer = _create_consumer()
+    assert type(consumer) is ConfluentKafkaConsumer
+    assert settings[0]["bootstrap.servers"] == "broker:9092"
+    assert settings[0]["enable.auto.commit"] is False
+    assert consumer.deserializer is DESERIALIZERS["avro"]
+    assert consumer.batch_size == 50
+
+    monkeypatch.setitem(config.config, "consumer.deserializer", "xml")
+    with pytest.raises(ValueError):
+        _create_consumer()
+    monkeypatch.setitem(config.config, "consumer.backend", "other")
+    with pytest.raises(ValueError):
+        _create_consumer()
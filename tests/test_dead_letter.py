@@ -0,0 +1,155 @@
+import time
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from src.main import app
+from src.core.log_store import LogStore
+from src.core.retry import RetryPolicy, CircuitBreaker
+from src.kafka_consumer import KafkaConsumer
+
+client = TestClient(app)
+
+def make_consumer():
+    return KafkaConsumer(producer=SimpleNamespace(topic="logs", logs=LogStore()))
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_failing_subscriber_is_retried_then_dead_lettered():
+    """Test that retries run in the background and exhausted messages are dead-lettered."""
+    consumer = make_consumer()
+    calls = []
+    received = []
+
+    def flaky(message):
+        calls.append(message["n"])
+        raise ValueError("sink unavailable")
+
+    consumer.register_consumer(flaky, retry_policy=RetryPolicy(max_attempts=3, base_delay=0), name="flaky")
+    consumer.register_consumer(received.append, name="healthy")
+    consumer._process_message({"n": 1})
+
+    assert [m["n"] for m in received] == [1]
+    assert wait_for(lambda: len(consumer.dead_letters) == 1)
+    assert calls == [1, 1, 1]
+    entry = consumer.dead_letters.list()[0]
+    assert entry["subscriber"] == "flaky"
+    assert entry["attempts"] == 3
+    assert entry["error"] == "sink unavailable"
+    consumer.retries.stop()
+
+def test_replay_redelivers_dead_letter():
+    """Test that replaying an entry delivers it again once the subscriber recovers."""
+    consumer = make_consumer()
+    state = {"fail": True, "delivered": []}
+
+    def sink(message):
+        if state["fail"]:
+            raise RuntimeError("down")
+        state["delivered"].append(message)
+
+    consumer.register_consumer(sink, retry_policy=RetryPolicy(max_attempts=1), name="sink")
+    consumer._process_message({"n": 7})
+    entry_id = consumer.dead_letters.list()[0]["id"]
+
+    state["fail"] = False
+    assert consumer.replay_dead_letter(entry_id)["status"] == "success"
+    assert wait_for(lambda: state["delivered"])
+    assert state["delivered"][0]["n"] == 7
+    assert len(consumer.dead_letters) == 0
+    assert consumer.replay_dead_letter(entry_id)["status"] == "error"
+    consumer.retries.stop()
+
+def test_circuit_breaker_opens_and_half_opens():
+    """Test that the breaker parks a subscriber and lets one probe through after the timeout."""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    breaker.record_failure(now=0)
+    assert breaker.allow(now=1)
+    breaker.record_failure(now=1)
+    assert not breaker.allow(now=5)
+    assert breaker.allow(now=11)
+    assert not breaker.allow(now=11)
+    breaker.record_success()
+    assert breaker.allow(now=12)
+
+def test_dlq_endpoints():
+    """Test the dead-letter inspection and replay endpoints."""
+    response = client.get("/api/v1/dlq")
+    assert response.status_code == 200
+    assert response.json()["status"] == "success"
+    assert client.post("/api/v1/dlq/999999/replay").status_code == 404
+
+def test_stop_moves_pending_retries_to_the_dead_letter_queue():
+    """Test that retries still waiting when the consumer stops are dead-lettered instead of dropped."""
+    consumer = make_consumer()
+
+    def failing(message):
+        raise ValueError("sink unavailable")
+
+    consumer.register_consumer(failing, retry_policy=RetryPolicy(max_attempts=3, base_delay=60), name="slow")
+    consumer._process_message({"n": 1})
+    assert len(consumer.retries) == 1 and len(consumer.dead_letters) == 0
+
+    consumer.retries.stop()
+    assert len(consumer.retries) == 0
+    entry = consumer.dead_letters.list()[0]
+    assert entry["subscriber"] == "slow"
+    assert entry["attempts"] == 1
+    assert "consumer stopped" in entry["error"]
+
+def test_concurrent_replays_deliver_once():
+    """Test that an entry replayed twice is only taken, and delivered, by the first replay."""
+    consumer = make_consumer()
+    state = {"fail": True, "delivered": []}
+
+    def sink(message):
+        if state["fail"]:
+            raise RuntimeError("down")
+        state["delivered"].append(message)
+
+    consumer.register_consumer(sink, retry_policy=RetryPolicy(max_attempts=1), name="sink")
+    consumer._process_message({"n": 3})
+    entry_id = consumer.dead_letters.list()[0]["id"]
+
+    state["fail"] = False
+    results = [consumer.replay_dead_letter(entry_id)["status"] for _ in range(2)]
+    assert sorted(results) == ["error", "success"]
+    assert wait_for(lambda: state["delivered"])
+    time.sleep(0.05)
+    assert [m["n"] for m in state["delivered"]] == [3]
+    consumer.retries.stop()
+
+def test_replay_keeps_entry_when_retry_queue_is_full():
+    consumer = make_consumer()
+    consumer.register_consumer(lambda message: 1 / 0, retry_policy=RetryPolicy(max_attempts=1), name="sink")
+    consumer._process_message({"n": 4})
+    entry_id = consumer.dead_letters.list()[0]["id"]
+
+    consumer.retries.max_pending = 0
+    assert consumer.replay_dead_letter(entry_id)["message"] == "Retry queue is full"
+    assert consumer.dead_letters.get(entry_id)["message"]["n"] == 4
+
+def test_app_lifespan_runs_the_consumer(monkeypatch):
+    """Test that the app starts the shared consumer, so failed deliveries reach /dlq."""
+    from src import kafka_consumer
+    from src.core.lazy import Lazy
+    consumer = KafkaConsumer()
+    monkeypatch.setattr(kafka_consumer, "_kafka_consumer", Lazy(lambda: consumer, name="kafka-consumer"))
+
+    def failing(message):
+        if message.get("service") == "dlq-lifespan-test":
+            raise ValueError("sink unavailable")
+
+    consumer.register_consumer(failing, retry_policy=RetryPolicy(max_attempts=1), name="lifespan-sink")
+    with TestClient(app) as started_client:
+        assert consumer.is_running
+        log = {"service": "dlq-lifespan-test", "level": "ERROR", "message": "boom"}
+        assert started_client.post("/api/v1/log", json=log).status_code == 200
+
+        def dead_lettered():
+            entries = started_client.get("/api/v1/dlq").json()["entries"]
+            return [e for e in entries if e["subscriber"] == "lifespan-sink"]
+        assert wait_for(dead_lettered)
+    assert not consumer.is_running
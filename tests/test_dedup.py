@@ -0,0 +1,65 @@
+import json
+import uuid
+from fastapi.testclient import TestClient
+from src.main import app
+from src.core.dedup import DedupCache
+from src.core.kafka_producer import get_kafka_logger
+
+client = TestClient(app)
+
+def test_cache_rejects_repeated_key_until_ttl_expires():
+    """Test that a key is a duplicate within its TTL and new again afterwards."""
+    cache = DedupCache(ttl_seconds=10, max_entries=100, shards=4)
+    assert cache.add("a", now=0)
+    assert not cache.add("a", now=5)
+    assert cache.add("a", now=10)
+    assert len(cache) == 1
+
+def test_cache_is_bounded():
+    """Test that full shards evict their oldest keys instead of growing."""
+    cache = DedupCache(ttl_seconds=60, max_entries=8, shards=2)
+    for i in range(100):
+        assert cache.add(f"key-{i}", now=0)
+    assert len(cache) <= 8
+    assert cache.evicted_early >= 92
+    assert not cache.add("key-99", now=1)
+
+def test_idempotency_key_header_deduplicates_log():
+    """Test that resending a log with the same Idempotency-Key stores it once."""
+    log = {"service": "dedup-test", "level": "INFO", "message": "charge created"}
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+
+    first = client.post("/api/v1/log", json=log, headers=headers)
+    second = client.post("/api/v1/log", json=log, headers=headers)
+
+    assert first.json()["message"] == "Log entry accepted"
+    assert second.status_code == 200
+    assert second.json()["duplicate"] is True
+    stored = client.get("/api/v1/logs", params={"service": "dedup-test", "limit": 10}).json()
+    assert stored["count"] == 1
+
+def test_bulk_upload_counts_duplicate_event_ids():
+    """Test that repeated event_ids in one bulk upload are stored once and counted as duplicates."""
+    event_id = str(uuid.uuid4())
+    log = {"service": "dedup-bulk-test", "level": "INFO", "message": "job finished", "event_id": event_id}
+    body = "\n".join(json.dumps(log) for _ in range(3))
+
+    response = client.post("/api/v1/logs/bulk", content=body)
+
+    assert response.json()["accepted"] == 1
+    assert response.json()["duplicate"] == 2
+
+def test_key_is_only_marked_once_the_entry_is_stored(monkeypatch):
+    """Test that a failed first attempt does not turn the client's retry into a duplicate."""
+    log = {"service": "dedup-failure-test", "level": "INFO", "message": "payment settled"}
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    failing = lambda log_data: {"status": "error", "message": "broker down"}
+
+    with monkeypatch.context() as patch:
+        patch.setattr(get_kafka_logger(), "send_log", failing)
+        assert client.post("/api/v1/log", json=log, headers=headers).status_code == 500
+
+    retried = client.post("/api/v1/log", json=log, headers=headers)
+    assert retried.json()["message"] == "Log entry accepted"
+    stored = client.get("/api/v1/logs", params={"service": "dedup-failure-test", "limit": 10}).json()
+    assert stored["count"] == 1
@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+import pytest
+from fastapi.testclient import TestClient
+from src.main import app
+from src.api.export import parquet_available
+
+client = TestClient(app)
+
+@pytest.fixture(scope="module", autouse=True)
+def export_logs():
+    body = "".join(
+        json.dumps({"service": "export-service", "level": "ERROR" if i % 2 else "INFO",
+                    "message": f"Export entry {i}", "metadata": {"n": i}}) + "\n"
+        for i in range(20)
+    )
+    assert client.post("/api/v1/logs/bulk", content=body.encode()).json()["accepted"] == 20
+
+def test_ndjson_export_with_filters():
+    """Test that the NDJSON export streams only logs matching the filters."""
+    response = client.get("/api/v1/logs/export?format=ndjson&service=export-service&level=ERROR")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    logs = [json.loads(line) for line in response.text.splitlines()]
+    assert len(logs) == 10
+    assert all(log["level"] == "ERROR" and log["metadata"]["n"] % 2 for log in logs)
+
+def test_csv_export_offset_range():
+    """Test that the CSV export honours the offset range."""
+    first = client.get("/api/v1/logs/export?format=ndjson&service=export-service").text.splitlines()
+    start = json.loads(first[0])["_kafka_offset"]
+    response = client.get(f"/api/v1/logs/export?format=csv&service=export-service&start_offset={start}&end_offset={start + 5}")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["message"] for row in rows] == [f"Export entry {i}" for i in range(5)]
+    assert json.loads(rows[0]["metadata"]) == {"n": 0}
+
+@pytest.mark.skipif(not parquet_available(), reason="pyarrow not installed")
+def test_parquet_export():
+    """Test that the Parquet export is a readable table."""
+    response = client.get("/api/v1/logs/export?format=parquet&service=export-service")
+    import pyarrow.parquet as pq
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 20
+    assert set(table.column("service").to_pylist()) == {"export-service"}
+
+def test_unknown_export_format():
+    """Test that an unknown format is rejected."""
+    assert client.get("/api/v1/logs/export?format=xml").status_code == 400
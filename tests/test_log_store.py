@@ -0,0 +1,105 @@
+from src.api.models import LogLevel
+from src.core.kafka_producer import KafkaLogger
+from src.core.log_store import LogStore, CHUNK_SIZE, records_to_columns
+from src.core.query import compile_query
+
+def make_record(i):
+    record = {
+        "service": f"service-{i % 3}",
+        "level": "ERROR" if i % 5 == 0 else "INFO",
+        "message": f"Request successful for /page/{i}",
+        "timestamp": f"2023-05-01T10:{i % 60:02d}:00",
+        "metadata": {"status": 200 + i % 3, "ip": f"10.0.0.{i % 7}"},
+        "_kafka_offset": i,
+        "_kafka_timestamp": 1683000000000 + i,
+        "_kafka_topic": "logs",
+        "_kafka_partition": 0,
+    }
+    if i % 4 == 0:
+        record["metadata"]["status"] = "unknown"
+    if i % 9 == 0:
+        record["metadata"] = None
+    if i % 10 == 0:
+        record["event_id"] = f"evt-{i}"
+    return record
+
+def test_records_round_trip_across_chunks():
+    """Test that mixed records read back exactly, including across chunk boundaries."""
+    store = LogStore()
+    records = [make_record(i) for i in range(CHUNK_SIZE + 100)]
+    for record in records:
+        store.append(record)
+    assert len(store) == len(records)
+    assert store.get(0) == records[0]
+    assert store[CHUNK_SIZE - 2:CHUNK_SIZE + 2] == records[CHUNK_SIZE - 2:CHUNK_SIZE + 2]
+    assert list(store) == records
+
+def test_high_cardinality_metadata_keys_stay_sparse():
+    """Test that per-record metadata keys neither get a column each nor pile up in the string pool."""
+    store = LogStore(max_metadata_columns=4)
+    records = [
+        {"service": "svc", "level": "INFO", "message": f"m{i}",
+         "metadata": {"status": 200, "ip": "10.0.0.1", f"trace_{i}": i}}
+        for i in range(CHUNK_SIZE + 100)
+    ]
+    for record in records:
+        store.append(dict(record, metadata=dict(record["metadata"])))
+    assert list(store) == records
+    assert all(len(chunk.metadata) <= 4 for chunk in store._chunks)
+    assert len(store.strings) == 2
+
+    where = compile_query("metadata.trace_4100 = 4100 AND metadata.status = 200")
+    assert [log["message"] for batch in store.scan(where=where) for log in batch] == ["m4100"]
+    columns = store.columns(4100, 4102)
+    assert columns["metadata.trace_4100"] == [4100, None]
+    assert columns["metadata.status"] == [200, 200]
+
+def test_enum_levels_are_dictionary_encoded():
+    """Test that enum levels are stored as their string value."""
+    store = LogStore()
+    store.append({"service": "svc", "level": LogLevel.WARN, "message": "careful"})
+    store.append({"service": "svc", "level": "WARN", "message": "careful"})
+    assert store.get(0) == store.get(1) == {"service": "svc", "level": "WARN", "message": "careful"}
+    assert len(store.strings) == 2
+
+def test_columns_match_records():
+    """Test that columnar reads hold the same values as the materialized records."""
+    store = LogStore()
+    records = [make_record(i) for i in range(CHUNK_SIZE + 100)]
+    for record in records:
+        store.append(record)
+    start, end = CHUNK_SIZE - 50, CHUNK_SIZE + 60
+    columns = store.columns(start, end)
+
+    for name, values in columns.items():
+        assert len(values) == end - start
+        for offset, value in zip(range(start, end), values):
+            record = records[offset]
+            if name.startswith("metadata."):
+                expected = (record.get("metadata") or {}).get(name[len("metadata."):])
+            elif name == "metadata":
+                expected = None if isinstance(record["metadata"], dict) else record["metadata"]
+            else:
+                expected = record.get(name)
+            assert value == expected, (name, offset)
+    assert "metadata.status" in columns and "event_id" in columns
+
+def test_received_at_is_stored_with_the_record():
+    """Test that the reception time the consumer sees is kept in the store."""
+    producer = KafkaLogger()
+    producer.send_log({"service": "svc", "level": "INFO", "message": "hello"})
+    stored = producer.logs.get(0)
+    assert stored["_received_at"]
+    assert producer.logs.columns()["_received_at"] == [stored["_received_at"]]
+
+def test_records_to_columns_matches_store_columns():
+    """Test that columns built straight from dicts equal the ones a store returns for them."""
+    records = [make_record(i) for i in range(50)]
+    records[3]["metadata"] = "not a dict"
+    records[4]["_received_at"] = "2025-03-20T10:00:00"
+    records[5]["_sample_rate"] = 0.5
+    records[6]["extra"] = {"nested": True}
+    store = LogStore()
+    for record in records:
+        store.append(record)
+    assert records_to_columns(records) == store.columns()
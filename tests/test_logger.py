@@ -0,0 +1,81 @@
+import io
+import logging
+import queue
+import threading
+from src.core import logger as logger_module
+from src.core.logger import RateLimitedLogger, configure_logging, shutdown_logging, _DroppingQueueHandler
+
+def test_rate_limited_logger_suppresses_and_reports(caplog):
+    """Test that lines over the rate are dropped and the next one says how many."""
+    limited = RateLimitedLogger(logging.getLogger("test.rate_limited"), rate=0.001, burst=2)
+    with caplog.at_level(logging.INFO, logger="test.rate_limited"):
+        for i in range(5):
+            limited.info("Processed message %d", i)
+        assert [record.getMessage() for record in caplog.records] == ["Processed message 0", "Processed message 1"]
+        assert limited.suppressed == 3
+
+        limited.bucket.tokens = 1
+        limited.info("Processed message %d", 5)
+    assert caplog.records[-1].getMessage() == "Processed message 5 (3 similar messages suppressed)"
+    assert limited.suppressed == 0
+
+def test_rate_limited_logger_skips_disabled_levels(caplog):
+    """Test that lines below the logger's level neither use tokens nor count as suppressed."""
+    limited = RateLimitedLogger(logging.getLogger("test.rate_limited_debug"), rate=1)
+    with caplog.at_level(logging.INFO, logger="test.rate_limited_debug"):
+        limited.debug("Processing message: %s", {"a": 1})
+    assert caplog.records == []
+    assert limited.suppressed == 0 and limited.bucket.tokens == 1
+
+def test_zero_rate_lets_everything_through(caplog):
+    """Test that a rate of 0 disables rate limiting."""
+    limited = RateLimitedLogger(logging.getLogger("test.unlimited"), rate=0)
+    with caplog.at_level(logging.INFO, logger="test.unlimited"):
+        for i in range(100):
+            limited.info("line %d", i)
+    assert len(caplog.records) == 100
+
+def test_suppressed_count_is_exact_across_threads(caplog):
+    """Test that concurrent callers neither lose nor double-report suppressed lines."""
+    limited = RateLimitedLogger(logging.getLogger("test.rate_limited_threads"), rate=0.001, burst=1)
+
+    def log_lines():
+        for i in range(2000):
+            limited.info("line %d", i)
+
+    with caplog.at_level(logging.INFO, logger="test.rate_limited_threads"):
+        workers = [threading.Thread(target=log_lines) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        limited.bucket.tokens = 1
+        limited.info("last")
+
+    assert len(caplog.records) == 2
+    assert caplog.records[-1].getMessage() == "last (7999 similar messages suppressed)"
+
+def test_configure_logging_writes_on_a_background_thread(monkeypatch):
+    """Test that records go through the queue to the listener's stream, at the configured level."""
+    root = logging.getLogger()
+    monkeypatch.setattr(root, "handlers", [])
+    monkeypatch.setattr(root, "level", root.level)
+    monkeypatch.setattr(logger_module, "_listener", None)
+    stream = io.StringIO()
+
+    listener = configure_logging(level="WARNING", stream=stream)
+    assert configure_logging() is listener
+    assert isinstance(root.handlers[0], logging.handlers.QueueHandler)
+    logging.getLogger("test.configured").info("not written")
+    logging.getLogger("test.configured").warning("written %s", "later")
+    shutdown_logging()
+
+    assert stream.getvalue().endswith("test.configured - WARNING - written later\n")
+    assert "not written" not in stream.getvalue()
+
+def test_full_queue_drops_records():
+    """Test that the queue handler drops and counts records instead of blocking when the queue is full."""
+    handler = _DroppingQueueHandler(queue.Queue(1))
+    for i in range(3):
+        handler.handle(logging.makeLogRecord({"msg": f"line {i}"}))
+    assert handler.dropped == 2
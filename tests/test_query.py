@@ -0,0 +1,85 @@
+import pytest
+from fastapi.testclient import TestClient
+from src.main import app
+from src.core.log_store import LogStore, CHUNK_SIZE
+from src.core.query import QueryError, compile_query
+
+client = TestClient(app)
+
+def make_store(count=CHUNK_SIZE + 500):
+    store = LogStore()
+    for i in range(count):
+        metadata = {"status": 200 + 100 * (i % 4), "method": "POST" if i % 3 == 0 else "GET", "path": f"/p/{i % 11}"}
+        if i % 7 == 0:
+            metadata["status"] = "unknown"
+        if i % 13 == 0:
+            del metadata["method"]
+        store.append({
+            "service": f"svc-{i % 2}",
+            "level": "ERROR" if metadata["status"] == 500 else "INFO",
+            "message": f"request {i}",
+            "metadata": metadata,
+            "_kafka_offset": i,
+        })
+    return store
+
+def matching_offsets(store, expression):
+    return [log["_kafka_offset"] for batch in store.scan(where=compile_query(expression)) for log in batch]
+
+def expected_offsets(store, predicate):
+    return [log["_kafka_offset"] for log in store if predicate(log, log.get("metadata", {}))]
+
+@pytest.mark.parametrize("expression, predicate", [
+    ('metadata.status >= 400 AND metadata.method = "POST"',
+     lambda log, m: type(m["status"]) is int and m["status"] >= 400 and m.get("method") == "POST"),
+    ('metadata.status = "unknown" OR level = \'ERROR\'',
+     lambda log, m: m["status"] == "unknown" or log["level"] == "ERROR"),
+    ('NOT (metadata.method = null) AND metadata.path IN ("/p/1", "/p/2")',
+     lambda log, m: "method" in m and m["path"] in ("/p/1", "/p/2")),
+    ('service != "svc-0" AND _kafka_offset < 5000 AND metadata.status < 400',
+     lambda log, m: log["service"] != "svc-0" and log["_kafka_offset"] < 5000 and m["status"] in (200, 300)),
+])
+def test_query_matches_python_evaluation(expression, predicate):
+    """Test that vectorized filtering agrees with evaluating each record in Python, before and after caching."""
+    store = make_store()
+    expected = expected_offsets(store, predicate)
+    assert expected
+    assert matching_offsets(store, expression) == expected
+    assert matching_offsets(store, expression) == expected
+
+def test_metadata_kept_outside_columns_is_queryable():
+    store = LogStore()
+    store.append({"service": "svc", "message": "a", "metadata": {1: "int key", "status": 500}})
+    store.append({"service": "svc", "message": "b", "metadata": {"status": 500}})
+    assert len(next(store.scan(where=compile_query("metadata.status = 500")))) == 2
+
+def test_view_cache_only_holds_existing_columns():
+    """Test that querying arbitrary metadata keys does not grow a chunk's view cache."""
+    store = make_store()
+    for i in range(50):
+        assert matching_offsets(store, f'metadata.missing_{i} = "x" OR metadata.path = "/p/1"')
+    chunk = store.sealed_chunks()[0]
+    assert set(chunk.views) == {"metadata.path"}
+
+def test_compiled_queries_are_cached():
+    assert compile_query("metadata.status >= 500") is compile_query("metadata.status >= 500")
+
+@pytest.mark.parametrize("expression", [
+    "", "metadata.status >=", "status = 5", "metadata.status > null",
+    "(level = 'ERROR'", "level = 'ERROR' AND", "level ~ 'x'",
+])
+def test_invalid_queries_are_rejected(expression):
+    with pytest.raises(QueryError):
+        compile_query(expression)
+
+def test_logs_endpoint_filters_by_query():
+    client.post("/api/v1/log", json={"service": "query-test", "level": "ERROR", "message": "boom",
+                                     "metadata": {"status": 503, "method": "POST"}})
+    client.post("/api/v1/log", json={"service": "query-test", "level": "INFO", "message": "ok",
+                                     "metadata": {"status": 200, "method": "POST"}})
+
+    response = client.get("/api/v1/logs", params={
+        "service": "query-test", "q": 'metadata.status >= 500 AND metadata.method = "POST"'})
+    assert [log["message"] for log in response.json()["logs"]] == ["boom"]
+
+    assert client.get("/api/v1/logs", params={"q": "metadata.status >>"}).status_code == 400
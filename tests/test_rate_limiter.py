@@ -0,0 +1,64 @@
+import pytest
+from fastapi.testclient import TestClient
+from src.main import app
+from src.api import routes
+from src.core.rate_limiter import (
+    TokenBucket, ServiceRateLimiter, LogSampler, LoadShedder, parse_rate_overrides
+)
+
+client = TestClient(app)
+
+def test_token_bucket_refills_over_time():
+    """Test that an empty bucket reports the wait and refills at its rate."""
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.try_acquire(now=bucket.updated) == 0.0
+    assert bucket.try_acquire(now=bucket.updated) == 0.0
+    wait = bucket.try_acquire(now=bucket.updated)
+    assert wait == pytest.approx(0.1)
+    assert bucket.try_acquire(now=bucket.updated + 0.11) == 0.0
+
+def test_service_overrides_and_overflow_bucket():
+    """Test that overrides apply per service and untracked services share a bucket."""
+    limiter = ServiceRateLimiter(default_rate=1, overrides=parse_rate_overrides("noisy=1:3"), max_services=2)
+    assert [limiter.acquire("noisy") for _ in range(4)].count(0.0) == 3
+    assert limiter.acquire("svc-a") == 0.0
+    assert limiter.acquire("svc-b") == 0.0
+    assert limiter.acquire("svc-c") > 0.0
+
+def test_sampler_records_rate():
+    """Test that kept records carry their sample rate and dropped levels are dropped."""
+    sampler = LogSampler({"INFO": 0.0, "ERROR": 1.0})
+    error = {"level": "ERROR"}
+    assert sampler.keep(error)
+    assert error["_sample_rate"] == 1.0
+    assert not sampler.keep({"level": "INFO"})
+
+def test_load_shedder_hysteresis():
+    """Test that shedding starts at the high and stops at the low water mark."""
+    shedder = LoadShedder(high_water_mark=10, low_water_mark=5)
+    assert shedder.check(9) == 0.0
+    assert shedder.check(10) > 0.0
+    assert shedder.check(7) > 0.0
+    assert shedder.check(5) == 0.0
+
+def test_rate_limited_log_returns_429(monkeypatch):
+    """Test that the log endpoint returns 429 with Retry-After when over the limit."""
+    monkeypatch.setattr(routes, "rate_limiter", ServiceRateLimiter(default_rate=1))
+    log_data = {"service": "limited-service", "level": "INFO", "message": "hello"}
+    assert client.post("/api/v1/log", json=log_data).status_code == 200
+    response = client.post("/api/v1/log", json=log_data)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+def test_kaggle_endpoints_are_rate_limited_and_sampled(monkeypatch):
+    """Test that dataset replays go through the same guards as POST /log."""
+    monkeypatch.setattr(routes, "rate_limiter", ServiceRateLimiter(overrides=parse_rate_overrides("auth-service=1")))
+    assert client.get("/api/v1/kaggle/0").status_code == 200
+    assert client.get("/api/v1/kaggle/0").status_code == 429
+
+    monkeypatch.setattr(routes, "log_sampler", LogSampler({"ERROR": 0.0, "WARN": 0.0}))
+    response = client.post("/api/v1/kaggle/batch", json={"start_index": 0, "count": 3})
+    assert response.status_code == 200
+    assert response.json()["rate_limited"] == 1
+    assert response.json()["sampled_out"] == 2
+    assert client.get("/api/v1/kaggle/99").status_code == 404
@@ -0,0 +1,130 @@
+import pytest
+from fastapi.testclient import TestClient
+from src.main import app
+from src.core.log_store import LogStore, CHUNK_SIZE
+from src.core.retention import RetentionManager, MINUTE_MS, HOUR_MS
+
+client = TestClient(app)
+
+START_MS = 1700000000000 // HOUR_MS * HOUR_MS
+
+def fill(store, count, step_ms=1000):
+    for i in range(count):
+        status = 500 if i % 10 == 0 else 200
+        store.append({
+            "service": f"svc-{i % 2}",
+            "level": "ERROR" if status == 500 else "INFO",
+            "message": f"GET /page/{i % 5}",
+            "metadata": {"status": status, "size_bytes": 100, "request": f"/page/{i % 5}"},
+            "_kafka_offset": i,
+            "_kafka_timestamp": START_MS + i * step_ms,
+        })
+
+def totals(timeline):
+    result = {}
+    for bucket in timeline["buckets"]:
+        key = (bucket["time_ms"], bucket["group"])
+        result[key] = (bucket["count"], bucket["bytes"])
+    return result
+
+def test_evicted_chunks_keep_offsets():
+    """Test that evicting chunks drops the oldest records without renumbering the rest."""
+    store = LogStore()
+    fill(store, 3 * CHUNK_SIZE + 10)
+    evicted = store.evict_chunks(10)
+
+    assert len(evicted) == 3  # the open chunk is never evicted
+    assert store.first_offset == 3 * CHUNK_SIZE
+    assert store.retained == 10
+    assert len(store) == 3 * CHUNK_SIZE + 10
+    with pytest.raises(IndexError):
+        store.get(0)
+    assert store.get(3 * CHUNK_SIZE)["_kafka_offset"] == 3 * CHUNK_SIZE
+    assert [log["_kafka_offset"] for log in store[0:3 * CHUNK_SIZE + 2]] == [3 * CHUNK_SIZE, 3 * CHUNK_SIZE + 1]
+
+def test_timeline_is_unchanged_by_rollups():
+    """Test that counts and bytes survive moving from raw logs to minute and hour rollups."""
+    count = 4 * CHUNK_SIZE + 100
+    raw = LogStore()
+    fill(raw, count)
+    expected = RetentionManager(raw, raw_window_seconds=0, raw_max_logs=0).timeline(3600, group_by="status")
+
+    store = LogStore()
+    fill(store, count)
+    retention = RetentionManager(store, raw_window_seconds=0, raw_max_logs=CHUNK_SIZE,
+                                 minute_window_seconds=1800)
+    retention.enforce(now_ms=START_MS + count * 1000)
+
+    assert store.retained < 2 * CHUNK_SIZE
+    assert len(retention.minutes) and len(retention.hours)
+    timeline = retention.timeline(3600, group_by="status")
+    assert timeline["tiers"] == ["hour", "minute", "raw"]
+    assert totals(timeline) == totals(expected)
+    assert sum(bucket["count"] for bucket in timeline["buckets"]) == count
+
+def test_resolution_is_raised_to_coarsest_tier_in_range():
+    store = LogStore()
+    fill(store, 2 * CHUNK_SIZE)
+    retention = RetentionManager(store, raw_window_seconds=60, minute_window_seconds=60)
+    retention.enforce(now_ms=START_MS + 10 * HOUR_MS)
+
+    assert retention.timeline(60)["resolution_seconds"] == 3600
+    assert retention.timeline(60, since_ms=START_MS + 9 * HOUR_MS)["resolution_seconds"] == 60
+
+def test_rollups_keep_top_paths_and_bytes():
+    store = LogStore()
+    fill(store, 3 * CHUNK_SIZE, step_ms=10)
+    retention = RetentionManager(store, raw_window_seconds=0, raw_max_logs=1, top_paths=3)
+    retention.enforce(now_ms=START_MS)
+
+    rollup = retention.rollups("minute")[0]
+    assert rollup["start_ms"] == START_MS
+    assert rollup["count"] == MINUTE_MS // 10
+    assert rollup["bytes"] == 100 * rollup["count"]
+    assert rollup["by_status"]["500"] == rollup["count"] // 10
+    assert len(rollup["top_paths"]) == 3
+
+def test_sampled_logs_are_weighted_by_their_rate():
+    """Test that raw timelines and rollups count a log kept at rate r as 1 / r logs."""
+    store = LogStore()
+    for i in range(CHUNK_SIZE + 10):
+        store.append({
+            "service": "svc", "level": "INFO", "message": "GET /", "_sample_rate": 0.25,
+            "metadata": {"status": 200, "size_bytes": 100, "request": "/"},
+            "_kafka_offset": i, "_kafka_timestamp": START_MS + i,
+        })
+    retention = RetentionManager(store, raw_window_seconds=0, raw_max_logs=0)
+    raw = retention.timeline(3600)["buckets"]
+    assert [(bucket["count"], bucket["bytes"]) for bucket in raw] == [(4 * len(store), 400 * len(store))]
+
+    retention = RetentionManager(store, raw_window_seconds=0, raw_max_logs=1, minute_window_seconds=0)
+    retention.enforce(now_ms=START_MS + 10 * HOUR_MS)
+    rollup = retention.rollups("minute")[0]
+    assert (rollup["count"], rollup["bytes"]) == (4 * CHUNK_SIZE, 400 * CHUNK_SIZE)
+    assert rollup["top_paths"] == [{"path": "/", "count": 4 * CHUNK_SIZE}]
+    assert len(retention.hours) == 0  # a minute window of 0 keeps minute rollups
+    assert retention.timeline(3600)["buckets"][0]["count"] == 4 * len(store)
+
+def test_unhashable_metadata_values_are_rolled_up():
+    """Test that list or dict statuses and paths are counted as strings instead of failing the rollup."""
+    store = LogStore()
+    store.append({"service": "svc-0", "level": "ERROR", "message": "odd",
+                  "metadata": {"status": [500], "request": {"path": "/"}, "size_bytes": 1e300},
+                  "_kafka_timestamp": START_MS})
+    fill(store, 2 * CHUNK_SIZE + 10)
+    retention = RetentionManager(store, raw_window_seconds=0, raw_max_logs=1)
+    groups = {bucket["group"] for bucket in retention.timeline(3600, group_by="status")["buckets"]}
+    assert groups == {200, 500, "[500]"}
+
+    retention.enforce(now_ms=START_MS + HOUR_MS)
+    assert store.retained == 10 + 1
+    by_status = retention.rollups("minute")[0]["by_status"]
+    assert by_status["[500]"] == 1
+
+def test_timeline_endpoint():
+    client.post("/api/v1/log", json={"service": "timeline-test", "level": "WARN", "message": "slow"})
+
+    response = client.get("/api/v1/logs/timeline", params={"service": "timeline-test", "resolution": 3600})
+    assert response.status_code == 200
+    assert [bucket["group"] for bucket in response.json()["buckets"]] == ["WARN"]
+    assert client.get("/api/v1/logs/timeline", params={"group_by": "ip"}).status_code == 400
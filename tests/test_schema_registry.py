@@ -0,0 +1,233 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from src.main import app
+from src.core.avro import AvroError, Cursor, Schema, SchemaError, compatibility_errors
+from src.core.config import config
+from src.core.schema_registry import (
+    LOG_ENTRY_SCHEMA, IncompatibleSchemaError, RegistryFullError, SchemaRegistry, log_subject, schema_registry
+)
+from src.core.serializers import DESERIALIZERS, SERIALIZERS
+from src.core.kafka_producer import KafkaLogger
+
+client = TestClient(app)
+
+AVRO_HEADERS = {"Content-Type": "application/vnd.log-entry+avro"}
+
+def record(fields, name="Event"):
+    return {"type": "record", "name": name, "fields": fields}
+
+def test_log_entry_roundtrip():
+    """Test that a log entry survives encoding, including optional and metadata fields."""
+    schema = Schema(LOG_ENTRY_SCHEMA)
+    entry = {
+        "service": "web", "level": "INFO", "message": "GET /index.html", "timestamp": None,
+        "metadata": {"status": 200, "bytes": 5120, "latency": 0.25, "cached": True, "ip": "10.0.0.1", "ref": None},
+        "event_id": "abc",
+    }
+    data = schema.encode(entry)
+    cursor = Cursor(data)
+    assert schema.decoder()(cursor) == entry
+    assert cursor.at_end()
+    assert len(data) < len(json.dumps(entry))
+
+def test_recursive_and_complex_types_roundtrip():
+    schema = Schema(record([
+        {"name": "value", "type": "long"},
+        {"name": "children", "type": {"type": "array", "items": "Node"}},
+        {"name": "kind", "type": {"type": "enum", "name": "Kind", "symbols": ["LEAF", "BRANCH"]}},
+        {"name": "payload", "type": ["null", "bytes", "float"]},
+    ], name="Node"))
+    leaf = {"value": -2**40, "children": [], "kind": "LEAF", "payload": b"\x00\xff"}
+    tree = {"value": 7, "children": [leaf, leaf], "kind": "BRANCH", "payload": None}
+    assert schema.decoder()(Cursor(schema.encode(tree))) == tree
+
+def test_encode_rejects_values_that_do_not_match():
+    schema = Schema(LOG_ENTRY_SCHEMA)
+    with pytest.raises(AvroError):
+        schema.encode({"service": "web", "level": "INFO"})
+    with pytest.raises(AvroError):
+        schema.encode({"service": "web", "level": "INFO", "message": "m", "metadata": {"nested": {"a": 1}}})
+    with pytest.raises(SchemaError):
+        Schema({"type": "record", "name": "Bad", "fields": [{"name": "x", "type": "Missing"}]})
+
+def test_reader_resolves_older_and_newer_writers():
+    """Test added fields take their default, removed fields are skipped and ints are promoted."""
+    old = Schema(record([{"name": "id", "type": "int"}, {"name": "note", "type": "string"}]))
+    new = Schema(record([
+        {"name": "id", "type": "double"},
+        {"name": "region", "type": "string", "default": "eu"},
+    ]))
+    data = old.encode({"id": 3, "note": "dropped"})
+    assert old.decoder(new)(Cursor(data)) == {"id": 3.0, "region": "eu"}
+
+def test_compatibility_errors():
+    writer = Schema(record([{"name": "id", "type": "long"}]))
+    added_without_default = Schema(record([{"name": "id", "type": "long"}, {"name": "host", "type": "string"}]))
+    narrowed = Schema(record([{"name": "id", "type": "int"}]))
+    assert compatibility_errors(reader=writer, writer=added_without_default) == []
+    assert "host" in compatibility_errors(reader=added_without_default, writer=writer)[0]
+    assert compatibility_errors(reader=narrowed, writer=writer)
+
+def test_registry_enforces_compatibility_mode():
+    """Test that BACKWARD rejects a new required field, and that NONE accepts it."""
+    v1 = record([{"name": "id", "type": "long"}])
+    v2 = record([{"name": "id", "type": "long"}, {"name": "host", "type": "string"}])
+    v3 = record([{"name": "id", "type": "long"}, {"name": "host", "type": "string", "default": ""}])
+
+    registry = SchemaRegistry(compatibility="BACKWARD")
+    first = registry.register("events-value", v1)
+    with pytest.raises(IncompatibleSchemaError):
+        registry.register("events-value", v2)
+    assert registry.register("events-value", v3) == first + 1
+    assert registry.register("events-value", v1) == first
+    assert registry.versions("events-value") == [first, first + 1]
+
+    lenient = SchemaRegistry(compatibility="NONE")
+    lenient.register("events-value", v1)
+    lenient.register("events-value", v2)
+    assert len(lenient.versions("events-value")) == 2
+
+def test_registry_decodes_old_messages_with_latest_schema(tmp_path):
+    """Test that the file-backed registry keeps ids across restarts and resolves old data."""
+    path = str(tmp_path / "schemas.json")
+    registry = SchemaRegistry(path=path)
+    v1 = registry.register("events-value", record([{"name": "id", "type": "int"}]))
+    message = registry.encode("events-value", {"id": 5})
+    registry.register("events-value", record([
+        {"name": "id", "type": "long"}, {"name": "tags", "type": {"type": "array", "items": "string"}, "default": []}
+    ]))
+
+    reloaded = SchemaRegistry(path=path)
+    assert reloaded.versions("events-value") == registry.versions("events-value")
+    assert reloaded.decode(message) == {"id": 5}
+    assert reloaded.decode(message, "events-value") == {"id": 5, "tags": []}
+    assert reloaded._decoder(v1, reloaded.latest_id("events-value")) is reloaded._decoder(v1, v1 + 1)
+
+    with pytest.raises(SchemaError):
+        reloaded.decode(b"\x00\x00\x00\x00\x63")
+    with pytest.raises(AvroError):
+        reloaded.decode(b"\x01" + message[1:])
+
+def test_malformed_counts_and_nesting_are_rejected():
+    """Test that hostile block counts, enum indexes and nesting fail with AvroError, not memory or stack."""
+    nulls = Schema({"type": "array", "items": "null"})
+    with pytest.raises(AvroError):
+        nulls.decoder()(Cursor(b"\xfe\xff\xff\xff\x0f"))  # 2**31 - 1 nulls in a 5-byte message
+    assert nulls.decoder()(Cursor(b"\x02\x00")) == [None]
+
+    nested = Schema({"type": "array", "items": {"type": "array", "items": "int"}})
+    data = nested.encode([[0] * 200] * 10)
+    assert nested.decoder()(Cursor(data)) == [[0] * 200] * 10
+    with pytest.raises(AvroError):
+        nested.decoder(max_items=1000)(Cursor(data))
+
+    longs = Schema({"type": "long"})
+    assert longs.decoder()(Cursor(b"\xff" * 9 + b"\x01")) == -2 ** 63
+    for data in (b"\x81" * 10 + b"\x00", b"\x81" * 5000):
+        with pytest.raises(AvroError):
+            longs.decoder()(Cursor(data))
+
+    kinds = Schema({"type": "enum", "name": "Kind", "symbols": ["A", "B"]})
+    for index in (b"\x01", b"\x04"):  # -1 and 2
+        with pytest.raises(AvroError):
+            kinds.decoder()(Cursor(index))
+
+    node = Schema(record([{"name": "next", "type": ["null", "Node"]}], name="Node"))
+    with pytest.raises(AvroError):
+        node.decoder()(Cursor(b"\x02" * 100000 + b"\x00"))
+    deep = None
+    for _ in range(100000):
+        deep = {"next": deep}
+    with pytest.raises(AvroError):
+        node.encode(deep)
+
+def test_registry_is_bounded():
+    registry = SchemaRegistry(compatibility="NONE", max_versions=2)
+    registry.register("a-value", record([{"name": "id", "type": "int"}]))
+    registry.register("a-value", record([{"name": "id", "type": "long"}]))
+    with pytest.raises(RegistryFullError):
+        registry.register("b-value", record([{"name": "id", "type": "int"}]))
+    assert registry.register("a-value", record([{"name": "id", "type": "int"}])) == 1
+
+def test_avro_serializers_roundtrip():
+    entry = {"service": "web", "level": "WARN", "message": "slow", "metadata": {"ms": 1200}}
+    decoded = DESERIALIZERS["avro"](SERIALIZERS["avro"](entry))
+    assert decoded == {**entry, "timestamp": None, "event_id": None}
+
+def test_bulk_upload_accepts_avro():
+    entries = [{"service": "avro-bulk-test", "level": "INFO", "message": f"entry {i}", "metadata": {"n": i}}
+               for i in range(20)]
+    body = b"".join(schema_registry.encode(log_subject(), entry) for entry in entries)
+    response = client.post("/api/v1/logs/bulk", content=body, headers=AVRO_HEADERS)
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 20
+
+    logs = client.get("/api/v1/logs?service=avro-bulk-test&limit=100").json()["logs"]
+    assert sorted(log["metadata"]["n"] for log in logs) == list(range(20))
+
+    response = client.post("/api/v1/logs/bulk", content=body[:-3], headers=AVRO_HEADERS)
+    assert response.status_code == 400
+    overlong = schema_registry.encode(log_subject(), entries[0])[:5] + b"\x81" * 5000
+    assert client.post("/api/v1/logs/bulk", content=overlong, headers=AVRO_HEADERS).status_code == 400
+
+@pytest.mark.parametrize("wire_format", ["json", "avro", "msgpack"])
+def test_producer_sends_logs_in_its_wire_format(monkeypatch, wire_format):
+    """Test that producer.serializer encodes each log and stores what a consumer decodes from it."""
+    if wire_format not in SERIALIZERS:
+        pytest.skip(f"{wire_format} not installed")
+    monkeypatch.setitem(config.config, "producer.serializer", wire_format)
+    producer = KafkaLogger()
+    entry = {"service": "web", "level": "INFO", "message": "ok", "metadata": {"ms": 12}, "unknown": 1}
+    assert producer.send_log(dict(entry))["status"] == "success"
+    stored = producer.logs.get(0)
+    assert {key: stored[key] for key in ("service", "level", "message", "metadata")} == {
+        key: entry[key] for key in ("service", "level", "message", "metadata")
+    }
+    assert ("unknown" in stored) == (wire_format != "avro")  # not part of the log entry schema
+
+    assert producer.send_log({"service": "web", "level": "INFO", "message": object()})["status"] == "error"
+    assert len(producer.logs) == 1
+
+    monkeypatch.setitem(config.config, "producer.serializer", "xml")
+    with pytest.raises(ValueError):
+        KafkaLogger()
+
+def test_schema_endpoints(monkeypatch):
+    subject = log_subject()
+    latest = client.get(f"/api/v1/schemas/{subject}").json()
+    assert latest["schema"] == LOG_ENTRY_SCHEMA
+    assert client.get(f"/api/v1/schemas/ids/{latest['id']}").json()["schema"] == LOG_ENTRY_SCHEMA
+    assert client.get("/api/v1/schemas/missing-value").status_code == 404
+    assert client.get("/api/v1/schemas/ids/9999").status_code == 404
+
+    required_host = {**LOG_ENTRY_SCHEMA, "fields": LOG_ENTRY_SCHEMA["fields"] + [{"name": "host", "type": "string"}]}
+    without_message = {**LOG_ENTRY_SCHEMA, "fields": [f for f in LOG_ENTRY_SCHEMA["fields"] if f["name"] != "message"]}
+    assert client.post(f"/api/v1/schemas/{subject}", json=without_message).status_code == 403
+    assert client.get(f"/api/v1/schemas/{subject}").json()["id"] == latest["id"]
+
+    monkeypatch.setitem(config.config, "schema_registry.allow_writes", True)
+    response = client.post(f"/api/v1/schemas/{subject}", json=required_host)
+    assert response.status_code == 409
+    assert client.post(f"/api/v1/schemas/{subject}", content=b"{not json").status_code == 400
+
+    response = client.post(f"/api/v1/schemas/{subject}", json=LOG_ENTRY_SCHEMA)
+    assert response.status_code == 200
+    assert response.json()["id"] == latest["id"]
+
+def test_only_the_log_subject_is_writable_by_default(monkeypatch):
+    """Test that other subjects need schema_registry.allow_any_subject, and a full registry answers 507."""
+    monkeypatch.setitem(config.config, "schema_registry.allow_writes", True)
+    other = record([{"name": "id", "type": "long"}], name="Other")
+    assert client.post("/api/v1/schemas/other-value", json=other).status_code == 403
+    assert "other-value" not in schema_registry.subjects()
+
+    monkeypatch.setattr(schema_registry, "max_versions", len(schema_registry.subjects()) + 100)
+    monkeypatch.setattr(schema_registry, "_subjects", dict(schema_registry._subjects))
+    monkeypatch.setattr(schema_registry, "_schemas", dict(schema_registry._schemas))
+    monkeypatch.setitem(config.config, "schema_registry.allow_any_subject", True)
+    assert client.post("/api/v1/schemas/other-value", json=other).status_code == 200
+
+    monkeypatch.setattr(schema_registry, "max_versions", 0)
+    other_v2 = record([{"name": "id", "type": "long"}, {"name": "n", "type": "int", "default": 0}], name="Other")
+    assert client.post("/api/v1/schemas/other-value", json=other_v2).status_code == 507
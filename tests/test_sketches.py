@@ -0,0 +1,155 @@
+import random
+from fastapi.testclient import TestClient
+from src.main import app
+from src.core.kafka_producer import get_kafka_logger
+from src.core.sketches import SpaceSaving, HyperLogLog, StatsSketches, stable_hash
+
+client = TestClient(app)
+
+START_MS = 1700000000000 // 60000 * 60000
+
+def log(ip, service="web", request="/index.html", user_agent="curl/8.0", offset_ms=0):
+    return {
+        "service": service,
+        "level": "INFO",
+        "message": "request",
+        "metadata": {"ip": ip, "request": request, "user_agent": user_agent},
+        "_kafka_timestamp": START_MS + offset_ms,
+    }
+
+def test_stable_hash_is_not_process_keyed():
+    """Test that sketch hashes are fixed values, so sketches from other workers can be merged."""
+    assert stable_hash("10.0.0.1") == stable_hash("10.0.0.1")
+    assert stable_hash("10.0.0.1") == 0x538ef646e14d03e6
+    assert stable_hash(42) == stable_hash("42")
+
+def test_space_saving_finds_heavy_hitters():
+    """Test that frequent values survive a long tail and their counts bound the truth."""
+    summary = SpaceSaving(capacity=20)
+    rng = random.Random(1)
+    truth = {}
+    for _ in range(20000):
+        value = f"hot-{rng.randrange(5)}" if rng.random() < 0.5 else f"tail-{rng.randrange(5000)}"
+        truth[value] = truth.get(value, 0) + 1
+        summary.add(value)
+
+    assert len(summary) == 20
+    top = summary.top(5)
+    assert {item["value"] for item in top} == {f"hot-{i}" for i in range(5)}
+    for item in top:
+        assert item["count"] - item["error"] <= truth[item["value"]] <= item["count"]
+
+def test_space_saving_merge_keeps_bounds():
+    """Test that merged summaries still bound the combined true counts."""
+    left, right = SpaceSaving(capacity=10), SpaceSaving(capacity=10)
+    truth = {}
+    rng = random.Random(2)
+    for summary in (left, right):
+        for _ in range(5000):
+            value = f"v{int(rng.expovariate(0.3))}"
+            truth[value] = truth.get(value, 0) + 1
+            summary.add(value)
+
+    left.merge(right)
+    assert len(left) == 10
+    for item in left.top(10):
+        assert item["count"] - item["error"] <= truth[item["value"]] <= item["count"]
+    assert left.top(1)[0]["value"] == "v0"
+
+def test_hyperloglog_estimates_and_merges():
+    """Test that estimates are within a few percent and merging equals adding to one sketch."""
+    left, right, both = HyperLogLog(12), HyperLogLog(12), HyperLogLog(12)
+    for i in range(30000):
+        (left if i % 2 else right).add(f"10.0.{i // 256}.{i % 256}")
+        both.add(f"10.0.{i // 256}.{i % 256}")
+    for i in range(1000):
+        left.add(f"10.0.0.{i % 256}")  # duplicates do not count
+
+    assert abs(both.count() - 30000) < 30000 * 0.05
+    left.merge(right)
+    assert left.registers == both.registers
+
+    small = HyperLogLog(12)
+    for i in range(100):
+        small.add(i)
+    assert abs(small.count() - 100) <= 3
+
+def test_windows_are_bounded_and_queried_by_age():
+    """Test that old windows are dropped and queries only merge recent ones."""
+    sketches = StatsSketches(window_seconds=60, windows=3)
+    for minute in range(5):
+        for i in range(10):
+            sketches.add(log(f"ip-{minute}", offset_ms=minute * 60000 + i))
+
+    assert len(sketches._windows) == 3
+    now = START_MS + 4 * 60000
+    assert sorted(item["value"] for item in sketches.top("ip", now_ms=now)) == ["ip-2", "ip-3", "ip-4"]
+    assert [item["value"] for item in sketches.top("ip", window_seconds=60, now_ms=now)] == ["ip-4"]
+    assert sketches.cardinality(now_ms=now) == {"services": {"web": 3}, "total": 3}
+
+def test_paths_drop_query_strings_and_services_are_capped():
+    """Test that paths group by route and extra services share one sketch."""
+    sketches = StatsSketches(max_services=2)
+    sketches.add(log("a", service="s1", request="/search?q=1"))
+    sketches.add(log("b", service="s2", request="/search?q=2"))
+    sketches.add(log("c", service="s3", request="/about"))
+    sketches.add(log("d", service="s4"))
+
+    now = START_MS
+    assert sketches.top("path", k=1, now_ms=now) == [{"value": "/search", "count": 2, "error": 0}]
+    assert sketches.cardinality(now_ms=now)["services"] == {"s1": 1, "s2": 1, "_other": 2}
+    assert sketches.cardinality(service="s2", now_ms=now) == {"services": {"s2": 1}, "total": 1}
+
+def test_sampled_logs_are_weighted_by_their_rate():
+    """Test that a log kept at rate r counts 1 / r times in top-k, but once in unique IPs."""
+    sketches = StatsSketches()
+    for i in range(10):
+        sketches.add({**log("10.0.0.1", request="/sampled"), "_sample_rate": 0.1})
+    for i in range(30):
+        sketches.add(log(f"10.0.1.{i}", request="/kept"))
+
+    assert sketches.top("path", now_ms=START_MS) == [
+        {"value": "/sampled", "count": 100, "error": 0},
+        {"value": "/kept", "count": 30, "error": 0},
+    ]
+    assert sketches.top("ip", k=1, now_ms=START_MS)[0] == {"value": "10.0.0.1", "count": 100, "error": 0}
+    assert abs(sketches.cardinality(now_ms=START_MS)["total"] - 31) <= 1
+
+def test_merge_across_workers():
+    """Test that sketches from two workers merge into the combined view."""
+    first, second = StatsSketches(), StatsSketches()
+    for i in range(50):
+        first.add(log(f"10.0.0.{i}", user_agent="bot"))
+        second.add(log(f"10.0.1.{i}", user_agent="bot", offset_ms=60000))
+    second.add(log("10.0.0.1", user_agent="browser"))
+
+    first.merge(second)
+    now = START_MS + 60000
+    assert first.top("user_agent", k=2, now_ms=now) == [
+        {"value": "bot", "count": 100, "error": 0},
+        {"value": "browser", "count": 1, "error": 0},
+    ]
+    assert abs(first.cardinality(now_ms=now)["total"] - 100) <= 2
+
+def test_stats_endpoints():
+    """Test that ingested logs show up in the top and cardinality endpoints."""
+    for i in range(5):
+        client.post("/api/v1/log", json={
+            "service": "sketch-test",
+            "level": "INFO",
+            "message": "hit",
+            "metadata": {"ip": f"192.0.2.{i % 2}", "request": "/sketch-test", "user_agent": "pytest"},
+        })
+
+    response = client.get("/api/v1/stats/top", params={"dimension": "path", "k": 50, "window": 300})
+    assert response.status_code == 200
+    top = {item["value"]: item["count"] for item in response.json()["top"]}
+    assert top["/sketch-test"] >= 5
+
+    response = client.get("/api/v1/stats/cardinality", params={"service": "sketch-test"})
+    assert response.status_code == 200
+    assert response.json()["unique_ips"] == {"sketch-test": 2}
+
+    assert client.get("/api/v1/stats/top", params={"dimension": "referrer"}).status_code == 400
+    assert client.get("/api/v1/stats/cardinality", params={"window": 0}).status_code == 400
+    assert get_kafka_logger().sketches.top("ip", k=1)
@@ -0,0 +1,69 @@
+from fastapi.testclient import TestClient
+from src.main import app
+from src.core.templates import TemplateMiner, WILDCARD
+from src.core.log_store import LogStore
+from src.core.kafka_producer import get_kafka_logger
+
+client = TestClient(app)
+
+def test_miner_generalises_variable_tokens():
+    """Test that messages differing in a variable token share one template."""
+    miner = TemplateMiner()
+    first = miner.encode("Request successful for /index.html")
+    second = miner.encode("Request successful for /login.php")
+    assert miner.cluster_id(first[0]) == miner.cluster_id(second[0])
+    assert second[1] == ("/login.php",)
+    assert miner.templates()[0] == {
+        "template_id": 0,
+        "template": f"Request successful for {WILDCARD}",
+        "count": 2
+    }
+
+def test_store_round_trips_messages():
+    """Test that records encoded before and after a template changes decode exactly."""
+    store = LogStore(miner=TemplateMiner())
+    messages = [
+        "Request successful for /index.html",
+        "Request successful for /index.html",
+        "Request  successful for /other",
+        "Resource not found for /missing 404",
+        "",
+    ]
+    for message in messages:
+        store.append({"service": "web-server", "message": message})
+    store.append({"service": "no-message"})
+    assert [log.get("message") for log in store] == messages + [None]
+    assert "message" not in store.get(-1)
+
+def test_store_without_miner_keeps_messages_verbatim():
+    """Test that template compression is off unless a miner is given."""
+    store = LogStore()
+    store.append({"service": "web-server", "message": "Request successful for /index.html"})
+    assert store.get(0)["message"] == "Request successful for /index.html"
+    assert store.template_counts() == []
+
+def test_templates_endpoint(monkeypatch):
+    """Test that the templates endpoint reports mined templates."""
+    monkeypatch.setattr(get_kafka_logger().logs, "miner", TemplateMiner())
+    client.post("/api/v1/log", json={"service": "tpl-service", "level": "INFO", "message": "User 1 logged in"})
+    response = client.get("/api/v1/templates")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "success"
+    assert data["total_templates"] >= 1
+    assert all({"template_id", "template", "count"} <= set(t) for t in data["templates"])
+
+def test_cluster_count_is_capped():
+    """Test that unrelated messages past the caps are kept verbatim instead of growing the tree."""
+    miner = TemplateMiner(max_leaf_clusters=5, max_clusters=8)
+    words = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+    messages = [f"start {a} {b} {c}" for a in words for b in words[::-1] for c in words[:3]]
+    store = LogStore(miner=miner)
+    for message in messages:
+        store.append({"service": "web-server", "message": message})
+
+    assert len(miner.clusters) <= 8
+    leaves = [child[None] for child in miner._tree[4]["start"].values()]
+    assert leaves and all(len(leaf) <= 5 for leaf in leaves)
+    assert [log["message"] for log in store] == messages
+    assert miner.encode("start kilo lima mike") == (None, "start kilo lima mike")